@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import tempfile
 import plotly.graph_objects as go
 import plotly.express as px
@@ -10,19 +11,42 @@ import base64
 try:
     from utils.bom_parser import parse_bom
     from utils.email_utils import send_email
+    from utils.cache_utils import (
+        file_digest, pdf_info, render_page_with_annotations, load_bom, part_locations, export_annotated_pdf,
+        bom_search_index, filter_rows, fragment, load_table, table_search_index,
+    )
+    from utils.error_codes import ensure_imported, search_codes
+    from utils.inventory import with_stock_levels, low_stock, fetch_usage_series, fetch_replenishment
+    from utils.api import API_BASE_URL, api_configured, api_get, api_request
 except ImportError:
     st.error("Missing required modules: utils.bom_parser and utils.email_utils")
     st.stop()
 
+MAX_LISTED_ANNOTATIONS = 25
+
 # Page configuration
 st.set_page_config(page_title="Warehouse Spare Parts", layout="wide")
 st.title("📦 Complete Service Dashboard")
 
-# Initialize session state for quantities and maintenance data
+# Initialize session state for quantities and part selection
 if 'part_quantities' not in st.session_state:
     st.session_state.part_quantities = {}
-if 'maintenance_records' not in st.session_state:
-    st.session_state.maintenance_records = []
+if 'selected_parts' not in st.session_state:
+    st.session_state.selected_parts = set()
+if 'next_annotation_id' not in st.session_state:
+    st.session_state.next_annotation_id = 0
+
+def add_to_order(lines):
+    # button callback: runs before the rerun, so the tab 1 quantity widgets can be set
+    for part, qty in lines:
+        st.session_state.selected_parts.add(part)
+        st.session_state.part_quantities[part] = qty
+        st.session_state[f"qty_{part}"] = qty
+
+def new_annotation_id():
+    # stable key for widgets and edits, independent of list position
+    st.session_state.next_annotation_id += 1
+    return st.session_state.next_annotation_id
 
 # Sidebar for file uploads
 st.sidebar.header("Upload Files")
@@ -38,7 +62,8 @@ with tab1:
     
     if bom_file:
         try:
-            bom_df = parse_bom(bom_file)
+            bom_digest = file_digest(bom_file)
+            bom_df = load_bom(bom_digest, bom_file.getvalue())
             
             # Enhanced parts selection with search and filters
             col1, col2 = st.columns([2, 1])
@@ -49,25 +74,39 @@ with tab1:
                 # Search functionality
                 search_term = st.text_input("🔍 Search parts:", placeholder="Enter part number, description, or category")
                 
-                # Filter dataframe based on search
-                if search_term:
-                    filtered_df = bom_df[
-                        bom_df.apply(lambda row: search_term.lower() in str(row).lower(), axis=1)
-                    ]
-                else:
-                    filtered_df = bom_df
+                # Filter dataframe based on search (index is cached per BOM file)
+                filtered_df = filter_rows(bom_df, bom_search_index(bom_digest, bom_file.getvalue()), search_term)
                 
-                # Display parts with selection checkboxes
-                selected_parts = []
-                for idx, row in filtered_df.iterrows():
-                    col_check, col_info = st.columns([0.1, 0.9])
-                    with col_check:
-                        if st.checkbox("", key=f"part_{idx}"):
-                            selected_parts.append(row["Part Number"])
-                    with col_info:
-                        st.write(f"**{row['Part Number']}** - {row.get('Description', 'N/A')}")
-                        if 'Price' in row:
-                            st.write(f"💰 ${row['Price']:.2f}")
+                # Paginated selection grid: only one page of the filtered result is sent
+                # to the browser, selection is kept as a set of part numbers
+                col_size, col_page = st.columns(2)
+                with col_size:
+                    page_size = st.selectbox("Rows per page:", [25, 50, 100, 250], index=1)
+                n_pages = max(1, -(-len(filtered_df) // page_size))
+                with col_page:
+                    page_no = st.number_input(f"Page (of {n_pages}):", min_value=1, max_value=n_pages, value=1) - 1
+                
+                page_df = filtered_df.iloc[page_no * page_size:(page_no + 1) * page_size]
+                display_cols = [c for c in ["Part Number", "Description", "Price"] if c in page_df.columns]
+                grid = page_df[display_cols].copy()
+                grid.insert(0, "Select", grid["Part Number"].isin(st.session_state.selected_parts))
+                
+                edited = st.data_editor(
+                    grid,
+                    key=f"parts_grid_{bom_digest}_{search_term}_{page_size}_{page_no}",
+                    hide_index=True,
+                    use_container_width=True,
+                    disabled=display_cols,
+                    column_config={"Select": st.column_config.CheckboxColumn("Select", default=False)},
+                )
+                checked = edited["Select"].to_numpy()
+                page_parts = edited["Part Number"]
+                st.session_state.selected_parts.difference_update(page_parts[~checked])
+                st.session_state.selected_parts.update(page_parts[checked])
+                st.caption(f"{len(filtered_df)} matching parts · {len(st.session_state.selected_parts)} selected")
+                
+                # Selected parts in BOM order
+                selected_parts = bom_df.loc[bom_df["Part Number"].isin(st.session_state.selected_parts), "Part Number"].tolist()
             
             with col2:
                 if selected_parts:
@@ -131,78 +170,42 @@ with tab2:
     if pdf_file:
         st.subheader("📄 Assembly Layout")
         
-        # Add required imports at the top if not already imported
         try:
-            import fitz  # PyMuPDF
-            from PIL import Image
-            import io
-            
-            # Convert PDF to images
-            pdf_document = fitz.open(stream=pdf_file.read(), filetype="pdf")
+            # Page info and renders are cached on the file digest, so widget
+            # interactions no longer re-open or re-rasterize the drawing
+            pdf_bytes = pdf_file.getvalue()
+            pdf_digest = file_digest(pdf_file)
+            doc_info = pdf_info(pdf_digest, pdf_bytes)
+            bom_df = load_bom(file_digest(bom_file), bom_file.getvalue()) if bom_file else None
             
             # Display PDF pages
             col1, col2 = st.columns([3, 1])
             
             with col1:
                 # Page selection
-                page_count = pdf_document.page_count
+                page_count = doc_info["page_count"]
                 if page_count > 1:
                     selected_page = st.selectbox("Select Page:", range(1, page_count + 1)) - 1
                 else:
                     selected_page = 0
                     st.info(f"PDF has {page_count} page(s)")
                 
-                # Convert PDF page to image
-                page = pdf_document.load_page(selected_page)
-                
                 # Get page dimensions and set zoom level
-                page_rect = page.rect
+                page_width, page_height = doc_info["page_sizes"][selected_page]
                 zoom = st.slider("Zoom Level", 0.5, 3.0, 1.0, 0.1)
                 
-                # Render page as image with annotations
-                mat = fitz.Matrix(zoom, zoom)
-                pix = page.get_pixmap(matrix=mat)
-                
-                # Convert to PIL Image for annotation overlay
-                img_data = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_data))
-                
-                # Add existing annotations to the image
-                if 'pdf_annotations' in st.session_state:
-                    from PIL import ImageDraw, ImageFont
-                    draw = ImageDraw.Draw(img)
-                    
-                    current_page_annotations = [ann for ann in st.session_state.pdf_annotations if ann["page"] == selected_page]
-                    for ann in current_page_annotations:
-                        # Draw annotation marker
-                        x, y = int(ann["x"]), int(ann["y"])
-                        color = ann["color"]
-                        
-                        # Draw circle marker
-                        radius = 8
-                        draw.ellipse([x-radius, y-radius, x+radius, y+radius], fill=color, outline="white", width=2)
-                        
-                        # Draw text label
-                        try:
-                            # Try to use a default font
-                            font = ImageFont.load_default()
-                        except:
-                            font = None
-                        
-                        text = ann["text"][:20] + "..." if len(ann["text"]) > 20 else ann["text"]
-                        draw.text((x+15, y-10), text, fill=color, font=font)
-                
-                # Convert back to bytes for display
-                img_bytes = io.BytesIO()
-                img.save(img_bytes, format='PNG')
-                img_data_with_annotations = img_bytes.getvalue()
+                # Render page with existing annotations (cached per page/zoom/pin set)
+                current_page_annotations = [
+                    ann for ann in st.session_state.get('pdf_annotations', []) if ann["page"] == selected_page
+                ]
+                pins = tuple((ann["x"], ann["y"], ann["text"], ann["color"]) for ann in current_page_annotations)
+                img_data_with_annotations = render_page_with_annotations(pdf_digest, pdf_bytes, selected_page, zoom, pins)
                 
                 # Create clickable image using HTML and JavaScript
-                img_width = int(page_rect.width * zoom)
-                img_height = int(page_rect.height * zoom)
+                img_width = int(page_width * zoom)
+                img_height = int(page_height * zoom)
                 
                 # Encode image for HTML
-                import base64
                 img_b64 = base64.b64encode(img_data_with_annotations).decode()
                 
                 # Create HTML with clickable image
@@ -270,105 +273,113 @@ with tab2:
                 if 'click_y' not in st.session_state:
                     st.session_state.click_y = 100
                 
-                with st.expander("Add Part Annotation", expanded=True):
-                    st.info("💡 Click on the PDF above to set annotation position, then fill in the details below")
-                    
-                    col_pos, col_text = st.columns([1, 2])
-                    
-                    with col_pos:
-                        # Use session state for coordinates that can be updated by clicks
-                        ann_x = st.number_input(
-                            "X Position:", 
-                            min_value=0, 
-                            max_value=img_width, 
-                            value=st.session_state.click_x,
-                            key="ann_x_input"
-                        )
-                        ann_y = st.number_input(
-                            "Y Position:", 
-                            min_value=0, 
-                            max_value=img_height, 
-                            value=st.session_state.click_y,
-                            key="ann_y_input"
-                        )
-                        
-                        # Update session state when inputs change
-                        st.session_state.click_x = ann_x
-                        st.session_state.click_y = ann_y
-                    
-                    with col_text:
-                        ann_text = st.text_input("Annotation Text:", placeholder="Enter part name or description")
-                        ann_color = st.color_picker("Annotation Color", "#FF0000")
+                # The entry widgets live in a form (and a fragment where supported) so that
+                # typing annotation text does not rerun the script and redraw the drawing
+                @fragment
+                def annotation_form():
+                    with st.expander("Add Part Annotation", expanded=True):
+                        st.info("💡 Click on the PDF above to set annotation position, then fill in the details below")
                         
-                        # BOM part quick-select
-                        if bom_file:
-                            try:
-                                bom_df = parse_bom(bom_file)
-                                part_options = ["Custom Text"] + bom_df["Part Number"].tolist()
-                                selected_quick_part = st.selectbox("Quick Select from BOM:", part_options)
+                        with st.form("add_annotation_form", clear_on_submit=True):
+                            col_pos, col_text = st.columns([1, 2])
+                            
+                            with col_pos:
+                                ann_x = st.number_input(
+                                    "X Position:", 
+                                    min_value=0, 
+                                    max_value=img_width, 
+                                    value=min(st.session_state.click_x, img_width),
+                                )
+                                ann_y = st.number_input(
+                                    "Y Position:", 
+                                    min_value=0, 
+                                    max_value=img_height, 
+                                    value=min(st.session_state.click_y, img_height),
+                                )
+                            
+                            with col_text:
+                                ann_text = st.text_input("Annotation Text:", placeholder="Enter part name or description")
+                                ann_color = st.color_picker("Annotation Color", "#FF0000")
                                 
-                                if selected_quick_part != "Custom Text":
-                                    part_info = bom_df[bom_df["Part Number"] == selected_quick_part].iloc[0]
-                                    ann_text = f"{selected_quick_part} - {part_info.get('Description', 'N/A')}"
-                                    st.text_input("Auto-filled text:", value=ann_text, disabled=True)
-                            except Exception as e:
-                                st.error(f"Error loading BOM: {str(e)}")
-                    
-                    if st.button("📍 Add Annotation", type="primary") and ann_text:
-                        # Store annotation in session state
-                        if 'pdf_annotations' not in st.session_state:
-                            st.session_state.pdf_annotations = []
+                                # BOM part quick-select (overrides the text on submit)
+                                selected_quick_part = "Custom Text"
+                                if bom_df is not None:
+                                    part_options = ["Custom Text"] + bom_df["Part Number"].tolist()
+                                    selected_quick_part = st.selectbox("Quick Select from BOM:", part_options)
+                            
+                            submitted = st.form_submit_button("📍 Add Annotation", type="primary")
                         
-                        annotation = {
-                            "page": selected_page,
-                            "x": ann_x,
-                            "y": ann_y,
-                            "text": ann_text,
-                            "color": ann_color
-                        }
-                        st.session_state.pdf_annotations.append(annotation)
-                        st.success(f"Added annotation: {ann_text}")
-                        st.rerun()
+                        if submitted:
+                            st.session_state.click_x = int(ann_x)
+                            st.session_state.click_y = int(ann_y)
+                            if selected_quick_part != "Custom Text":
+                                part_info = bom_df[bom_df["Part Number"] == selected_quick_part].iloc[0]
+                                ann_text = f"{selected_quick_part} - {part_info.get('Description', 'N/A')}"
+                            if ann_text:
+                                # Store annotation in session state
+                                if 'pdf_annotations' not in st.session_state:
+                                    st.session_state.pdf_annotations = []
+                                
+                                # stored in PDF points so pins stay put when the zoom changes
+                                annotation = {
+                                    "id": new_annotation_id(),
+                                    "page": selected_page,
+                                    "x": ann_x / zoom,
+                                    "y": ann_y / zoom,
+                                    "text": ann_text,
+                                    "color": ann_color
+                                }
+                                st.session_state.pdf_annotations.append(annotation)
+                                st.success(f"Added annotation: {ann_text}")
+                                st.rerun()
+                
+                annotation_form()
                 
-                # Display existing annotations for current page
-                if 'pdf_annotations' in st.session_state:
-                    current_page_annotations = [ann for ann in st.session_state.pdf_annotations if ann["page"] == selected_page]
-                    if current_page_annotations:
-                        st.subheader("📌 Current Page Annotations")
-                        for i, ann in enumerate(current_page_annotations):
-                            col_ann, col_edit, col_del = st.columns([3, 1, 1])
-                            with col_ann:
-                                st.write(f"• **{ann['text']}** at ({ann['x']}, {ann['y']})")
-                            with col_edit:
-                                if st.button("✏️", key=f"edit_ann_{i}", help="Edit annotation"):
-                                    st.session_state.click_x = ann['x']
-                                    st.session_state.click_y = ann['y']
-                                    st.rerun()
-                            with col_del:
-                                if st.button("🗑️", key=f"del_ann_{i}", help="Delete annotation"):
-                                    st.session_state.pdf_annotations.remove(ann)
-                                    st.rerun()
+                # Display existing annotations for current page: only the pins nearest the
+                # cursor position, so dense drawings don't produce thousands of buttons
+                if current_page_annotations:
+                    st.subheader("📌 Current Page Annotations")
+                    for ann in current_page_annotations:
+                        if "id" not in ann:
+                            ann["id"] = new_annotation_id()
+                    xy = np.array([(ann["x"], ann["y"]) for ann in current_page_annotations], dtype=float) * zoom
+                    dist = np.hypot(xy[:, 0] - st.session_state.click_x, xy[:, 1] - st.session_state.click_y)
+                    shown = np.argsort(dist, kind="stable")[:MAX_LISTED_ANNOTATIONS]
+                    if len(current_page_annotations) > len(shown):
+                        st.caption(f"Showing the {len(shown)} of {len(current_page_annotations)} pins nearest to ({st.session_state.click_x}, {st.session_state.click_y})")
+                    for i in shown:
+                        ann = current_page_annotations[i]
+                        col_ann, col_edit, col_del = st.columns([3, 1, 1])
+                        with col_ann:
+                            st.write(f"• **{ann['text']}** at ({ann['x']:.1f}, {ann['y']:.1f}) pt")
+                        with col_edit:
+                            if st.button("✏️", key=f"edit_ann_{ann['id']}", help="Edit annotation"):
+                                st.session_state.click_x = int(ann['x'] * zoom)
+                                st.session_state.click_y = int(ann['y'] * zoom)
+                                st.rerun()
+                        with col_del:
+                            if st.button("🗑️", key=f"del_ann_{ann['id']}", help="Delete annotation"):
+                                st.session_state.pdf_annotations = [a for a in st.session_state.pdf_annotations if a.get("id") != ann["id"]]
+                                st.rerun()
             
             with col2:
                 st.subheader("📋 PDF Information")
                 
                 # Display PDF metadata
-                metadata = pdf_document.metadata
+                metadata = doc_info["metadata"]
                 st.write(f"**Title:** {metadata.get('title', 'N/A')}")
                 st.write(f"**Author:** {metadata.get('author', 'N/A')}")
                 st.write(f"**Pages:** {page_count}")
-                st.write(f"**File size:** {len(pdf_file.getvalue()) / 1024:.1f} KB")
+                st.write(f"**File size:** {len(pdf_bytes) / 1024:.1f} KB")
                 
                 # Page dimensions
-                st.write(f"**Page size:** {page_rect.width:.0f} x {page_rect.height:.0f} pts")
+                st.write(f"**Page size:** {page_width:.0f} x {page_height:.0f} pts")
                 
                 # Parts mapping section
-                if bom_file:
+                if bom_df is not None:
                     st.subheader("🔗 Link to BOM Parts")
                     
                     try:
-                        bom_df = parse_bom(bom_file)
-                        
                         # Select part from BOM to link to PDF
                         part_options = bom_df["Part Number"].tolist()
                         selected_part = st.selectbox("Select BOM Part:", [""] + part_options)
@@ -387,9 +398,10 @@ with tab2:
                                     st.session_state.pdf_annotations = []
                                 
                                 annotation = {
+                                    "id": new_annotation_id(),
                                     "page": selected_page,
-                                    "x": 100,
-                                    "y": 100,
+                                    "x": 100 / zoom,
+                                    "y": 100 / zoom,
                                     "text": f"{selected_part} - {part_info.get('Description', 'N/A')}",
                                     "color": "#FF0000"
                                 }
@@ -397,6 +409,33 @@ with tab2:
                                 st.success(f"Added {selected_part} to annotations")
                                 st.rerun()
                     
+                        # Bulk link: find every BOM part number in the drawing text
+                        if st.button("🔗 Auto-link BOM Parts"):
+                            hits = part_locations(pdf_digest, pdf_bytes, file_digest(bom_file), tuple(bom_df["Part Number"].astype(str)))
+                            descriptions = bom_df.assign(_pn=bom_df["Part Number"].astype(str)).drop_duplicates("_pn").set_index("_pn").get("Description")
+                            if 'pdf_annotations' not in st.session_state:
+                                st.session_state.pdf_annotations = []
+                            existing = {(a["page"], round(a["x"], 1), round(a["y"], 1)) for a in st.session_state.pdf_annotations}
+                            added = 0
+                            for page_no, part, x0, y0, x1, y1 in hits:
+                                x, y = (x0 + x1) / 2, (y0 + y1) / 2  # PDF points
+                                if (page_no, round(x, 1), round(y, 1)) in existing:
+                                    continue
+                                desc = descriptions.get(part, 'N/A') if descriptions is not None else 'N/A'
+                                st.session_state.pdf_annotations.append({
+                                    "id": new_annotation_id(),
+                                    "page": page_no,
+                                    "x": x,
+                                    "y": y,
+                                    "text": f"{part} - {desc}",
+                                    "color": "#FF0000"
+                                })
+                                existing.add((page_no, round(x, 1), round(y, 1)))
+                                added += 1
+                            st.success(f"Linked {added} part locations ({len({h[1] for h in hits})} distinct parts found)")
+                            if added:
+                                st.rerun()
+                    
                     except Exception as e:
                         st.error(f"Error linking to BOM: {str(e)}")
                 
@@ -416,12 +455,22 @@ with tab2:
                         mime="text/csv"
                     )
                     
+                    # Annotated PDF: pins written as native (vector) PDF annotations
+                    if st.button("📄 Prepare Annotated PDF"):
+                        st.session_state.annotated_pdf = export_annotated_pdf(pdf_bytes, st.session_state.pdf_annotations)
+                    if st.session_state.get('annotated_pdf'):
+                        st.download_button(
+                            label="📥 Download Annotated PDF",
+                            data=st.session_state.annotated_pdf,
+                            file_name=pdf_file.name.rsplit(".", 1)[0] + "_annotated.pdf",
+                            mime="application/pdf"
+                        )
+                    
                     # Clear all annotations
                     if st.button("🗑️ Clear All Annotations"):
                         st.session_state.pdf_annotations = []
+                        st.session_state.annotated_pdf = None
                         st.rerun()
-            
-            pdf_document.close()
         
         except ImportError:
             st.error("Missing required libraries. Please install: `pip install PyMuPDF pillow`")
@@ -441,34 +490,18 @@ with tab3:
     
     if bom_file:
         try:
-            bom_df = parse_bom(bom_file)
+            bom_df = load_bom(file_digest(bom_file), bom_file.getvalue())
             
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("📊 Inventory Overview")
                 
-                # Mock inventory data (you can connect this to actual inventory system)
-                if 'Stock' not in bom_df.columns:
-                    # Generate mock stock data based on dataframe length
-                    stock_values = [50, 25, 100, 15, 30]
-                    while len(stock_values) < len(bom_df):
-                        stock_values.append(20)
-                    bom_df['Stock'] = stock_values[:len(bom_df)]
-                
-                if 'Min_Stock' not in bom_df.columns:
-                    # Generate mock min stock data
-                    min_stock_values = [10, 5, 20, 5, 10]
-                    while len(min_stock_values) < len(bom_df):
-                        min_stock_values.append(5)
-                    bom_df['Min_Stock'] = min_stock_values[:len(bom_df)]
-                
-                # Stock level indicators
-                bom_df['Status'] = bom_df.apply(
-                    lambda row: 'Low Stock' if row['Stock'] <= row['Min_Stock'] 
-                    else 'Good' if row['Stock'] > row['Min_Stock'] * 2 
-                    else 'Medium', axis=1
-                )
+                # Stock levels from the BOM columns or the backend inventory table
+                if not ({'Stock', 'Min_Stock'} <= set(bom_df.columns) or API_BASE_URL):
+                    st.caption("Set API_BASE_URL and API_USERNAME/API_PASSWORD (or API_TOKEN) to load stock levels from the inventory service")
+                location = st.text_input("Location (blank for all):", value="") or None
+                bom_df = with_stock_levels(bom_df, location)
                 
                 # Display stock chart
                 fig = px.bar(
@@ -476,7 +509,7 @@ with tab3:
                     x='Part Number', 
                     y='Stock',
                     color='Status',
-                    color_discrete_map={'Low Stock': 'red', 'Medium': 'orange', 'Good': 'green'},
+                    color_discrete_map={'Low Stock': 'red', 'Medium': 'orange', 'Good': 'green', 'Unknown': 'gray'},
                     title="Current Stock Levels"
                 )
                 fig.update_xaxis(tickangle=45)
@@ -485,24 +518,50 @@ with tab3:
             with col2:
                 st.subheader("⚠️ Low Stock Alerts")
                 
-                low_stock = bom_df[bom_df['Status'] == 'Low Stock']
-                if not low_stock.empty:
-                    for _, part in low_stock.iterrows():
+                low_stock_df = low_stock(bom_df)
+                if not low_stock_df.empty:
+                    for _, part in low_stock_df.head(50).iterrows():
                         st.error(f"**{part['Part Number']}**: {part['Stock']} units (Min: {part['Min_Stock']})")
+                    if len(low_stock_df) > 50:
+                        st.caption(f"... and {len(low_stock_df) - 50} more low-stock parts")
                 else:
                     st.success("All parts are adequately stocked!")
+                unknown = int((bom_df['Status'] == 'Unknown').sum())
+                if unknown:
+                    st.caption(f"{unknown} parts have no inventory record and are not counted")
+            
+            if api_configured():
+                st.subheader("🔁 Replenishment Suggestions")
+                st.caption("Reorder points and order quantities from usage history, recomputed nightly by the backend")
+                if st.button("Recompute now"):
+                    api_request("POST", "/replenishment/run")
+                    fetch_replenishment.clear()
+                suggestions = fetch_replenishment(tuple(sorted(set(bom_df["Part Number"].astype(str)))))
+                if suggestions.empty:
+                    st.success("No parts need reordering.")
+                else:
+                    st.dataframe(suggestions, hide_index=True, use_container_width=True)
+                    st.button(
+                        f"🛒 Add {len(suggestions)} suggestions to order",
+                        on_click=add_to_order,
+                        args=(list(zip(suggestions["Part Number"], suggestions["Suggested Qty"].astype(int))),),
+                    )
             
             st.subheader("📈 Quantity Analytics")
             
-            # Usage trends (mock data)
-            dates = pd.date_range(start='2024-01-01', end='2024-12-31', freq='W')
-            usage_data = pd.DataFrame({
-                'Date': dates,
-                'Parts_Used': [15 + i % 10 + (i // 10) % 5 for i in range(len(dates))]
-            })
+            # Usage trends from the backend's pre-aggregated weekly buckets
+            trend_part = st.selectbox("Usage trend for:", ["All parts"] + bom_df["Part Number"].astype(str).tolist())
+            usage_data = fetch_usage_series(
+                period="week",
+                part_number=None if trend_part == "All parts" else trend_part,
+                start=(datetime.now() - timedelta(days=365)).date().isoformat(),
+            )
             
-            fig = px.line(usage_data, x='Date', y='Parts_Used', title='Weekly Parts Usage Trend')
-            st.plotly_chart(fig, use_container_width=True)
+            if usage_data.empty:
+                st.info("No usage history available. Record usage through the inventory service to see trends.")
+            else:
+                fig = px.line(usage_data, x='Date', y='Parts_Used', title='Weekly Parts Usage Trend')
+                st.plotly_chart(fig, use_container_width=True)
         
         except Exception as e:
             st.error(f"Error processing quantities: {str(e)}")
@@ -512,134 +571,131 @@ with tab3:
 with tab4:
     st.header("Maintenance Management")
     
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        st.subheader("📅 Maintenance Schedule")
+    if not api_configured():
+        st.info("🛠️ Maintenance records are stored in the backend. Set API_BASE_URL and API_USERNAME/API_PASSWORD (or API_TOKEN) to enable this tab.")
+    else:
+        col1, col2 = st.columns([2, 1])
+        status_options = ["Scheduled", "In Progress", "Completed", "Overdue"]
         
-        # Add new maintenance record
-        with st.expander("➕ Add Maintenance Record"):
-            maint_part = st.text_input("Part/Equipment:")
-            maint_type = st.selectbox("Maintenance Type:", ["Preventive", "Corrective", "Emergency", "Inspection"])
-            maint_date = st.date_input("Scheduled Date:")
-            maint_desc = st.text_area("Description:")
-            maint_tech = st.text_input("Technician:")
+        with col1:
+            st.subheader("📅 Maintenance Schedule")
             
-            if st.button("Add Record"):
-                new_record = {
-                    "Part": maint_part,
-                    "Type": maint_type,
-                    "Date": maint_date,
-                    "Description": maint_desc,
-                    "Technician": maint_tech,
-                    "Status": "Scheduled",
-                    "Created": datetime.now()
-                }
-                st.session_state.maintenance_records.append(new_record)
-                st.success("Maintenance record added!")
-        
-        # Display maintenance records
-        if st.session_state.maintenance_records:
-            maint_df = pd.DataFrame(st.session_state.maintenance_records)
+            # Add new maintenance record
+            with st.expander("➕ Add Maintenance Record"):
+                with st.form("add_maintenance_form", clear_on_submit=True):
+                    maint_part = st.text_input("Part/Equipment:")
+                    maint_type = st.selectbox("Maintenance Type:", ["Preventive", "Corrective", "Emergency", "Inspection"])
+                    maint_date = st.date_input("Scheduled Date:")
+                    maint_desc = st.text_area("Description:")
+                    maint_tech = st.text_input("Technician:")
+                    
+                    if st.form_submit_button("Add Record"):
+                        try:
+                            api_request("POST", "/maintenance", json={
+                                "part": maint_part,
+                                "type": maint_type,
+                                "scheduled_date": maint_date.isoformat(),
+                                "description": maint_desc,
+                                "technician": maint_tech,
+                            })
+                            st.success("Maintenance record added!")
+                        except Exception as e:
+                            st.error(f"Error adding record: {str(e)}")
             
-            # Filter options
+            # Filter options (applied server-side on the status index)
             status_filter = st.multiselect(
                 "Filter by Status:",
-                ["Scheduled", "In Progress", "Completed", "Overdue"],
+                status_options,
                 default=["Scheduled", "In Progress"]
             )
             
-            if status_filter:  # Only filter if user selected something
-                filtered_maint = maint_df[maint_df["Status"].isin(status_filter)]
-            else:
-                filtered_maint = maint_df
+            try:
+                records = api_get("/maintenance", {"status": status_filter or None})
+            except Exception as e:
+                records = []
+                st.error(f"Error loading maintenance records: {str(e)}")
             
-            # Editable maintenance table
-            for idx, record in filtered_maint.iterrows():
+            # Editable maintenance table; status changes and deletes are single-row requests
+            for record in records:
                 with st.container():
                     col_info, col_status, col_actions = st.columns([3, 1, 1])
                     
                     with col_info:
-                        st.write(f"**{record['Part']}** - {record['Type']}")
-                        st.write(f"📅 {record['Date']} | 👤 {record['Technician']}")
-                        st.write(f"📝 {record['Description']}")
+                        st.write(f"**{record['part']}** - {record['type']}")
+                        st.write(f"📅 {record['scheduled_date']} | 👤 {record['technician']}")
+                        st.write(f"📝 {record['description']}")
                     
                     with col_status:
-                        status_options = ["Scheduled", "In Progress", "Completed", "Overdue"]
-                        current_status_idx = status_options.index(record["Status"]) if record["Status"] in status_options else 0
+                        current_status_idx = status_options.index(record["status"]) if record["status"] in status_options else 0
                         
                         new_status = st.selectbox(
                             "Status:",
                             status_options,
                             index=current_status_idx,
-                            key=f"status_{idx}"
+                            key=f"status_{record['id']}"
                         )
-                        if new_status != record["Status"]:
-                            # Find the original index in the full list
-                            original_idx = maint_df.index[maint_df.index == idx].tolist()[0]
-                            st.session_state.maintenance_records[original_idx]["Status"] = new_status
+                        if new_status != record["status"]:
+                            api_request("PATCH", f"/maintenance/{record['id']}", json={"status": new_status})
+                            st.rerun()
                     
                     with col_actions:
-                        if st.button("🗑️ Delete", key=f"del_{idx}"):
-                            # Find the original index in the full list
-                            original_idx = maint_df.index[maint_df.index == idx].tolist()[0]
-                            del st.session_state.maintenance_records[original_idx]
+                        if st.button("🗑️ Delete", key=f"del_{record['id']}"):
+                            api_request("DELETE", f"/maintenance/{record['id']}")
                             st.rerun()
                     
                     st.divider()
-        else:
-            st.info("No maintenance records yet. Add one above!")
-    
-    with col2:
-        st.subheader("📊 Maintenance Stats")
-        
-        if st.session_state.maintenance_records:
-            maint_df = pd.DataFrame(st.session_state.maintenance_records)
-            
-            # Status distribution
-            status_counts = maint_df["Status"].value_counts()
-            fig = px.pie(values=status_counts.values, names=status_counts.index, title="Maintenance Status Distribution")
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Type distribution
-            type_counts = maint_df["Type"].value_counts()
-            fig = px.bar(x=type_counts.index, y=type_counts.values, title="Maintenance Types")
-            st.plotly_chart(fig, use_container_width=True)
             
-            # Upcoming maintenance
-            st.subheader("🔔 Upcoming Maintenance")
-            upcoming = maint_df[
-                (maint_df["Status"] == "Scheduled") & 
-                (pd.to_datetime(maint_df["Date"]) <= datetime.now() + timedelta(days=7))
-            ]
+            if not records:
+                st.info("No maintenance records yet. Add one above!")
+        
+        with col2:
+            st.subheader("📊 Maintenance Stats")
             
-            if not upcoming.empty:
-                for _, record in upcoming.iterrows():
-                    days_until = (pd.to_datetime(record["Date"]) - datetime.now()).days
-                    if days_until <= 0:
-                        st.error(f"⚠️ **{record['Part']}** - Overdue!")
-                    elif days_until <= 3:
-                        st.warning(f"🟡 **{record['Part']}** - Due in {days_until} days")
+            try:
+                stats = api_get("/maintenance/stats")
+                
+                if stats["status"]:
+                    # Status distribution
+                    fig = px.pie(values=list(stats["status"].values()), names=list(stats["status"].keys()), title="Maintenance Status Distribution")
+                    st.plotly_chart(fig, use_container_width=True)
+                    
+                    # Type distribution
+                    fig = px.bar(x=list(stats["type"].keys()), y=list(stats["type"].values()), title="Maintenance Types")
+                    st.plotly_chart(fig, use_container_width=True)
+                
+                # Upcoming maintenance (indexed range queries on the backend)
+                st.subheader("🔔 Upcoming Maintenance")
+                overdue = api_get("/maintenance/overdue")
+                upcoming = api_get("/maintenance/due", {"days": 7})
+                
+                for record in overdue:
+                    st.error(f"⚠️ **{record['part']}** - Overdue!")
+                today = datetime.now().date()
+                for record in upcoming:
+                    days_until = (datetime.fromisoformat(record["scheduled_date"]).date() - today).days
+                    if days_until <= 3:
+                        st.warning(f"🟡 **{record['part']}** - Due in {days_until} days")
                     else:
-                        st.info(f"🔵 **{record['Part']}** - Due in {days_until} days")
-            else:
-                st.success("No urgent maintenance scheduled!")
+                        st.info(f"🔵 **{record['part']}** - Due in {days_until} days")
+                if not overdue and not upcoming:
+                    st.success("No urgent maintenance scheduled!")
+            except Exception as e:
+                st.error(f"Error loading maintenance stats: {str(e)}")
 
 # Error codes section (moved to bottom)
 if error_file:
     st.subheader("📋 Common Error Codes")
     try:
-        if error_file.name.endswith("xlsx"):
-            err_df = pd.read_excel(error_file)
-        else:
-            err_df = pd.read_csv(error_file)
+        err_digest = file_digest(error_file)
+        err_df = load_table(err_digest, error_file.getvalue(), error_file.name)
         
-        # Search functionality for error codes
+        # Search functionality for error codes: the backend index answers exact, partial
+        # and description queries; without a backend fall back to the cached local haystack
         error_search = st.text_input("🔍 Search error codes:", placeholder="Enter error code or description")
-        if error_search:
-            filtered_errors = err_df[err_df.apply(lambda row: error_search.lower() in str(row).lower(), axis=1)]
-            st.dataframe(filtered_errors)
+        if api_configured():
+            ensure_imported(err_digest, err_df)
+            st.dataframe(search_codes(error_search) if error_search else err_df)
         else:
-            st.dataframe(err_df)
+            st.dataframe(filter_rows(err_df, table_search_index(err_digest, error_file.getvalue(), error_file.name), error_search))
     except Exception as e:
         st.error(f"Error reading error codes file: {str(e)}")
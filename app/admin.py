@@ -0,0 +1,43 @@
+# app/admin.py
+# Operator commands, run against the configured DATABASE_URL:
+#   python -m app.admin grant alice            # make alice an admin of her tenant
+#   python -m app.admin revoke alice --role admin
+#   python -m app.admin admins [--tenant acme]  # list admins
+# Tenants created before registration assigned the admin role have none; grant one here.
+import argparse
+import sys
+from .database import SessionLocal
+from . import crud, models
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.admin")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("grant", "revoke"):
+        p = sub.add_parser(name, help=f"{name} a role for a user")
+        p.add_argument("username")
+        p.add_argument("--role", default="admin")
+    p = sub.add_parser("admins", help="list users with the admin role")
+    p.add_argument("--tenant", help="tenant name")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command in ("grant", "revoke"):
+            user = crud.set_user_role(db, args.username, args.role, granted=args.command == "grant")
+            if user is None:
+                print(f"no such user: {args.username}", file=sys.stderr)
+                return 1
+            print(f"{user.username} (tenant {user.tenant_id}): {user.roles}")
+            return 0
+        q = db.query(models.User.username, models.Tenant.name, models.User.roles).join(models.Tenant, models.Tenant.id == models.User.tenant_id)
+        if args.tenant:
+            q = q.filter(models.Tenant.name == args.tenant)
+        for username, tenant, roles in q.order_by(models.Tenant.name, models.User.username):
+            if "admin" in crud.role_list(roles):
+                print(f"{tenant}\t{username}")
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+# app/admission.py
+# Tenant-aware admission control. Every request is charged to the tenant in its JWT
+# (or to the client address when unauthenticated) against a token bucket for its
+# endpoint class, and CPU-heavy PDF work is dispatched to a bounded number of slots
+# in weighted-fair order, so one tenant's bulk renders cannot starve the others.
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from .auth import CLAIMS_STATE_KEY, decode_token
+from .metrics import ADMISSION_REJECTED, timed
+
+RENDER, WRITE, READ = "render", "write", "read"
+RENDER_PATHS = frozenset(["/pdf/render", "/pdf/export", "/pdf/export/batch", "/annotations/auto-link"])
+EXEMPT_PATHS = frozenset(["/healthz", "/readyz", "/metrics"])
+SAFE_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parse "render=2:20,write=20:100" into {class: (refill rate per second, burst size)}."""
+    limits = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        cls, _, value = item.partition("=")
+        rate, _, burst = value.partition(":")
+        limits[cls.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "3=2,7=0.5" (tenant id = weight) into {tenant key: weight}."""
+    weights = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        tenant, _, weight = item.partition("=")
+        weights[tenant_key(tenant.strip())] = float(weight)
+    return weights
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMITS = _parse_limits(os.getenv("RATE_LIMITS", "render=2:20,write=20:100,read=100:300"))
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")  # or redis://host:6379/0
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", "0")) or os.cpu_count() or 2
+RENDER_MAX_QUEUED = int(os.getenv("RENDER_MAX_QUEUED_PER_TENANT", "20"))
+
+def tenant_key(tenant_id) -> str:
+    return f"tenant:{tenant_id}"
+
+def endpoint_class(method: str, path: str) -> Optional[str]:
+    if path in EXEMPT_PATHS:
+        return None
+    if path in RENDER_PATHS:
+        return RENDER
+    return READ if method in SAFE_METHODS else WRITE
+
+def bearer_claims(scope: Scope) -> Tuple[Optional[str], Optional[dict]]:
+    """(bearer token, its verified claims); claims are None when the token is missing or invalid."""
+    auth = dict(scope.get("headers") or []).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = auth.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None, None
+    try:
+        return token, decode_token(token)
+    except JWTError:
+        return token, None
+
+def key_from_claims(scope: Scope, claims: Optional[dict]) -> str:
+    tenant_id = claims.get("tenant_id") if claims else None
+    if tenant_id is not None:
+        return tenant_key(tenant_id)
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+def key_from_scope(scope: Scope) -> str:
+    """Tenant from a valid bearer token; no DB lookup, get_current_user still authenticates."""
+    return key_from_claims(scope, bearer_claims(scope)[1])
+
+def request_tenant_key(request) -> str:
+    return request.scope.get("state", {}).get("tenant_key") or key_from_scope(request.scope)
+
+# --- token buckets ---
+
+class BucketStore(ABC):
+    """Token-bucket state. `take` consumes `cost` tokens and returns 0 when admitted,
+    otherwise the seconds until the request would be. Implementations must make the
+    read-refill-write atomic per key."""
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        ...
+
+class MemoryBucketStore(BucketStore):
+    """Per-process buckets. Limits are per worker, so with N workers a tenant gets up to N
+    times the configured rate; use a shared store there. Also the stand-in in tests."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}  # key -> (tokens, updated, full_at)
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            return wait
+
+    def _prune(self, now: float):
+        # a bucket that has refilled completely is indistinguishable from a missing one
+        for k in [k for k, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[k]
+
+# Refill and take in one round trip. Uses the server clock so workers on different
+# hosts agree; returns the wait as a string because Redis truncates Lua numbers.
+_REDIS_TAKE = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+class RedisBucketStore(BucketStore):
+    """Buckets shared by every worker through Redis (requires the `redis` package)."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._take = self._client.register_script(_REDIS_TAKE)
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        return float(await self._take(keys=[self.prefix + key], args=[rate, burst, cost]))
+
+def make_store(spec: str = RATE_LIMIT_STORE) -> BucketStore:
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBucketStore(spec)
+    if spec != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_STORE {spec!r}")
+    return MemoryBucketStore()
+
+class AdmissionMiddleware:
+    """Rejects over-limit requests with 429 and Retry-After before the body is read,
+    and records the tenant key (for the fair scheduler) and the verified token claims
+    (for get_current_user, so the JWT is decoded once per request) in scope state."""
+
+    def __init__(self, app: ASGIApp, store: Optional[BucketStore] = None, limits: Optional[dict] = None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.app = app
+        self.store = store or make_store()
+        self.limits = RATE_LIMITS if limits is None else limits
+        self.enabled = enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        cls = endpoint_class(scope["method"], scope["path"])
+        if cls is None:
+            return await self.app(scope, receive, send)
+        token, claims = bearer_claims(scope)
+        key = key_from_claims(scope, claims)
+        state = scope.setdefault("state", {})
+        state["tenant_key"] = key
+        if claims is not None:
+            state[CLAIMS_STATE_KEY] = (token, claims)
+        limit = self.limits.get(cls)
+        if self.enabled and limit:
+            wait = await self.store.take(f"{key}:{cls}", *limit)
+            if wait > 0:
+                ADMISSION_REJECTED.labels(cls, "rate_limited").inc()
+                response = JSONResponse({"detail": f"Rate limit exceeded for {cls} requests"}, status_code=429,
+                                        headers={"Retry-After": str(math.ceil(wait))})
+                return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+# --- weighted fair queueing ---
+
+class FairScheduler:
+    """Bounded concurrency with weighted fair queueing between tenants (self-clocked:
+    virtual time is the finish tag of the job last dispatched). A tenant with weight w
+    gets w times the share of an equally busy weight-1 tenant, and an idle tenant
+    accrues no credit. Runs on the event loop; not thread-safe.
+
+    Virtual time never goes back, so a tenant's last finish tag only matters while it is
+    ahead of it: the tag is dropped once the tenant has nothing queued, and tags left
+    behind by cancelled jobs are swept once more than `max_keys` accumulate."""
+
+    def __init__(self, slots: int, weights: Optional[Dict[str, float]] = None, max_queued: int = RENDER_MAX_QUEUED, max_keys: int = 10_000):
+        self.slots = slots
+        self.weights = weights or {}
+        self.max_queued = max_queued
+        self.max_keys = max_keys
+        self.busy = 0
+        self._vtime = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._heap = []  # (finish_tag, seq, future)
+        self._queued = Counter()
+        self._seq = itertools.count()
+
+    def _finish_tag(self, key: str, cost: float) -> float:
+        tag = max(self._vtime, self._last_finish.get(key, 0.0)) + cost / self.weights.get(key, 1.0)
+        self._last_finish[key] = tag
+        if len(self._last_finish) > self.max_keys:
+            self._last_finish = {k: t for k, t in self._last_finish.items() if t > self._vtime or k == key}
+        return tag
+
+    def _forget(self, key: str):
+        # nothing of `key` is queued: a tag at or behind virtual time adds nothing to max()
+        if not self._queued[key] and self._last_finish.get(key, math.inf) <= self._vtime:
+            del self._last_finish[key]
+
+    @asynccontextmanager
+    async def slot(self, key: str, cost: float = 1.0):
+        if self.busy < self.slots and not self._heap:
+            self.busy += 1
+            self._vtime = self._finish_tag(key, cost)
+            self._forget(key)
+        else:
+            if self._queued[key] >= self.max_queued:
+                ADMISSION_REJECTED.labels(RENDER, "queue_full").inc()
+                raise HTTPException(status_code=429, detail="Too many queued render jobs", headers={"Retry-After": "1"})
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._heap, (self._finish_tag(key, cost), next(self._seq), fut))
+            self._queued[key] += 1
+            try:
+                with timed("render_queue_wait"):
+                    await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self._release()  # slot was handed over just as we were cancelled
+                else:
+                    fut.cancel()
+                raise
+            finally:
+                self._queued[key] -= 1
+                if not self._queued[key]:
+                    del self._queued[key]
+                    self._forget(key)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        while self._heap:
+            tag, _, fut = heapq.heappop(self._heap)
+            if fut.cancelled():
+                continue
+            self._vtime = tag
+            fut.set_result(None)  # hand the slot straight to the next job
+            return
+        self.busy -= 1
+
+render_scheduler = FairScheduler(RENDER_CONCURRENCY, _parse_weights(os.getenv("RENDER_TENANT_WEIGHTS", "")))
+
+async def run_render(key: str, fn, *args):
+    """Run a CPU-heavy PDF call in the threadpool once the render scheduler grants `key` a slot."""
+    async with render_scheduler.slot(key):
+        return await run_in_threadpool(fn, *args)
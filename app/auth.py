@@ -2,12 +2,13 @@
 import os
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from .database import get_db
-from .crud import get_user_by_username, verify_password
+from .crud import cached_user, verify_password
 from . import models
+from .metrics import timed
 from typing import Optional
 
 # JWT config
@@ -15,6 +16,9 @@ SECRET_KEY = os.getenv("JWT_SECRET", "super-secret-change-me")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
+# scope["state"] entry where AdmissionMiddleware leaves (token, claims) it already verified
+CLAIMS_STATE_KEY = "jwt"
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta]=None):
@@ -23,17 +27,24 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta]=None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
+def decode_token(token: str) -> dict:
+    """Verified claims of `token`; raises JWTError."""
+    with timed("jwt_decode"):
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        verified = request.scope.get("state", {}).get(CLAIMS_STATE_KEY)
+        payload = verified[1] if verified and verified[0] == token else decode_token(token)
         username: str = payload.get("sub")
         tenant_id: int = payload.get("tenant_id")
         if username is None or tenant_id is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = get_user_by_username(db, username)
+    with timed("user_lookup"):
+        user = cached_user(db, username)
     if user is None:
         raise credentials_exception
     # ensure token tenant matches user tenant
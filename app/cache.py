@@ -0,0 +1,465 @@
+# app/cache.py
+# Shared cache tier. Entries live outside the worker process (files on the local host
+# by default, under /dev/shm when it exists; Redis when configured), so every uvicorn
+# worker reads the same entries and they survive worker restarts. get_or_set coalesces
+# concurrent misses for a key into one computation: within a worker through a per-key
+# flight, across workers through a short lease taken with the backend's atomic `add`.
+# The cache is best-effort: a backend that fails (full /dev/shm, Redis down) turns reads
+# into misses and drops writes, counted in cache_errors_total, and requests carry on.
+import asyncio
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+from fastapi.concurrency import run_in_threadpool
+from .metrics import CACHE_COALESCED, CACHE_ERRORS, record_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")  # file[:/dir] | memory | none | redis://host:6379/0
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "512")) * 1024 * 1024
+CACHE_MAX_DISK_FRACTION = 0.5  # FileCache never plans to fill more of its filesystem than this
+CACHE_LEASE_SECONDS = float(os.getenv("CACHE_LEASE_SECONDS", "30"))
+DEFAULT_CACHE_DIR = "/dev/shm/wsparts-cache" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "wsparts-cache")
+
+class CacheBackend(ABC):
+    """Byte values under string keys with an optional TTL in seconds. `add` stores only
+    when the key is absent or expired and says whether it did; it must be atomic across
+    every process sharing the backend, since it backs the single-flight lease. Failures
+    raise one of `errors`, which SharedCache absorbs."""
+
+    errors: tuple = (OSError,)
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+class NullCache(CacheBackend):
+    """Stores nothing; concurrent misses within a worker are still coalesced."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def add(self, key, value, ttl=None):
+        return True
+
+    def delete(self, key):
+        pass
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU bounded by total value size. Not shared; for tests and single-worker runs."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                return False
+            self._put(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def _put(self, key, value, ttl):
+        self._pop(key)
+        self._entries[key] = (None if ttl is None else time.monotonic() + ttl, value)
+        self.size += len(value)
+        while self.size > self.max_bytes and self._entries:
+            self._pop(next(iter(self._entries)))
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+_EXPIRY = struct.Struct("!d")  # file header: absolute expiry (unix time), 0 = never
+
+class FileCache(CacheBackend):
+    """One file per key under `directory`, written to a temp file and renamed into place so
+    readers never see partial values. Shared by every process on the host; `add` relies on
+    O_EXCL. Expired files are removed when read and by a sweep that also trims the
+    directory to `max_bytes`, oldest writes first, after every max_bytes/8 bytes written.
+    `max_bytes` is capped at half the filesystem (Docker's default /dev/shm is 64 MB), and
+    a write that still finds it full sweeps right away."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        disk_cap = int(shutil.disk_usage(directory).total * CACHE_MAX_DISK_FRACTION)
+        if max_bytes > disk_cap:
+            logger.warning("cache directory %s holds %d MB; capping the cache at %d MB", directory, disk_cap * 2 >> 20, disk_cap >> 20)
+        self.max_bytes = min(max_bytes, disk_cap)
+        self._written = 0
+        self._sweep_lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        h = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, h[:2], h)
+
+    @staticmethod
+    def _expiry(ttl) -> float:
+        return 0.0 if ttl is None else time.time() + ttl
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < _EXPIRY.size:
+            return None  # an add() still writing
+        expires, = _EXPIRY.unpack_from(data)
+        if expires and expires <= time.time():
+            self._unlink_if_expired(path)  # re-checked: a set() may have just replaced it
+            return None
+        return data[_EXPIRY.size:]
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_EXPIRY.pack(self._expiry(ttl)))
+                f.write(value)
+            os.replace(tmp, path)
+        except BaseException as e:
+            os.unlink(tmp)
+            self._on_error(e)
+            raise
+        self._account(len(value))
+
+    def add(self, key, value, ttl=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+            except FileExistsError:
+                if not self._unlink_if_expired(path):
+                    return False
+                continue
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(_EXPIRY.pack(self._expiry(ttl)) + value)
+            except BaseException as e:
+                os.unlink(path)
+                self._on_error(e)
+                raise
+            self._account(len(value))
+            return True
+        return False
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _unlink_if_expired(self, path: str) -> bool:
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_EXPIRY.size)
+            if len(header) < _EXPIRY.size:
+                # an add() between create and write, unless it died there long ago
+                if time.time() - os.path.getmtime(path) < CACHE_LEASE_SECONDS:
+                    return False
+            else:
+                expires, = _EXPIRY.unpack(header)
+                if not expires or expires > time.time():
+                    return False
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _on_error(self, e: BaseException):
+        # something else filled the filesystem, or it shrank: make room for the next write
+        if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+            self._account(self.max_bytes)
+
+    def _account(self, n: int):
+        self._written += n
+        if self._written >= self.max_bytes // 8 and self._sweep_lock.acquire(blocking=False):
+            try:
+                self._written = 0
+                self.sweep()
+            finally:
+                self._sweep_lock.release()
+
+    def sweep(self):
+        now, files, total = time.time(), [], 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            for f in os.scandir(entry.path):
+                try:
+                    st = f.stat()
+                    if f.name.startswith(".tmp"):
+                        if now - st.st_mtime > CACHE_LEASE_SECONDS:
+                            os.unlink(f.path)  # left by a writer that died mid-set
+                        continue
+                    if self._unlink_if_expired(f.path):
+                        continue
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, f.path))
+                total += st.st_size
+        # also leave room for the next max_bytes/8 when others have filled the filesystem
+        free = shutil.disk_usage(self.directory).free
+        target = min(self.max_bytes * 0.9, total - (self.max_bytes // 8 - free))
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+class RedisCache(CacheBackend):
+    """Shared across hosts through Redis (requires the `redis` package)."""
+
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self.errors = (OSError, redis.RedisError)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(key, value, px=None if ttl is None else int(ttl * 1000))
+
+    def add(self, key, value, ttl=None):
+        return bool(self._client.set(key, value, nx=True, px=None if ttl is None else int(ttl * 1000)))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+def make_backend(spec: str = CACHE_BACKEND) -> CacheBackend:
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(spec)
+    kind, _, arg = spec.partition(":")
+    if kind == "file":
+        return FileCache(arg or DEFAULT_CACHE_DIR)
+    if kind == "memory":
+        return MemoryCache()
+    if kind == "none":
+        return NullCache()
+    raise ValueError(f"Unknown CACHE_BACKEND {spec!r}")
+
+class SharedCache:
+    """Namespaced access to a backend plus single-flight get_or_set. `name` labels the
+    cache_requests_total and cache_coalesced_total metrics. Backend failures are logged
+    and counted in cache_errors_total: a failed read is a miss, a failed write is dropped
+    and a failed `add` proceeds as if it stored, so callers compute and carry on."""
+
+    def __init__(self, backend: CacheBackend, namespace: str = "wsparts:1:", lease_seconds: float = CACHE_LEASE_SECONDS):
+        self.backend = backend
+        self.namespace = namespace
+        self.lease_seconds = lease_seconds
+        self._flights: Dict[str, "_Flight"] = {}
+        self._flights_lock = threading.Lock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _call(self, op: str, default, *args):
+        try:
+            return getattr(self.backend, op)(*args)
+        except self.backend.errors as e:
+            CACHE_ERRORS.labels(op).inc()
+            logger.warning("cache %s failed: %s", op, e)
+            return default
+
+    def _add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return self._call("add", True, key, value, ttl)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._call("get", None, self.namespace + key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._call("set", None, self.namespace + key, value, ttl)
+
+    def delete(self, key: str):
+        self._call("delete", None, self.namespace + key)
+
+    def generation(self, scope: str) -> str:
+        """Opaque token for `scope` to embed in cache keys; bump() makes every key built
+        from the old token unreachable. A lost token is replaced by a fresh one, never a
+        predictable default, so eviction cannot resurrect stale entries."""
+        key = self.namespace + "gen:" + scope
+        token = self._call("get", None, key)
+        if token is None:
+            fresh = uuid.uuid4().hex.encode()
+            token = fresh if self._add(key, fresh) else (self._call("get", None, key) or fresh)
+        return token.decode()
+
+    def bump(self, scope: str):
+        key = self.namespace + "gen:" + scope
+        if self._call("set", False, key, uuid.uuid4().hex.encode()) is False:
+            # removing the token also retires the old keys and needs no space
+            self._call("delete", None, key)
+
+    def get_or_set(self, name: str, key: str, compute: Callable[[], bytes], ttl: Optional[float] = None) -> bytes:
+        """Cached value, or `compute()` stored under `key`. Blocking; for threadpool callers."""
+        value = self.get(key)
+        record_cache(name, value is not None)
+        if value is not None:
+            return value
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            CACHE_COALESCED.labels(name).inc()
+            return flight.wait()
+        try:
+            flight.value = self._fill(name, key, compute, ttl)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _fill(self, name, key, compute, ttl):
+        lease = self.namespace + "lease:" + key
+        deadline, delay = time.monotonic() + self.lease_seconds, 0.005
+        acquired = self._add(lease, b"", self.lease_seconds)
+        if not acquired:
+            CACHE_COALESCED.labels(name).inc()
+        while not acquired:
+            # another worker holds the lease and is computing the value
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+            value = self.get(key)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                break  # holder died or is very slow: compute it here
+            acquired = self._add(lease, b"", self.lease_seconds)
+        try:
+            value = self.get(key)  # stored between our miss and taking the lease
+            if value is None:
+                value = compute()
+                self.set(key, value, ttl)
+            return value
+        finally:
+            if acquired:
+                self._call("delete", None, lease)
+
+    async def aget_or_set(self, name: str, key: str, compute: Callable[[], Awaitable[bytes]], ttl: Optional[float] = None) -> bytes:
+        """get_or_set for event-loop callers; `compute` is a coroutine function and backend
+        calls run in the threadpool. The computation runs as its own task, so a caller that
+        disconnects does not fail the others waiting on it. The caller whose `compute` is
+        used stays until it finishes even when cancelled, so `compute` may rely on what that
+        caller owns (e.g. its spooled upload)."""
+        value = await run_in_threadpool(self.get, key)
+        record_cache(name, value is not None)
+        if value is not None:
+            return value
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            task = self._tasks[key] = asyncio.ensure_future(self._afill(name, key, compute, ttl))
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            CACHE_COALESCED.labels(name).inc()
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            while leader and not task.done():
+                try:
+                    await asyncio.wait({task})
+                except asyncio.CancelledError:
+                    pass
+            raise
+
+    async def _afill(self, name, key, compute, ttl):
+        lease = self.namespace + "lease:" + key
+        deadline, delay = time.monotonic() + self.lease_seconds, 0.005
+        acquired = await run_in_threadpool(self._add, lease, b"", self.lease_seconds)
+        if not acquired:
+            CACHE_COALESCED.labels(name).inc()
+        while not acquired:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+            value = await run_in_threadpool(self.get, key)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                break
+            acquired = await run_in_threadpool(self._add, lease, b"", self.lease_seconds)
+        try:
+            value = await run_in_threadpool(self.get, key)
+            if value is None:
+                value = await compute()
+                await run_in_threadpool(self.set, key, value, ttl)
+            return value
+        finally:
+            if acquired:
+                await run_in_threadpool(self._call, "delete", None, lease)
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> bytes:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+cache = SharedCache(make_backend())
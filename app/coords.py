@@ -0,0 +1,23 @@
+# app/coords.py
+# Annotations are stored in PDF point space (1/72 in, page origin top-left, as
+# PyMuPDF reports it). Rendering at `zoom` maps 1 pt to `zoom` pixels.
+from typing import Optional, Sequence, Tuple
+
+def to_points(x: float, y: float, zoom: Optional[float]) -> Tuple[float, float]:
+    """Pixel coordinates at `zoom` -> PDF points; no-op when zoom is None."""
+    return (x / zoom, y / zoom) if zoom else (x, y)
+
+def annotations_at_zoom(anns: Sequence, zoom: float = 1.0) -> list:
+    """Serialize annotation rows with x/y scaled to `zoom`, one array op for the whole set."""
+    if not anns:
+        return []
+    import numpy as np
+    xy = np.array([(a.x, a.y) for a in anns], dtype=float) * zoom
+    return [
+        {
+            "id": a.id, "page": a.page, "document_key": a.document_key,
+            "x": float(x), "y": float(y), "zoom": zoom,
+            "text": a.text, "color": a.color, "created_at": a.created_at,
+        }
+        for a, (x, y) in zip(anns, xy.tolist())
+    ]
@@ -1,10 +1,29 @@
 # app/crud.py
 from sqlalchemy.orm import Session
-from . import models
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy import insert, select, update, func, or_, and_, cast, exists, text, Float
+from . import models, schemas, spatial
+from .cache import cache
+from .coords import to_points
+from .metrics import timed
+from .transfer import ImportRecordError
 from passlib.context import CryptContext
 from typing import Optional
+from datetime import datetime, date, timedelta
+from collections import defaultdict
+from contextlib import contextmanager
+from types import SimpleNamespace
+import json
+import os
+import threading
+from itertools import islice
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+ANNOTATION_CACHE_TTL = int(os.getenv("ANNOTATION_CACHE_TTL", "300"))
+ANNOTATION_FIELDS = ("id", "page", "document_key", "x", "y", "text", "color", "created_at")
+# cached user rows also expire on their own, for changes made outside the API
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_FIELDS = ("id", "username", "email", "tenant_id", "roles")
 
 def get_or_create_tenant(db: Session, name: str):
     t = db.query(models.Tenant).filter(models.Tenant.name == name).first()
@@ -14,27 +33,666 @@ def get_or_create_tenant(db: Session, name: str):
     db.add(t); db.commit(); db.refresh(t)
     return t
 
-def create_user(db: Session, username: str, password: str, tenant: models.Tenant, email: Optional[str]=None):
+def create_user(db: Session, username: str, password: str, tenant: models.Tenant, email: Optional[str]=None, roles: Optional[str]=None):
+    """roles defaults to "admin" for a tenant's first user and "user" after that. The tenant
+    row is locked first, so two concurrent registrations cannot both count as first."""
     hashed = pwd_context.hash(password) if password else None
-    user = models.User(username=username, hashed_password=hashed, tenant_id=tenant.id, email=email)
+    if roles is None:
+        db.query(models.Tenant.id).filter(models.Tenant.id == tenant.id).with_for_update().one()
+        first = db.query(models.User.id).filter(models.User.tenant_id == tenant.id).first() is None
+        roles = "admin" if first else "user"
+    user = models.User(username=username, hashed_password=hashed, tenant_id=tenant.id, email=email, roles=roles)
     db.add(user); db.commit(); db.refresh(user)
+    invalidate_users([username])
     return user
 
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
+class _NoSuchUser(Exception):
+    pass
+
+def _user_cache_key(username: str) -> str:
+    return f"user:{username}"
+
+def cached_user(db: Session, username: str) -> Optional[models.User]:
+    """The user through the shared cache, as a detached User carrying USER_CACHE_FIELDS only
+    (no password hash); enough for authorization and tenant scoping. Misses are not cached."""
+    def load() -> bytes:
+        user = get_user_by_username(db, username)
+        if user is None:
+            raise _NoSuchUser
+        return json.dumps({f: getattr(user, f) for f in USER_CACHE_FIELDS}).encode()
+    try:
+        return models.User(**json.loads(cache.get_or_set("user", _user_cache_key(username), load, USER_CACHE_TTL)))
+    except _NoSuchUser:
+        return None
+
+def role_list(roles: Optional[str]) -> list:
+    return [r for r in (roles or "").split(",") if r]
+
+def set_user_role(db: Session, username: str, role: str, granted: bool=True):
+    """Grant or revoke one role; returns the user, or None when there is no such user."""
+    user = db.query(models.User).filter(models.User.username == username).with_for_update().first()
+    if user is None:
+        return None
+    roles = [r for r in role_list(user.roles) if r != role] + ([role] if granted else [])
+    user.roles = ",".join(roles) or "user"
+    db.commit(); db.refresh(user)
+    invalidate_users([username])
+    return user
+
+def invalidate_users(usernames):
+    """Call after committing any change to these users (roles, tenant, deletion)."""
+    for username in usernames:
+        cache.delete(_user_cache_key(username))
+
 def verify_password(plain: str, hashed: str):
-    return pwd_context.verify(plain, hashed)
+    with timed("bcrypt_verify"):
+        return pwd_context.verify(plain, hashed)
 
 def create_annotation(db: Session, tenant_id: int, ann_in):
-    ann = models.Annotation(tenant_id=tenant_id, page=ann_in.page, x=ann_in.x, y=ann_in.y, text=ann_in.text, color=ann_in.color)
+    x, y = to_points(ann_in.x, ann_in.y, ann_in.zoom)
+    ann = models.Annotation(tenant_id=tenant_id, document_key=ann_in.document_key, page=ann_in.page, x=x, y=y, text=ann_in.text, color=ann_in.color)
     db.add(ann); db.commit(); db.refresh(ann)
+    spatial.on_upsert(tenant_id, ann.document_key, ann.page, ann.id, ann.x, ann.y)
+    _annotations_changed(tenant_id)
+    return ann
+
+def bulk_create_annotations(db: Session, tenant_id: int, rows: list, skip_existing: bool=False):
+    """rows: dicts with page/x/y (PDF points)/text/color and optional document_key;
+    one multi-row INSERT, one commit. With skip_existing, rows whose (document_key, page,
+    text) already has an annotation are left out, so reruns add nothing. Returns the
+    number of rows inserted."""
+    if rows and skip_existing:
+        a = models.Annotation
+        existing = set()
+        for doc in {r.get("document_key") for r in rows}:
+            texts = {r["text"] for r in rows if r.get("document_key") == doc}
+            for chunk in _chunks(texts, 500):
+                existing.update(db.query(a.document_key, a.page, a.text).filter(
+                    a.tenant_id == tenant_id, a.document_key == doc, a.text.in_(chunk)).distinct())
+        rows = [r for r in rows if (r.get("document_key"), r["page"], r["text"]) not in existing]
+    if rows:
+        db.execute(insert(models.Annotation), [{"tenant_id": tenant_id, **r} for r in rows])
+        db.commit()
+        for doc, page in {(r.get("document_key"), r["page"]) for r in rows}:
+            spatial.invalidate(tenant_id, doc, page)
+        _annotations_changed(tenant_id)
+    return len(rows)
+
+def get_annotation(db: Session, tenant_id: int, ann_id: int):
+    return db.query(models.Annotation).filter_by(id=ann_id, tenant_id=tenant_id).first()
+
+def get_annotations_by_ids(db: Session, tenant_id: int, ids: list):
+    if not ids:
+        return []
+    rows = {a.id: a for a in db.query(models.Annotation).filter(models.Annotation.tenant_id == tenant_id, models.Annotation.id.in_(ids))}
+    return [rows[i] for i in ids if i in rows]
+
+def update_annotation(db: Session, tenant_id: int, ann_id: int, changes: dict):
+    ann = get_annotation(db, tenant_id, ann_id)
+    if ann is None:
+        return None
+    zoom = changes.pop("zoom", None)
+    if zoom:
+        for k in ("x", "y"):
+            if changes.get(k) is not None:
+                changes[k] = changes[k] / zoom
+    for k, v in changes.items():
+        setattr(ann, k, v)
+    db.commit(); db.refresh(ann)
+    spatial.on_upsert(tenant_id, ann.document_key, ann.page, ann.id, ann.x, ann.y)
+    _annotations_changed(tenant_id)
     return ann
 
-def list_annotations(db: Session, tenant_id: int, page: int=0):
-    return db.query(models.Annotation).filter_by(tenant_id=tenant_id, page=page).all()
+def delete_annotation(db: Session, tenant_id: int, ann_id: int) -> bool:
+    ann = get_annotation(db, tenant_id, ann_id)
+    if ann is None:
+        return False
+    db.delete(ann); db.commit()
+    spatial.on_delete(tenant_id, ann.document_key, ann.page, ann_id)
+    _annotations_changed(tenant_id)
+    return True
+
+def list_annotations(db: Session, tenant_id: int, page: int=0, document_key: Optional[str]=None):
+    return db.query(models.Annotation).filter_by(tenant_id=tenant_id, document_key=document_key, page=page).all()
+
+def _annotations_changed(tenant_id: int):
+    cache.bump(f"annotations:{tenant_id}")
+
+def list_annotations_cached(db: Session, tenant_id: int, page: int=0, document_key: Optional[str]=None):
+    """list_annotations through the shared cache, as plain rows. Keys carry the tenant's
+    annotation generation, which every annotation write bumps."""
+    gen = cache.generation(f"annotations:{tenant_id}")
+    def load() -> bytes:
+        rows = [{f: getattr(a, f) for f in ANNOTATION_FIELDS} for a in list_annotations(db, tenant_id, page, document_key)]
+        return json.dumps(rows, default=datetime.isoformat).encode()
+    rows = json.loads(cache.get_or_set("annotations", f"annotations:{tenant_id}:{gen}:{document_key}:{page}", load, ANNOTATION_CACHE_TTL))
+    return [SimpleNamespace(**r) for r in rows]
+
+def iter_annotations_by_page(db: Session, tenant_id: int, document_key: Optional[str]):
+    """(page, [annotations]) groups in page order, fetched in batches rather than all at once."""
+    from itertools import groupby
+    q = db.query(models.Annotation).filter_by(tenant_id=tenant_id, document_key=document_key).order_by(models.Annotation.page, models.Annotation.id)
+    for page, anns in groupby(q.yield_per(2000), key=lambda a: a.page):
+        yield page, list(anns)
+
+def get_calibration(db: Session, tenant_id: int, document_key: str):
+    return db.query(models.DocumentCalibration).filter_by(tenant_id=tenant_id, document_key=document_key).first()
+
+def set_calibration(db: Session, tenant_id: int, document_key: str, cal_in):
+    """Two reference points (pixels at cal_in.zoom, or PDF points) and their real distance."""
+    x1, y1 = to_points(cal_in.x1, cal_in.y1, cal_in.zoom)
+    x2, y2 = to_points(cal_in.x2, cal_in.y2, cal_in.zoom)
+    points_per_unit = ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5 / cal_in.real_distance
+    cal = get_calibration(db, tenant_id, document_key)
+    if cal is None:
+        cal = models.DocumentCalibration(tenant_id=tenant_id, document_key=document_key)
+        db.add(cal)
+    cal.points_per_unit = points_per_unit
+    cal.unit = cal_in.unit
+    db.commit(); db.refresh(cal)
+    return cal
 
 def create_service_request(db: Session, tenant_id: int, user_id: int, sr_in):
-    sr = models.ServiceRequest(tenant_id=tenant_id, created_by=user_id, subject=sr_in.subject, description=sr_in.description, metadata=sr_in.metadata)
+    sr = models.ServiceRequest(tenant_id=tenant_id, created_by=user_id, subject=sr_in.subject, description=sr_in.description, metadata_=sr_in.metadata)
     db.add(sr); db.commit(); db.refresh(sr)
     return sr
+
+def list_inventory(db: Session, tenant_id: int, location: Optional[str]=None):
+    """Column tuples (part_number, location, stock, min_stock); avoids ORM object construction."""
+    q = db.query(models.InventoryItem.part_number, models.InventoryItem.location, models.InventoryItem.stock, models.InventoryItem.min_stock).filter(models.InventoryItem.tenant_id == tenant_id)
+    if location:
+        q = q.filter(models.InventoryItem.location == location)
+    return q.all()
+
+def list_low_stock(db: Session, tenant_id: int, location: Optional[str]=None, limit: int=500):
+    margin = models.InventoryItem.stock - models.InventoryItem.min_stock
+    q = db.query(models.InventoryItem.part_number, models.InventoryItem.location, models.InventoryItem.stock, models.InventoryItem.min_stock).filter(models.InventoryItem.tenant_id == tenant_id, margin <= 0)
+    if location:
+        q = q.filter(models.InventoryItem.location == location)
+    return q.order_by(margin).limit(limit).all()
+
+def upsert_inventory(db: Session, tenant_id: int, items):
+    """Bulk upsert of stock levels keyed on (location, part_number)."""
+    existing = {
+        (i.location, i.part_number): i
+        for i in db.query(models.InventoryItem).filter(
+            models.InventoryItem.tenant_id == tenant_id,
+            models.InventoryItem.part_number.in_({it.part_number for it in items}),
+        )
+    }
+    for it in items:
+        row = existing.get((it.location, it.part_number))
+        if row is None:
+            row = models.InventoryItem(tenant_id=tenant_id, location=it.location, part_number=it.part_number)
+            db.add(row)
+            existing[(it.location, it.part_number)] = row
+        row.stock = it.stock
+        row.min_stock = it.min_stock
+    db.commit()
+    return len(items)
+
+USAGE_PERIODS = ("day", "week")
+USAGE_ALL = "*"  # UsageRollup.category of the tenant-wide totals
+
+def bucket_start(ts: datetime, period: str) -> date:
+    d = ts.date()
+    return d - timedelta(days=d.weekday()) if period == "week" else d
+
+def _upsert_statement(db: Session, model=models.UsageAggregate):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(model)
+
+def _add_to_aggregates(db: Session, tenant_id: int, deltas: dict):
+    """deltas: {(period, bucket_start, part_number): [qty, events, category]} added onto existing
+    rows, and onto the tenant-wide and per-category roll-ups."""
+    if not deltas:
+        return
+    rows = [
+        {"tenant_id": tenant_id, "period": period, "bucket_start": bucket, "part_number": part, "category": cat, "qty": qty, "events": n}
+        for (period, bucket, part), (qty, n, cat) in deltas.items()
+    ]
+    _add_to_part_aggregates(db, tenant_id, rows)
+    rollups = defaultdict(lambda: [0, 0])
+    for (period, bucket, _), (qty, n, cat) in deltas.items():
+        for key in {USAGE_ALL, cat} - {None}:
+            r = rollups[(period, bucket, key)]
+            r[0] += qty; r[1] += n
+    _add_to_rollups(db, [
+        {"tenant_id": tenant_id, "period": period, "bucket_start": bucket, "category": cat, "qty": qty, "events": n}
+        for (period, bucket, cat), (qty, n) in rollups.items()
+    ])
+
+def _add_to_rollups(db: Session, rows: list):
+    roll = models.UsageRollup
+    stmt = _upsert_statement(db, roll)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "period", "category", "bucket_start"],
+            set_={"qty": roll.qty + stmt.excluded.qty, "events": roll.events + stmt.excluded.events},
+        )
+        db.execute(stmt, rows)
+        return
+    for r in rows:
+        row = db.query(roll).filter_by(tenant_id=r["tenant_id"], period=r["period"], category=r["category"], bucket_start=r["bucket_start"]).with_for_update().first()
+        if row is None:
+            db.add(roll(**r))
+        else:
+            row.qty += r["qty"]; row.events += r["events"]
+
+def _add_to_part_aggregates(db: Session, tenant_id: int, rows: list):
+    stmt = _upsert_statement(db)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "period", "bucket_start", "part_number"],
+            set_={
+                "qty": models.UsageAggregate.qty + stmt.excluded.qty,
+                "events": models.UsageAggregate.events + stmt.excluded.events,
+                "category": func.coalesce(stmt.excluded.category, models.UsageAggregate.category),
+            },
+        )
+        db.execute(stmt, rows)
+        return
+    for r in rows:
+        agg = db.query(models.UsageAggregate).filter_by(tenant_id=tenant_id, period=r["period"], bucket_start=r["bucket_start"], part_number=r["part_number"]).with_for_update().first()
+        if agg is None:
+            db.add(models.UsageAggregate(**r))
+        else:
+            agg.qty += r["qty"]; agg.events += r["events"]
+            agg.category = r["category"] or agg.category
+
+def _usage_deltas(events) -> dict:
+    deltas = defaultdict(lambda: [0, 0, None])
+    for e in events:
+        for period in USAGE_PERIODS:
+            d = deltas[(period, bucket_start(e["ts"], period), e["part_number"])]
+            d[0] += e["qty"]; d[1] += 1
+            d[2] = e["category"] or d[2]
+    return deltas
+
+def record_usage(db: Session, tenant_id: int, events_in):
+    """Bulk-append usage events and fold them into the day/week aggregates in the same transaction."""
+    now = datetime.utcnow()
+    events = [
+        {"tenant_id": tenant_id, "part_number": e.part_number, "category": e.category, "qty": e.qty, "ts": e.ts or now}
+        for e in events_in
+    ]
+    if not events:
+        return 0
+    _hold_usage_fence(db, tenant_id)
+    db.execute(insert(models.UsageEvent), events)
+    _add_to_aggregates(db, tenant_id, _usage_deltas(events))
+    db.commit()
+    return len(events)
+
+def rebuild_usage_aggregates(db: Session, tenant_id: int, start: date, end: date):
+    """Recompute aggregates for [start, end) from the raw log (repair/backfill job).
+    The range is widened to whole weeks (Monday to Monday) so every deleted week bucket is
+    replayed in full; returns the range actually rebuilt."""
+    start = start - timedelta(days=start.weekday())
+    end = end + timedelta(days=-end.weekday() % 7)
+    with _replenishment_lock(db, tenant_id):
+        # first write: the exclusive row lock holds back record_usage until the rebuild commits,
+        # and the next replenishment run recomputes every part (no new event ids to find them by)
+        run = models.ReplenishmentRun
+        db.query(run).filter(run.tenant_id == tenant_id).update({run.full_pending: True}, synchronize_session=False)
+        _rebuild_usage_aggregates(db, tenant_id, start, end)
+        db.commit()
+    return start, end
+
+def _rebuild_usage_aggregates(db: Session, tenant_id: int, start: date, end: date):
+    for model in (models.UsageAggregate, models.UsageRollup):
+        db.query(model).filter(
+            model.tenant_id == tenant_id,
+            model.bucket_start >= start,
+            model.bucket_start < end,
+        ).delete(synchronize_session=False)
+    q = db.query(models.UsageEvent.part_number, models.UsageEvent.category, models.UsageEvent.qty, models.UsageEvent.ts).filter(
+        models.UsageEvent.tenant_id == tenant_id,
+        models.UsageEvent.ts >= datetime.combine(start, datetime.min.time()),
+        models.UsageEvent.ts < datetime.combine(end, datetime.min.time()),
+    )
+    _add_to_aggregates(db, tenant_id, _usage_deltas(r._asdict() for r in q.yield_per(10000)))
+
+def usage_series(db: Session, tenant_id: int, period: str="week", part_number: Optional[str]=None, category: Optional[str]=None, start: Optional[date]=None, end: Optional[date]=None):
+    """Per-part series come from UsageAggregate; tenant and category series are read straight
+    from the roll-ups, one row per bucket."""
+    if part_number:
+        agg = models.UsageAggregate
+        q = db.query(agg.bucket_start, func.sum(agg.qty).label("qty"), func.sum(agg.events).label("events")).filter(
+            agg.tenant_id == tenant_id, agg.period == period, agg.part_number == part_number)
+        if category:
+            q = q.filter(agg.category == category)
+        q = q.group_by(agg.bucket_start)
+    else:
+        agg = models.UsageRollup
+        q = db.query(agg.bucket_start, agg.qty, agg.events).filter(
+            agg.tenant_id == tenant_id, agg.period == period, agg.category == (category or USAGE_ALL))
+    if start:
+        q = q.filter(agg.bucket_start >= start)
+    if end:
+        q = q.filter(agg.bucket_start < end)
+    return q.order_by(agg.bucket_start).all()
+
+REPLENISHMENT_FULL_SCAN = 5000  # above this many changed parts, scan the tenant instead of IN-lists
+PLAN_COLUMNS = ("stock", "min_stock", "avg_daily_demand", "demand_std", "safety_stock", "reorder_point", "order_up_to", "suggested_qty", "computed_at")
+
+def _chunks(seq, n: int):
+    it = iter(seq)
+    while chunk := list(islice(it, n)):
+        yield chunk
+
+def _grouped_by_part(q, part_col, parts: Optional[set]) -> dict:
+    """{part_number: aggregates} from a GROUP BY part query, restricted to `parts` when given."""
+    if parts is None or len(parts) > REPLENISHMENT_FULL_SCAN:
+        return {r[0]: r[1:] for r in q if parts is None or r[0] in parts}
+    out = {}
+    for chunk in _chunks(parts, 500):
+        out.update((r[0], r[1:]) for r in q.filter(part_col.in_(chunk)))
+    return out
+
+def _replenishment_changed_parts(db: Session, tenant_id: int, state, window_start: date) -> set:
+    ev, inv, agg, plan = models.UsageEvent, models.InventoryItem, models.UsageAggregate, models.ReplenishmentPlan
+    parts = {p for (p,) in db.query(ev.part_number).filter(ev.tenant_id == tenant_id, ev.id > state.last_event_id).distinct()}
+    # stock is compared with what the plans were computed from rather than by updated_at,
+    # which also catches deleted rows and writes that committed after the last run read them
+    stock = select(inv.part_number, func.sum(inv.stock).label("stock"), func.sum(inv.min_stock).label("min_stock")).where(
+        inv.tenant_id == tenant_id).group_by(inv.part_number).subquery()
+    parts.update(p for (p,) in db.query(stock.c.part_number).outerjoin(
+        plan, and_(plan.tenant_id == tenant_id, plan.part_number == stock.c.part_number)).filter(
+        or_(plan.id.is_(None), plan.stock != stock.c.stock, plan.min_stock != stock.c.min_stock)))
+    parts.update(p for (p,) in db.query(plan.part_number).filter(
+        plan.tenant_id == tenant_id, or_(plan.stock != 0, plan.min_stock != 0),
+        ~exists().where(inv.tenant_id == tenant_id, inv.part_number == plan.part_number)))
+    if window_start > state.window_start:
+        # usage days that slid out of the window since the last run
+        parts.update(p for (p,) in db.query(agg.part_number).filter(
+            agg.tenant_id == tenant_id, agg.period == "day", agg.bucket_start >= state.window_start, agg.bucket_start < window_start).distinct())
+    return parts
+
+REPLENISHMENT_LOCK_ID = 4201  # pg_advisory_xact_lock(REPLENISHMENT_LOCK_ID, tenant_id)
+_replenishment_locks = {}
+
+@contextmanager
+def _replenishment_lock(db: Session, tenant_id: int):
+    """Serialize replenishment runs and aggregate rebuilds per tenant, so two full runs never
+    both delete and re-insert the plans. On Postgres a transaction-level advisory lock (the
+    caller's commit releases it, across workers); elsewhere a per-process lock."""
+    if db.get_bind().dialect.name != "postgresql":
+        with _replenishment_locks.setdefault(tenant_id, threading.Lock()):
+            yield
+        return
+    db.execute(text("SELECT pg_advisory_xact_lock(:lock_id, :tenant_id)"), {"lock_id": REPLENISHMENT_LOCK_ID, "tenant_id": tenant_id})
+    try:
+        yield
+    except BaseException:
+        db.rollback()
+        raise
+
+def _ensure_replenishment_state(db: Session, tenant_id: int):
+    """Placeholder ReplenishmentRun row (full_pending) so there is always a row to lock."""
+    values = {"tenant_id": tenant_id, "params": schemas.ReplenishmentParams().dict(), "last_event_id": 0,
+              "window_start": date.min, "computed_at": datetime.min, "full_pending": True}
+    stmt = _upsert_statement(db, models.ReplenishmentRun)
+    if stmt is not None:
+        db.execute(stmt.values(values).on_conflict_do_nothing(index_elements=["tenant_id"]))
+    elif db.get(models.ReplenishmentRun, tenant_id) is None:
+        db.add(models.ReplenishmentRun(**values))
+        db.flush()
+
+def _hold_usage_fence(db: Session, tenant_id: int):
+    """Share-lock the tenant's run row until the caller commits its usage events. A run takes
+    the same row FOR UPDATE before reading max(event id), so it waits for in-flight inserts
+    and never stores a watermark above an event id that has not committed yet."""
+    run = models.ReplenishmentRun
+    q = db.query(run.tenant_id).filter(run.tenant_id == tenant_id).with_for_update(read=True)
+    if q.first() is None:
+        _ensure_replenishment_state(db, tenant_id)
+        q.first()
+
+def _replenishment_watermark(db: Session, tenant_id: int) -> int:
+    """Highest usage event id such that every event up to it has committed. Short
+    transaction of its own: record_usage is only held back while max(id) is read."""
+    run, ev = models.ReplenishmentRun, models.UsageEvent
+    _ensure_replenishment_state(db, tenant_id)
+    db.query(run.tenant_id).filter(run.tenant_id == tenant_id).with_for_update().one()
+    last_event_id = db.query(func.max(ev.id)).filter(ev.tenant_id == tenant_id).scalar() or 0
+    db.commit()
+    return last_event_id
+
+def get_replenishment_params(db: Session, tenant_id: int) -> dict:
+    state = db.get(models.ReplenishmentRun, tenant_id)
+    return state.params if state else schemas.ReplenishmentParams().dict()
+
+def run_replenishment(db: Session, tenant_id: int, params: Optional[dict]=None, full: bool=False, today: Optional[date]=None) -> dict:
+    """Recompute reorder points and suggested orders from daily usage and current stock.
+    Incremental by default: only parts with new usage events, stock that differs from their
+    plan or usage days that left the window since the last run. The first run, any run with
+    changed params and the first run after an aggregate rebuild recompute the whole catalog."""
+    from .inventory import replenishment_plan
+    started = datetime.utcnow()
+    last_event_id = _replenishment_watermark(db, tenant_id)
+    with _replenishment_lock(db, tenant_id):
+        state = db.get(models.ReplenishmentRun, tenant_id)
+        params = params or state.params
+        today = today or started.date()
+        window_start = today - timedelta(days=params["window_days"] - 1)
+        agg, inv, plan_model = models.UsageAggregate, models.InventoryItem, models.ReplenishmentPlan
+        full = full or state.full_pending or state.params != params
+        parts = None if full else _replenishment_changed_parts(db, tenant_id, state, window_start)
+
+        with timed("replenishment_compute"):
+            demand = _grouped_by_part(
+                db.query(agg.part_number, func.sum(agg.qty), func.sum(cast(agg.qty, Float) * agg.qty)).filter(
+                    agg.tenant_id == tenant_id, agg.period == "day", agg.bucket_start >= window_start, agg.bucket_start <= today,
+                ).group_by(agg.part_number),
+                agg.part_number, parts,
+            )
+            stock = _grouped_by_part(
+                db.query(inv.part_number, func.sum(inv.stock), func.sum(inv.min_stock)).filter(inv.tenant_id == tenant_id).group_by(inv.part_number),
+                inv.part_number, parts,
+            )
+            keys = sorted(parts if parts is not None else demand.keys() | stock.keys())
+            d = [demand.get(k, (0, 0)) for k in keys]
+            s = [stock.get(k, (0, 0)) for k in keys]
+            stock_col = [int(x[0] or 0) for x in s]
+            min_col = [int(x[1] or 0) for x in s]
+            plan = replenishment_plan([float(x[0] or 0) for x in d], [float(x[1] or 0) for x in d], stock_col, min_col,
+                                      params["window_days"], params["lead_time_days"], params["service_level"], params["cover_days"])
+            cols = [stock_col, min_col] + [plan[c].tolist() for c in PLAN_COLUMNS[2:-1]]
+            rows = [
+                {"tenant_id": tenant_id, "part_number": k, "computed_at": started, **dict(zip(PLAN_COLUMNS, vals))}
+                for k, *vals in zip(keys, *cols)
+            ]
+
+        with timed("replenishment_write"):
+            if full:
+                db.query(plan_model).filter(plan_model.tenant_id == tenant_id).delete(synchronize_session=False)
+            stmt = None if full else _upsert_statement(db, plan_model)
+            if rows and stmt is not None:
+                stmt = stmt.on_conflict_do_update(index_elements=["tenant_id", "part_number"], set_={c: stmt.excluded[c] for c in PLAN_COLUMNS})
+                db.execute(stmt, rows)
+            elif rows:
+                if not full:
+                    for chunk in _chunks(keys, 500):
+                        db.query(plan_model).filter(plan_model.tenant_id == tenant_id, plan_model.part_number.in_(chunk)).delete(synchronize_session=False)
+                db.execute(insert(plan_model.__table__), rows)
+        # a run that waited on another may hold the older watermark; everything up to the newer one is committed too
+        state.last_event_id = max(last_event_id, state.last_event_id)
+        state.params, state.window_start, state.computed_at, state.full_pending = params, window_start, started, False
+        db.commit()
+    suggested = db.query(func.count()).select_from(plan_model).filter(plan_model.tenant_id == tenant_id, plan_model.suggested_qty > 0).scalar()
+    return {"full": full, "recomputed": len(rows), "suggested": suggested, "seconds": round((datetime.utcnow() - started).total_seconds(), 3)}
+
+def list_replenishment(db: Session, tenant_id: int, only_suggested: bool=False, limit: int=1000, part_numbers: Optional[list]=None):
+    """Plans ordered by urgency: furthest below the reorder point first. `part_numbers`
+    restricts to those parts (e.g. one BOM) before the limit is applied."""
+    p = models.ReplenishmentPlan
+    q = db.query(p).filter(p.tenant_id == tenant_id)
+    if only_suggested:
+        q = q.filter(p.suggested_qty > 0)
+    if part_numbers is None:
+        return q.order_by(p.stock - p.reorder_point, p.part_number).limit(limit).all()
+    rows = [r for chunk in _chunks(set(part_numbers), 500) for r in q.filter(p.part_number.in_(chunk))]
+    rows.sort(key=lambda r: (r.stock - r.reorder_point, r.part_number))
+    return rows[:limit]
+
+def replenishment_order_lines(db: Session, tenant_id: int, limit: int=1000):
+    p = models.ReplenishmentPlan
+    return db.query(p.part_number, p.suggested_qty).filter(p.tenant_id == tenant_id, p.suggested_qty > 0).order_by(p.stock - p.reorder_point, p.part_number).limit(limit).all()
+
+def create_maintenance(db: Session, tenant_id: int, user_id: int, m_in):
+    rec = models.MaintenanceRecord(tenant_id=tenant_id, created_by=user_id, **m_in.dict())
+    db.add(rec); db.commit(); db.refresh(rec)
+    return rec
+
+def list_maintenance(db: Session, tenant_id: int, statuses: Optional[list]=None):
+    q = db.query(models.MaintenanceRecord).filter(models.MaintenanceRecord.tenant_id == tenant_id)
+    if statuses:
+        q = q.filter(models.MaintenanceRecord.status.in_(statuses))
+    return q.order_by(models.MaintenanceRecord.scheduled_date).all()
+
+def maintenance_due(db: Session, tenant_id: int, days: int, today: Optional[date]=None):
+    """Scheduled items with today <= scheduled_date <= today + days (index range scan)."""
+    today = today or date.today()
+    m = models.MaintenanceRecord
+    return db.query(m).filter(
+        m.tenant_id == tenant_id, m.status == "Scheduled",
+        m.scheduled_date >= today, m.scheduled_date <= today + timedelta(days=days),
+    ).order_by(m.scheduled_date).all()
+
+def maintenance_overdue(db: Session, tenant_id: int, today: Optional[date]=None):
+    """Flagged Overdue, or still Scheduled with a past date if the sweep has not run yet."""
+    today = today or date.today()
+    m = models.MaintenanceRecord
+    return db.query(m).filter(
+        m.tenant_id == tenant_id,
+        or_(m.status == "Overdue", and_(m.status == "Scheduled", m.scheduled_date < today)),
+    ).order_by(m.scheduled_date).all()
+
+def maintenance_stats(db: Session, tenant_id: int):
+    m = models.MaintenanceRecord
+    by_status = db.query(m.status, func.count()).filter(m.tenant_id == tenant_id).group_by(m.status).all()
+    by_type = db.query(m.type, func.count()).filter(m.tenant_id == tenant_id).group_by(m.type).all()
+    return {"status": dict(by_status), "type": dict(by_type)}
+
+def update_maintenance_status(db: Session, tenant_id: int, record_id: int, status: str) -> bool:
+    res = db.execute(
+        update(models.MaintenanceRecord)
+        .where(models.MaintenanceRecord.id == record_id, models.MaintenanceRecord.tenant_id == tenant_id)
+        .values(status=status, updated_at=datetime.utcnow())
+    )
+    db.commit()
+    return res.rowcount > 0
+
+def delete_maintenance(db: Session, tenant_id: int, record_id: int) -> bool:
+    n = db.query(models.MaintenanceRecord).filter_by(id=record_id, tenant_id=tenant_id).delete(synchronize_session=False)
+    db.commit()
+    return n > 0
+
+def mark_overdue_maintenance(db: Session, today: Optional[date]=None) -> int:
+    """Bulk flip Scheduled -> Overdue for every tenant in one statement."""
+    today = today or date.today()
+    res = db.execute(
+        update(models.MaintenanceRecord)
+        .where(models.MaintenanceRecord.status == "Scheduled", models.MaintenanceRecord.scheduled_date < today)
+        .values(status="Overdue", updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return res.rowcount
+
+def replace_error_codes(db: Session, tenant_id: int, codes_in, digest: Optional[str]=None):
+    """Swap the tenant's whole catalog in one transaction (last duplicate code wins) and
+    record which upload (`digest`) it came from."""
+    from .error_codes import normalize_code
+    rows = {normalize_code(c.code): {"tenant_id": tenant_id, "code": normalize_code(c.code), "description": c.description, "details": c.details or {}} for c in codes_in}
+    db.query(models.ErrorCode).filter(models.ErrorCode.tenant_id == tenant_id).delete(synchronize_session=False)
+    if rows:
+        db.execute(insert(models.ErrorCode), list(rows.values()))
+    db.merge(models.ErrorCodeCatalog(tenant_id=tenant_id, digest=digest, codes=len(rows), imported_at=datetime.utcnow()))
+    db.commit()
+    return len(rows)
+
+def _export_statement(tenant_id: int, table: str):
+    if table == "annotations":
+        A = models.Annotation
+        return select(A.id, A.document_key, A.page, A.x, A.y, A.text, A.color, A.created_at).where(A.tenant_id == tenant_id).order_by(A.id)
+    if table == "service_requests":
+        S, U = models.ServiceRequest, models.User
+        return (select(S.id, S.subject, S.description, S.metadata_.label("metadata"), S.status, S.created_at, U.username.label("created_by"))
+                .outerjoin(U, U.id == S.created_by).where(S.tenant_id == tenant_id).order_by(S.id))
+    if table == "users":
+        U = models.User
+        return select(U.id, U.username, U.email, U.roles, U.hashed_password, U.created_at).where(U.tenant_id == tenant_id).order_by(U.id)
+    raise ValueError(f"Unknown table {table!r}")
+
+def iter_tenant_export(db: Session, tenant_id: int, table: str, batch_size: int=2000):
+    """Rows of one tenant table as dicts, fetched `batch_size` at a time through a
+    server-side cursor (yield_per) so the table is never loaded whole."""
+    result = db.execute(_export_statement(tenant_id, table).execution_options(yield_per=batch_size))
+    for row in result.mappings():
+        yield dict(row)
+
+def import_tenant_rows(db: Session, tenant_id: int, table: str, records, batch_size: int=5000):
+    """Insert decoded records in chunks of `batch_size`, one multi-row INSERT and one commit
+    per chunk; yields (imported, skipped) after each commit. Users whose username or email
+    already exists anywhere are skipped and imported users never keep elevated roles;
+    service request authors are matched by username among the tenant's users. A chunk the
+    database rejects is rolled back and raised as ImportRecordError at its first record."""
+    first = 1
+    for chunk in _chunks(records, batch_size):
+        with timed("tenant_import_batch"):
+            now = datetime.utcnow()
+            for r in chunk:
+                r["created_at"] = r["created_at"] or now
+            try:
+                if table == "annotations":
+                    imported = bulk_create_annotations(db, tenant_id, chunk)
+                else:
+                    rows = _import_rows(db, tenant_id, table, chunk)
+                    if rows:
+                        # Core insert on the table: keys are column names ("metadata", not "metadata_")
+                        db.execute(insert(_IMPORT_MODELS[table].__table__), rows)
+                    db.commit()
+                    if table == "users":
+                        invalidate_users(r["username"] for r in rows)
+                    imported = len(rows)
+            except (IntegrityError, DataError) as e:
+                db.rollback()
+                raise ImportRecordError(first, f"batch of {len(chunk)} records rejected by the database: {e.orig}") from e
+        first += len(chunk)
+        yield imported, len(chunk) - imported
+
+_IMPORT_MODELS = {"service_requests": models.ServiceRequest, "users": models.User}
+
+def _import_rows(db: Session, tenant_id: int, table: str, chunk: list) -> list:
+    U = models.User
+    if table == "users":
+        usernames = {r["username"] for r in chunk}
+        emails = {r["email"] for r in chunk if r["email"]}
+        taken = set(db.scalars(select(U.username).where(U.username.in_(usernames))))
+        taken_emails = set(db.scalars(select(U.email).where(U.email.in_(emails)))) if emails else set()
+        rows = []
+        for r in chunk:
+            if r["username"] in taken or r["email"] in taken_emails:
+                continue
+            taken.add(r["username"])
+            if r["email"]:
+                taken_emails.add(r["email"])
+            # roles are granted on this side (python -m app.admin), never taken from the file
+            rows.append({"tenant_id": tenant_id, **r, "roles": "user"})
+        return rows
+    if table == "service_requests":
+        authors = {r["created_by"] for r in chunk if r["created_by"]}
+        ids = dict(db.execute(select(U.username, U.id).where(U.tenant_id == tenant_id, U.username.in_(authors))).all()) if authors else {}
+        return [{"tenant_id": tenant_id, **r, "created_by": ids.get(r["created_by"])} for r in chunk]
+    raise ValueError(f"Unknown table {table!r}")
@@ -0,0 +1,129 @@
+# app/error_codes.py
+# Per-tenant in-memory lookup index over the imported error-code catalog.
+# Exact codes hit a dict, partial codes bisect a sorted key list (prefix range),
+# and descriptions go through an inverted token index.
+import bisect
+import heapq
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from . import models
+from .cache import NullCache, cache
+from .metrics import record_cache
+
+# only used when the shared cache is disabled (CACHE_BACKEND=none) and there is no version to compare
+INDEX_TTL_SECONDS = int(os.getenv("ERROR_CODE_INDEX_TTL", "300"))
+_TOKEN = re.compile(r"\w+")
+
+def normalize_code(code: str) -> str:
+    return str(code).strip().upper()
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+class ErrorCodeIndex:
+    def __init__(self, rows, version: Optional[str] = None):
+        self.by_code: Dict[str, dict] = {}
+        self.tokens: Dict[str, frozenset] = {}
+        postings: Dict[str, set] = {}
+        for r in rows:
+            key = normalize_code(r["code"])
+            self.by_code[key] = r
+            self.tokens[key] = frozenset(tokenize(r.get("description")))
+            for tok in self.tokens[key]:
+                postings.setdefault(tok, set()).add(key)
+        self.codes = sorted(self.by_code)
+        self.postings = postings
+        self.vocab = sorted(postings)
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def exact(self, code: str) -> Optional[dict]:
+        return self.by_code.get(normalize_code(code))
+
+    def _prefix_range(self, keys: List[str], prefix: str, limit: Optional[int] = None) -> List[str]:
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + "\uffff")
+        return keys[lo:hi if limit is None else min(hi, lo + limit)]
+
+    def prefix(self, partial: str, limit: int = 50) -> List[dict]:
+        return [self.by_code[k] for k in self._prefix_range(self.codes, normalize_code(partial), limit)]
+
+    def text(self, query: str, limit: int = 50) -> List[dict]:
+        """All query tokens must match; the last token also matches as a prefix (type-ahead).
+        Every vocabulary token in the prefix range counts, however short the prefix; when
+        the whole tokens already narrow the codes down further than that range, the
+        survivors are checked against the prefix instead of expanding it."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        *whole, last = tokens
+        expansion = self._prefix_range(self.vocab, last)
+        if whole:
+            hits = set.intersection(*sorted((self.postings.get(t, set()) for t in whole), key=len))
+            if len(hits) <= len(expansion):
+                hits = {k for k in hits if any(t.startswith(last) for t in self.tokens[k])}
+            else:
+                hits &= set().union(*(self.postings[t] for t in expansion))
+        else:
+            hits = set().union(*(self.postings[t] for t in expansion))
+        return [self.by_code[k] for k in heapq.nsmallest(limit, hits)]
+
+    def search(self, q: str, limit: int = 50) -> List[dict]:
+        """Exact match first, then code-prefix matches, then description matches."""
+        seen, out = set(), []
+        exact = self.exact(q)
+        for r in ([exact] if exact else []) + self.prefix(q, limit) + self.text(q, limit):
+            key = normalize_code(r["code"])
+            if key not in seen:
+                seen.add(key); out.append(r)
+            if len(out) >= limit:
+                break
+        return out
+
+_indexes: Dict[int, ErrorCodeIndex] = {}
+_loading: Dict[int, threading.Lock] = {}
+
+def _load_rows(db: Session, tenant_id: int):
+    q = db.query(models.ErrorCode.code, models.ErrorCode.description, models.ErrorCode.details).filter(models.ErrorCode.tenant_id == tenant_id)
+    return [{"code": c, "description": d, "details": x or {}} for c, d, x in q]
+
+def _version(tenant_id: int) -> Optional[str]:
+    """Catalog version shared by every worker through the cache generation; invalidate()
+    in the worker that took an import bumps it. None when the shared cache is disabled."""
+    if isinstance(cache.backend, NullCache):
+        return None
+    return cache.generation(f"error_codes:{tenant_id}")
+
+def _fresh(idx: Optional[ErrorCodeIndex], version: Optional[str]) -> bool:
+    if idx is None:
+        return False
+    if version is None:
+        return time.monotonic() - idx.loaded_at < INDEX_TTL_SECONDS
+    return idx.version == version
+
+def get_index(db: Session, tenant_id: int) -> ErrorCodeIndex:
+    """Built on first use per worker and rebuilt when the tenant's catalog version moves,
+    so an import through any worker is visible on the next request. Rebuilds of one
+    tenant are coalesced; other tenants never wait on them."""
+    version = _version(tenant_id)
+    idx = _indexes.get(tenant_id)
+    if _fresh(idx, version):
+        record_cache("error_code_index", True)
+        return idx
+    with _loading.setdefault(tenant_id, threading.Lock()):
+        idx = _indexes.get(tenant_id)
+        if _fresh(idx, version):
+            record_cache("error_code_index", True)
+            return idx
+        record_cache("error_code_index", False)
+        idx = _indexes[tenant_id] = ErrorCodeIndex(_load_rows(db, tenant_id), version)
+    return idx
+
+def invalidate(tenant_id: int):
+    _indexes.pop(tenant_id, None)
+    if not isinstance(cache.backend, NullCache):
+        cache.bump(f"error_codes:{tenant_id}")
@@ -0,0 +1,62 @@
+# app/inventory.py
+# Vectorized stock classification and overview helpers (no DB access here).
+# numpy is imported on first use to keep API worker start-up light.
+from typing import TYPE_CHECKING, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+LOW_STOCK = "Low Stock"
+MEDIUM = "Medium"
+GOOD = "Good"
+UNKNOWN = "Unknown"  # part has no inventory record
+
+def classify_stock(stock: Sequence, min_stock: Sequence) -> "np.ndarray":
+    """Low when stock <= min, Good when stock > 2 * min, Medium otherwise."""
+    import numpy as np
+    stock = np.asarray(stock)
+    min_stock = np.asarray(min_stock)
+    return np.select([stock <= min_stock, stock > min_stock * 2], [LOW_STOCK, GOOD], default=MEDIUM)
+
+def stock_overview(rows) -> list:
+    """rows: iterable of (part_number, location, stock, min_stock) tuples as returned by
+    crud.list_inventory. Classification runs once over the whole column set."""
+    rows = list(rows)
+    if not rows:
+        return []
+    import numpy as np
+    part_numbers, locations, stock, min_stock = zip(*rows)
+    statuses = classify_stock(np.fromiter(stock, dtype=np.int64, count=len(rows)), np.fromiter(min_stock, dtype=np.int64, count=len(rows)))
+    return [
+        {"part_number": p, "location": l, "stock": s, "min_stock": m, "status": st}
+        for p, l, s, m, st in zip(part_numbers, locations, stock, min_stock, statuses.tolist())
+    ]
+
+def replenishment_plan(demand_sum, demand_sq_sum, stock, min_stock, window_days: int, lead_time_days: float,
+                       service_level: float, cover_days: float) -> dict:
+    """Reorder points for a whole catalog in one pass. `demand_sum`/`demand_sq_sum` are each part's
+    sum and sum of squares of daily usage over `window_days` (days without usage count as zero).
+
+        safety_stock  = z(service_level) * std_daily * sqrt(lead_time)
+        reorder_point = max(mean_daily * lead_time + safety_stock, min_stock)
+        order_up_to   = reorder_point + mean_daily * cover_days
+        suggested     = order_up_to - stock once stock <= reorder_point, else 0
+    """
+    import numpy as np
+    from statistics import NormalDist
+    n = float(window_days)
+    total = np.asarray(demand_sum, dtype=np.float64)
+    mean = total / n
+    var = np.maximum(np.asarray(demand_sq_sum, dtype=np.float64) / n - mean * mean, 0.0) * (n / (n - 1))
+    std = np.sqrt(var)
+    stock = np.asarray(stock, dtype=np.int64)
+    min_stock = np.asarray(min_stock, dtype=np.int64)
+    safety = np.ceil(NormalDist().inv_cdf(service_level) * std * np.sqrt(lead_time_days))
+    reorder_point = np.maximum(np.ceil(mean * lead_time_days + safety), min_stock)
+    order_up_to = np.maximum(np.ceil(reorder_point + mean * cover_days), reorder_point)
+    suggested = np.where(stock <= reorder_point, np.maximum(order_up_to - stock, 0), 0)
+    return {
+        "avg_daily_demand": mean, "demand_std": std,
+        "safety_stock": safety.astype(np.int64), "reorder_point": reorder_point.astype(np.int64),
+        "order_up_to": order_up_to.astype(np.int64), "suggested_qty": suggested.astype(np.int64),
+    }
@@ -0,0 +1,89 @@
+# app/jobs.py
+# Periodic background jobs run inside each API worker. Jobs must be idempotent,
+# since every worker runs its own loop. The replenishment run fires at a fixed UTC time
+# of day rather than relative to each worker's start; deployments with many workers can
+# turn it off here (REPLENISHMENT_AT=) and run `python -m app.jobs replenish` from cron.
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, time, timedelta
+from fastapi.concurrency import run_in_threadpool
+from .database import SessionLocal
+from . import crud, models
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_SWEEP_SECONDS = int(os.getenv("MAINTENANCE_SWEEP_SECONDS", "300"))
+REPLENISHMENT_AT = os.getenv("REPLENISHMENT_AT", "02:00")  # HH:MM UTC, empty to disable
+
+def sweep_overdue_maintenance() -> int:
+    db = SessionLocal()
+    try:
+        return crud.mark_overdue_maintenance(db)
+    finally:
+        db.close()
+
+def replenish_all_tenants() -> int:
+    """Incremental replenishment run for every tenant with each tenant's saved params. A
+    tenant whose run fails is logged and skipped; the others still run."""
+    db = SessionLocal()
+    try:
+        recomputed = 0
+        for (tenant_id,) in db.query(models.Tenant.id).all():
+            try:
+                recomputed += crud.run_replenishment(db, tenant_id)["recomputed"]
+            except Exception:
+                db.rollback()
+                logger.exception("replenishment run for tenant %s failed", tenant_id)
+        return recomputed
+    finally:
+        db.close()
+
+async def _run_job(fn):
+    try:
+        n = await run_in_threadpool(fn)
+        if n:
+            logger.info("%s updated %s rows", fn.__name__, n)
+    except Exception:
+        logger.exception("periodic job %s failed", fn.__name__)
+
+async def _run_periodically(fn, interval: int):
+    while True:
+        await _run_job(fn)
+        await asyncio.sleep(interval)
+
+def _seconds_until(at: time, now: datetime) -> float:
+    """Seconds from `now` to the next `at` (UTC time of day)."""
+    target = datetime.combine(now.date(), at)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+async def _run_daily(fn, at: time):
+    while True:
+        await asyncio.sleep(_seconds_until(at, datetime.utcnow()))
+        await _run_job(fn)
+
+_tasks = []
+
+def start_periodic_jobs():
+    if MAINTENANCE_SWEEP_SECONDS > 0:
+        _tasks.append(asyncio.create_task(_run_periodically(sweep_overdue_maintenance, MAINTENANCE_SWEEP_SECONDS)))
+    if REPLENISHMENT_AT:
+        _tasks.append(asyncio.create_task(_run_daily(replenish_all_tenants, time.fromisoformat(REPLENISHMENT_AT))))
+
+async def stop_periodic_jobs():
+    for t in _tasks:
+        t.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+JOBS = {"sweep": sweep_overdue_maintenance, "replenish": replenish_all_tenants}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one background job once, e.g. from cron.")
+    parser.add_argument("job", choices=sorted(JOBS))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    logger.info("%s updated %s rows", args.job, JOBS[args.job]())
@@ -1,20 +1,30 @@
 # app/main.py
+import io
 import os
-from fastapi import FastAPI
+import struct
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
-from . import models
-from .routes import users, annotations, service
+from .database import engine
+from .routes import health, users, annotations, service, inventory, usage, maintenance, error_codes, documents, pdf, replenishment, transfer
+from .jobs import start_periodic_jobs, stop_periodic_jobs
 from .pdf_utils import render_pdf_page_to_png
 from fastapi.responses import StreamingResponse
 from fastapi import File, UploadFile
+from .uploads import spool_upload, UploadLimitMiddleware
+from .metrics import MetricsMiddleware, instrument_engine, metrics_endpoint
+from .admission import AdmissionMiddleware, request_tenant_key, run_render
+from .cache import cache
 
-# Create DB tables (dev). In prod use Alembic.
-Base.metadata.create_all(bind=engine)
+RENDER_CACHE_TTL = int(os.getenv("RENDER_CACHE_TTL", "3600"))
+_RENDER_SIZE = struct.Struct("!II")  # cached render: width, height, then the PNG
 
 app = FastAPI(title="Warehouse Spare Parts API (multi-tenant)")
+instrument_engine(engine)
 
-# CORS
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
+# CORS last, so it is outermost: 429s and 413s from the middlewares above carry CORS headers too
 origins = os.getenv("CORS_ORIGINS", "*").split(",")
 app.add_middleware(
     CORSMiddleware,
@@ -24,12 +34,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(health.router)
 app.include_router(users.router)
 app.include_router(annotations.router)
 app.include_router(service.router)
+app.include_router(inventory.router)
+app.include_router(usage.router)
+app.include_router(replenishment.router)
+app.include_router(maintenance.router)
+app.include_router(error_codes.router)
+app.include_router(documents.router)
+app.include_router(pdf.router)
+app.include_router(transfer.router)
+
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+@app.on_event("startup")
+async def _start_jobs():
+    start_periodic_jobs()
+
+@app.on_event("shutdown")
+async def _stop_jobs():
+    await stop_periodic_jobs()
 
 @app.post("/pdf/render")
-async def render_pdf(file: UploadFile = File(...), page: int = 0, zoom: float = 1.5):
-    data = await file.read()
-    png, w, h = render_pdf_page_to_png(data, page_number=page, zoom=zoom)
-    return StreamingResponse(io.BytesIO(png), media_type="image/png")
+async def render_pdf(request: Request, file: UploadFile = File(...), page: int = 0, zoom: float = 1.5):
+    async with spool_upload(file) as upload:
+        async def render() -> bytes:
+            png, w, h = await run_render(request_tenant_key(request), render_pdf_page_to_png, upload.path, page, zoom)
+            return _RENDER_SIZE.pack(w, h) + png
+        # keyed by content, so identical drawings uploaded by any worker or tenant render once
+        data = await cache.aget_or_set("render", f"render:{upload.sha256}:{page}:{zoom}", render, RENDER_CACHE_TTL)
+    w, h = _RENDER_SIZE.unpack_from(data)
+    # pixel = point * zoom; clients use X-Zoom to request annotations in the same space
+    headers = {"X-Image-Width": str(w), "X-Image-Height": str(h), "X-Zoom": str(zoom)}
+    return StreamingResponse(io.BytesIO(memoryview(data)[_RENDER_SIZE.size:]), media_type="image/png", headers=headers)
@@ -0,0 +1,159 @@
+# app/metrics.py
+# Prometheus metrics and hot-path timing. Exposed at GET /metrics.
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+UNTRACKED_PATHS = frozenset(["/metrics", "/healthz", "/readyz"])
+FAST_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency", ["method", "route", "status"])
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "DB queries issued per request", ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100))
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time spent in DB queries per request", ["route"], buckets=FAST_BUCKETS)
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "Single DB statement latency", ["operation"], buckets=FAST_BUCKETS)
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Hot-path stage timings", ["stage"], buckets=FAST_BUCKETS)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups", ["cache", "result"])
+CACHE_COALESCED = Counter("cache_coalesced_total", "Cache misses that waited for another request's computation", ["cache"])
+CACHE_ERRORS = Counter("cache_errors_total", "Cache backend operations that failed and were skipped", ["op"])
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requests rejected by admission control", ["endpoint_class", "reason"])
+
+# per-request DB accounting; None outside a request
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+
+@contextmanager
+def timed(stage: str):
+    """Observe the wall time of a block under stage_duration_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+# --- SQLAlchemy ---
+
+def instrument_engine(engine: Engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERY_SECONDS.labels(statement.lstrip().split(" ", 1)[0].upper()).observe(elapsed)
+        acc = _request_db.get()
+        if acc is not None:
+            acc[0] += 1
+            acc[1] += elapsed
+
+    REGISTRY.register(_PoolCollector(engine))
+
+class _PoolCollector:
+    """Pool utilization read at scrape time. Pools without a fixed size (SQLite) report what they can."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def collect(self):
+        pool = self.engine.pool
+        for name, attr, doc in (
+            ("db_pool_size", "size", "Configured pool size"),
+            ("db_pool_checked_out", "checkedout", "Connections currently in use"),
+            ("db_pool_checked_in", "checkedin", "Idle connections in the pool"),
+            ("db_pool_overflow", "overflow", "Connections above pool size"),
+        ):
+            value = getattr(pool, attr, None)
+            if value is not None:
+                g = GaugeMetricFamily(name, doc)
+                # SingletonThreadPool (in-memory SQLite) has a plain `size` attribute
+                g.add_metric([], value() if callable(value) else value)
+                yield g
+
+# --- ASGI middleware ---
+
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))  # 0 disables profiling
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/wsparts-profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+
+class _StackSampler(threading.Thread):
+    """Samples every thread's stack at a fixed interval while a request runs. Sync endpoints
+    execute in the threadpool, so the event-loop thread alone would show nothing useful.
+    Concurrent requests appear in the same profile; use it on a quiet worker."""
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stacks = _Tally()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = ";".join(f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})" for f in traceback.extract_stack(frame))
+                self.stacks[stack] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def dump(self, path: str):
+        # collapsed-stack format: feed to flamegraph.pl or load in speedscope
+        with open(path, "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in UNTRACKED_PATHS:
+            return await self.app(scope, receive, send)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        acc = [0, 0.0]
+        token = _request_db.set(acc)
+        sampler = _StackSampler(PROFILE_INTERVAL) if PROFILE_SLOW_MS > 0 else None
+        if sampler:
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_db.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route, str(status["code"])).observe(elapsed)
+            REQUEST_DB_QUERIES.labels(route).observe(acc[0])
+            REQUEST_DB_SECONDS.labels(route).observe(acc[1])
+            if sampler:
+                sampler.stop()
+                if elapsed * 1000 >= PROFILE_SLOW_MS:
+                    os.makedirs(PROFILE_DIR, exist_ok=True)
+                    name = f"{int(time.time() * 1000)}_{scope['method']}{route.replace('/', '_')}_{int(elapsed * 1000)}ms.collapsed"
+                    sampler.dump(os.path.join(PROFILE_DIR, name))
+
+def metrics_endpoint(request=None) -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
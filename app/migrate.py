@@ -0,0 +1,109 @@
+# app/migrate.py
+# Explicit schema step, run once per deploy (`python -m app.migrate`) instead of at import
+# time in every API worker. create_all only adds missing tables and indexes; column
+# changes on existing tables are the hand-written steps in MIGRATIONS.
+import logging
+import os
+import time
+from datetime import datetime
+from sqlalchemy import Integer, inspect, select, text
+from sqlalchemy.exc import OperationalError
+from .database import engine, Base
+from . import models  # noqa: F401  (registers tables on Base.metadata)
+
+logger = logging.getLogger(__name__)
+
+MIGRATE_TIMEOUT_SECONDS = int(os.getenv("MIGRATE_TIMEOUT_SECONDS", "60"))
+# zoom the Streamlit client rendered at when annotations were stored as pixels
+ANNOTATION_LEGACY_ZOOM = float(os.getenv("ANNOTATION_LEGACY_ZOOM", "1.5"))
+
+def wait_for_db(timeout: float = MIGRATE_TIMEOUT_SECONDS):
+    """Retry until the database accepts connections, so a migrate job started alongside
+    the database does not fail on its first attempt."""
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    while True:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return
+        except OperationalError:
+            if time.monotonic() + delay > deadline:
+                raise
+            logger.warning("database not reachable, retrying in %.1fs", delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
+
+def missing_tables(conn) -> list:
+    return sorted(set(Base.metadata.tables) - set(inspect(conn).get_table_names()))
+
+def _columns(conn, table: str) -> set:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+def add_replenishment_full_pending(conn):
+    if "full_pending" not in _columns(conn, "replenishment_runs"):
+        conn.execute(text("ALTER TABLE replenishment_runs ADD COLUMN full_pending BOOLEAN NOT NULL DEFAULT FALSE"))
+
+def annotations_in_points(conn):
+    """annotations.x/y: integer pixels at ANNOTATION_LEGACY_ZOOM -> float PDF points, plus
+    the document_key column and the (tenant, document, page, x, y) index."""
+    cols = {c["name"]: c["type"] for c in inspect(conn).get_columns("annotations")}
+    if "document_key" not in cols:
+        conn.execute(text("ALTER TABLE annotations ADD COLUMN document_key VARCHAR(64)"))
+    if isinstance(cols["x"], Integer):
+        if conn.dialect.name == "sqlite":
+            # no ALTER COLUMN TYPE: copy into a freshly created table (which brings the new indexes)
+            table = models.Annotation.__table__
+            names = ", ".join(c.name for c in table.columns)
+            scaled = ", ".join(f"{c.name} / :zoom" if c.name in ("x", "y") else c.name for c in table.columns)
+            conn.execute(text("ALTER TABLE annotations RENAME TO annotations_pixels"))
+            for index in inspect(conn).get_indexes("annotations_pixels"):
+                conn.execute(text(f"DROP INDEX {index['name']}"))
+            table.create(conn)
+            conn.execute(text(f"INSERT INTO annotations ({names}) SELECT {scaled} FROM annotations_pixels"), {"zoom": ANNOTATION_LEGACY_ZOOM})
+            conn.execute(text("DROP TABLE annotations_pixels"))
+        else:
+            conn.execute(text(f"ALTER TABLE annotations ALTER COLUMN x TYPE DOUBLE PRECISION USING x / {ANNOTATION_LEGACY_ZOOM!r}, "
+                              f"ALTER COLUMN y TYPE DOUBLE PRECISION USING y / {ANNOTATION_LEGACY_ZOOM!r}"))
+        logger.info("annotations.x/y converted to PDF points (divided by zoom %s)", ANNOTATION_LEGACY_ZOOM)
+    indexes = {i["name"] for i in inspect(conn).get_indexes("annotations")}
+    if "ix_annotations_tenant_page_xy" in indexes:
+        conn.execute(text("DROP INDEX ix_annotations_tenant_page_xy"))
+    for index in models.Annotation.__table__.indexes:
+        if index.name not in indexes:
+            index.create(conn)
+
+def backfill_usage_rollups(conn):
+    """usage_rollups from the per-part aggregates recorded before it existed."""
+    if conn.execute(text("SELECT 1 FROM usage_rollups LIMIT 1")).first() is not None:
+        return
+    for category in ("'*'", "category"):
+        conn.execute(text(
+            "INSERT INTO usage_rollups (tenant_id, period, category, bucket_start, qty, events) "
+            f"SELECT tenant_id, period, {category}, bucket_start, SUM(qty), SUM(events) FROM usage_aggregates "
+            f"WHERE {category} IS NOT NULL GROUP BY tenant_id, period, {category}, bucket_start"))
+
+# Column changes on tables that already exist, in order. Each step checks the live schema
+# first, so rerunning (or running on a database create_all just built) is a no-op.
+MIGRATIONS = (annotations_in_points, add_replenishment_full_pending, backfill_usage_rollups)
+SCHEMA_VERSION = len(MIGRATIONS)  # steps are only ever appended
+
+def schema_version(conn) -> int:
+    """Version recorded by the last completed migrate(), 0 when it never ran."""
+    return conn.execute(select(models.SchemaVersion.version)).scalar() or 0
+
+def migrate(timeout: float = MIGRATE_TIMEOUT_SECONDS):
+    wait_for_db(timeout)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for step in MIGRATIONS:
+            step(conn)
+        # written in the same transaction, so the marker never gets ahead of the steps
+        table = models.SchemaVersion.__table__
+        conn.execute(table.delete())
+        conn.execute(table.insert().values(id=1, version=SCHEMA_VERSION, migrated_at=datetime.utcnow()))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
+    logger.info("schema up to date")
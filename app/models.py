@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, BigInteger, Boolean, Float, String, Date, DateTime, ForeignKey, JSON, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -22,11 +22,13 @@ class User(Base):
 
 class Annotation(Base):
     __tablename__ = "annotations"
+    __table_args__ = (Index("ix_annotations_tenant_doc_page_xy", "tenant_id", "document_key", "page", "x", "y"),)
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    document_key = Column(String(64), nullable=True)  # sha256 of the PDF
     page = Column(Integer, default=0)
-    x = Column(Integer)
-    y = Column(Integer)
+    x = Column(Float)  # PDF points, independent of render zoom
+    y = Column(Float)
     text = Column(Text)
     color = Column(String, default="#FF0000")
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -38,6 +40,153 @@ class ServiceRequest(Base):
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     subject = Column(String, nullable=False)
     description = Column(Text)
-    metadata = Column(JSON, default={})
+    metadata_ = Column("metadata", JSON, default={})  # `metadata` is reserved on declarative models
     status = Column(String, default="open")
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class InventoryItem(Base):
+    __tablename__ = "inventory_items"
+    __table_args__ = (UniqueConstraint("tenant_id", "location", "part_number", name="uq_inventory_tenant_location_part"),)
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    location = Column(String, nullable=False, default="main")
+    part_number = Column(String, nullable=False)
+    stock = Column(Integer, nullable=False, default=0)
+    min_stock = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Expression index so low-stock queries are a range scan on (tenant, stock - min_stock)
+Index("ix_inventory_tenant_margin", InventoryItem.tenant_id, InventoryItem.stock - InventoryItem.min_stock)
+
+class UsageEvent(Base):
+    """Append-only log of consumed parts. Never updated; read only to rebuild roll-ups."""
+    __tablename__ = "usage_events"
+    __table_args__ = (
+        Index("ix_usage_events_tenant_ts", "tenant_id", "ts"),
+        Index("ix_usage_events_ts_brin", "ts", postgresql_using="brin"),
+    )
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    part_number = Column(String, nullable=False)
+    category = Column(String, nullable=True)
+    qty = Column(Integer, nullable=False)
+    ts = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class UsageAggregate(Base):
+    """Usage summed per tenant/period ("day" or "week")/bucket/part, maintained on insert."""
+    __tablename__ = "usage_aggregates"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "period", "bucket_start", "part_number", name="uq_usage_agg_bucket_part"),
+        Index("ix_usage_agg_tenant_period_bucket", "tenant_id", "period", "bucket_start"),
+        # per-part history (series filters, incremental replenishment)
+        Index("ix_usage_agg_tenant_period_part", "tenant_id", "period", "part_number", "bucket_start"),
+    )
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    period = Column(String(8), nullable=False)
+    bucket_start = Column(Date, nullable=False)
+    part_number = Column(String, nullable=False)
+    category = Column(String, nullable=True)
+    qty = Column(Integer, nullable=False, default=0)
+    events = Column(Integer, nullable=False, default=0)
+
+class UsageRollup(Base):
+    """Usage summed per tenant/period/bucket over all parts (category "*") and per category,
+    maintained alongside UsageAggregate so tenant and category series skip the per-part rows."""
+    __tablename__ = "usage_rollups"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "period", "category", "bucket_start", name="uq_usage_rollup_bucket"),
+    )
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    period = Column(String(8), nullable=False)
+    category = Column(String, nullable=False)
+    bucket_start = Column(Date, nullable=False)
+    qty = Column(Integer, nullable=False, default=0)
+    events = Column(Integer, nullable=False, default=0)
+
+class ReplenishmentPlan(Base):
+    """Latest reorder point and suggested order per part, written by the replenishment run."""
+    __tablename__ = "replenishment_plans"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "part_number", name="uq_replenishment_tenant_part"),
+        Index("ix_replenishment_tenant_suggested", "tenant_id", "suggested_qty"),
+    )
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    part_number = Column(String, nullable=False)
+    stock = Column(Integer, nullable=False, default=0)
+    min_stock = Column(Integer, nullable=False, default=0)
+    avg_daily_demand = Column(Float, nullable=False, default=0)
+    demand_std = Column(Float, nullable=False, default=0)
+    safety_stock = Column(Integer, nullable=False, default=0)
+    reorder_point = Column(Integer, nullable=False, default=0)
+    order_up_to = Column(Integer, nullable=False, default=0)
+    suggested_qty = Column(Integer, nullable=False, default=0)
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ReplenishmentRun(Base):
+    """Per-tenant watermark for incremental runs: what the current plans were computed from."""
+    __tablename__ = "replenishment_runs"
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), primary_key=True)
+    params = Column(JSON, nullable=False)
+    last_event_id = Column(BigInteger().with_variant(Integer, "sqlite"), nullable=False, default=0)
+    window_start = Column(Date, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+    # set by aggregate rebuilds (and on the placeholder row): the next run recomputes everything
+    full_pending = Column(Boolean, nullable=False, default=False)
+
+MAINTENANCE_STATUSES = ("Scheduled", "In Progress", "Completed", "Overdue")
+
+class MaintenanceRecord(Base):
+    __tablename__ = "maintenance_records"
+    __table_args__ = (
+        # serves status filters and the due/overdue range scans
+        Index("ix_maintenance_tenant_status_date", "tenant_id", "status", "scheduled_date"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    part = Column(String, nullable=False)
+    type = Column(String, nullable=False, default="Preventive")
+    scheduled_date = Column(Date, nullable=False)
+    description = Column(Text)
+    technician = Column(String)
+    status = Column(String, nullable=False, default="Scheduled")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ErrorCode(Base):
+    __tablename__ = "error_codes"
+    __table_args__ = (UniqueConstraint("tenant_id", "code", name="uq_error_codes_tenant_code"),)
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    code = Column(String, nullable=False)
+    description = Column(Text)
+    details = Column(JSON, default={})
+
+class ErrorCodeCatalog(Base):
+    """Which upload the tenant's error codes were last replaced from, so clients skip re-importing it."""
+    __tablename__ = "error_code_catalogs"
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), primary_key=True)
+    digest = Column(String(64), nullable=True)  # sha256 of the uploaded file, when the client sent one
+    codes = Column(Integer, nullable=False, default=0)
+    imported_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class DocumentCalibration(Base):
+    __tablename__ = "document_calibrations"
+    __table_args__ = (UniqueConstraint("tenant_id", "document_key", name="uq_calibration_tenant_doc"),)
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    document_key = Column(String(64), nullable=False)
+    points_per_unit = Column(Float, nullable=False)
+    unit = Column(String, nullable=False, default="mm")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SchemaVersion(Base):
+    """Single row written by app.migrate once every step has run; readiness compares it
+    with the number of steps this build knows."""
+    __tablename__ = "schema_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    migrated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
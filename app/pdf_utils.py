@@ -1,15 +1,125 @@
 # app/pdf_utils.py
-# Utilities for rendering and scaling PDFs (server-side helpers)
-from typing import Tuple
-import fitz  # PyMuPDF
-from PIL import Image
-import io
+# Utilities for rendering and scaling PDFs (server-side helpers).
+# PyMuPDF is imported on first use so API workers that never render start faster.
+import os
+from typing import TYPE_CHECKING, Iterable, List, Tuple, Union
+from .metrics import timed
 
-def render_pdf_page_to_png(pdf_bytes: bytes, page_number: int = 0, zoom: float = 1.5) -> Tuple[bytes, int, int]:
+if TYPE_CHECKING:
+    import fitz
+
+PdfSource = Union[bytes, str, os.PathLike]
+
+def open_pdf(source: PdfSource) -> "fitz.Document":
+    """Open from a file path (pages are read from disk on demand) or from bytes."""
+    import fitz  # PyMuPDF
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(os.fspath(source), filetype="pdf")
+
+def render_pdf_page_to_png(source: PdfSource, page_number: int = 0, zoom: float = 1.5) -> Tuple[bytes, int, int]:
     """Render pdf page to PNG bytes, return (png_bytes, width_px, height_px)."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    page = doc.load_page(page_number)
-    mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat, alpha=False)
-    png = pix.tobytes("png")
-    return png, pix.width, pix.height
+    import fitz  # PyMuPDF
+    with timed("render_open"):
+        doc = open_pdf(source)
+    try:
+        with timed("render_load_page"):
+            page = doc.load_page(page_number)
+        mat = fitz.Matrix(zoom, zoom)
+        with timed("render_rasterize"):
+            pix = page.get_pixmap(matrix=mat, alpha=False)
+        with timed("render_png_encode"):
+            png = pix.tobytes("png")
+        return png, pix.width, pix.height
+    finally:
+        doc.close()
+
+_STRIP = " \t.,;:()[]{}<>\"'"
+
+def normalize_part_number(s) -> str:
+    return str(s).strip(_STRIP).upper()
+
+def find_part_locations(source: PdfSource, part_numbers: Iterable[str]) -> List[Tuple[int, str, float, float, float, float]]:
+    """Locate BOM part numbers in the drawing text layer.
+
+    One pass over the words of every page: each word (and each run of up to k
+    adjacent words on the same line, k = longest multi-word part number) is
+    looked up in a hash set of normalized part numbers. Returns
+    (page, part_number, x0, y0, x1, y1) in PDF points for every occurrence.
+    """
+    wanted = {}
+    for p in part_numbers:
+        key = normalize_part_number(p)
+        if key:
+            wanted.setdefault(" ".join(key.split()), str(p))
+    if not wanted:
+        return []
+    max_words = max(len(k.split()) for k in wanted)
+    hits = []
+    doc = open_pdf(source)
+    try:
+        for page_no in range(doc.page_count):
+            # (x0, y0, x1, y1, word, block_no, line_no, word_no), in reading order
+            words = doc.load_page(page_no).get_text("words")
+            for i, w in enumerate(words):
+                for n in range(1, max_words + 1):
+                    if i + n > len(words):
+                        break
+                    run = words[i:i + n]
+                    if n > 1 and (run[-1][5], run[-1][6]) != (w[5], w[6]):
+                        break  # runs never cross a text line
+                    key = normalize_part_number(" ".join(r[4] for r in run))
+                    if key in wanted:
+                        hits.append((page_no, wanted[key], min(r[0] for r in run), min(r[1] for r in run), max(r[2] for r in run), max(r[3] for r in run)))
+    finally:
+        doc.close()
+    return hits
+
+PIN_RADIUS = 5.0  # points
+LABEL_FONTSIZE = 7
+
+def hex_to_rgb(color: str) -> Tuple[float, float, float]:
+    c = (color or "#FF0000").lstrip("#")
+    if len(c) == 3:
+        c = "".join(ch * 2 for ch in c)
+    try:
+        return tuple(int(c[i:i + 2], 16) / 255 for i in (0, 2, 4))
+    except ValueError:
+        return (1.0, 0.0, 0.0)
+
+def burn_annotations(source: PdfSource, out_path: str, pages: Iterable[Tuple[int, Iterable]]) -> int:
+    """Write pins into the original document as native PDF annotations (circle marker plus
+    free-text label), so the export stays vector and close to the source size.
+
+    `pages` yields (page_number, annotations) groups in page order, each annotation
+    having x/y in PDF points, text and color; rows are consumed one page at a time.
+    Returns the number of annotations written.
+    """
+    import fitz  # PyMuPDF
+    doc = open_pdf(source)
+    written = 0
+    try:
+        for page_number, anns in pages:
+            if not 0 <= page_number < doc.page_count:
+                continue
+            page = doc.load_page(page_number)
+            derotate = page.derotation_matrix  # our coordinates follow page.rect (rotated view)
+            for a in anns:
+                rgb = hex_to_rgb(a.color)
+                x, y = a.x, a.y
+                pin = page.add_circle_annot(fitz.Rect(x - PIN_RADIUS, y - PIN_RADIUS, x + PIN_RADIUS, y + PIN_RADIUS) * derotate)
+                pin.set_colors(stroke=(1, 1, 1), fill=rgb)
+                pin.set_border(width=1)
+                pin.set_info(content=a.text or "")
+                pin.update()
+                label = (a.text or "")[:40]
+                if label:
+                    # laid out in the visible orientation, then mapped back like the pin
+                    width = LABEL_FONTSIZE * 0.55 * len(label) + 4
+                    box = fitz.Rect(x + PIN_RADIUS + 2, y - LABEL_FONTSIZE, x + PIN_RADIUS + 2 + width, y + LABEL_FONTSIZE) * derotate
+                    page.add_freetext_annot(box, label, fontsize=LABEL_FONTSIZE, text_color=rgb, rotate=page.rotation).update()
+                written += 1
+        doc.save(out_path, garbage=3, deflate=True)
+    finally:
+        doc.close()
+    return written
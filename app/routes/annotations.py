@@ -1,18 +1,79 @@
 # app/routes/annotations.py
-from fastapi import APIRouter, Depends, HTTPException
+# Coordinates are stored in PDF points. Endpoints that take or return positions accept
+# a `zoom`: inputs are treated as pixels at that zoom, outputs are scaled to it.
+from fastapi import APIRouter, Depends, HTTPException, File, Form, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..auth import get_current_user
-from .. import crud, schemas
+from ..pdf_utils import find_part_locations
+from ..uploads import spool_upload
+from ..admission import run_render, tenant_key
+from ..coords import annotations_at_zoom
+from typing import Optional
+from .. import crud, schemas, spatial
 
 router = APIRouter(prefix="/annotations", tags=["annotations"])
 
 @router.post("", response_model=schemas.AnnotationOut, status_code=201)
 def create_annotation(ann: schemas.AnnotationIn, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     created = crud.create_annotation(db, tenant_id=current_user.tenant_id, ann_in=ann)
-    return created
+    return annotations_at_zoom([created], ann.zoom or 1.0)[0]
 
 @router.get("", response_model=list[schemas.AnnotationOut])
-def list_annotations(page: int = 0, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    anns = crud.list_annotations(db, tenant_id=current_user.tenant_id, page=page)
-    return anns
+def list_annotations(page: int = 0, document_key: Optional[str] = None, zoom: float = Query(1.0, gt=0),
+                     db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    anns = crud.list_annotations_cached(db, tenant_id=current_user.tenant_id, page=page, document_key=document_key)
+    return annotations_at_zoom(anns, zoom)
+
+@router.get("/within", response_model=list[schemas.AnnotationOut])
+def annotations_within(page: int, x0: float, y0: float, x1: float, y1: float, document_key: Optional[str] = None,
+                       zoom: float = Query(1.0, gt=0), limit: int = Query(1000, ge=1, le=10000),
+                       db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Pins inside a viewport rectangle (pixels at `zoom`), for culling off-screen markers."""
+    idx = spatial.get_index(db, current_user.tenant_id, document_key, page)
+    ids = idx.within(x0 / zoom, y0 / zoom, x1 / zoom, y1 / zoom, limit=limit)
+    return annotations_at_zoom(crud.get_annotations_by_ids(db, current_user.tenant_id, ids), zoom)
+
+@router.get("/nearest", response_model=schemas.AnnotationOut)
+def nearest_annotation(page: int, x: float, y: float, document_key: Optional[str] = None, zoom: float = Query(1.0, gt=0),
+                       max_distance: Optional[float] = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Resolve a click (pixels at `zoom`) to the closest pin on the page."""
+    idx = spatial.get_index(db, current_user.tenant_id, document_key, page)
+    while True:
+        hit = idx.nearest(x / zoom, y / zoom, max_distance=max_distance / zoom if max_distance is not None else None)
+        if hit is None:
+            raise HTTPException(status_code=404, detail="No annotation near this point")
+        ann = crud.get_annotation(db, current_user.tenant_id, hit[0])
+        if ann is not None:
+            return annotations_at_zoom([ann], zoom)[0]
+        idx.remove(hit[0])  # deleted through another worker since the index was loaded: try the next one
+
+@router.patch("/{ann_id}", response_model=schemas.AnnotationOut)
+def update_annotation(ann_id: int, changes: schemas.AnnotationUpdate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    ann = crud.update_annotation(db, current_user.tenant_id, ann_id, changes.dict(exclude_unset=True))
+    if ann is None:
+        raise HTTPException(status_code=404, detail="Annotation not found")
+    return annotations_at_zoom([ann], changes.zoom or 1.0)[0]
+
+@router.delete("/{ann_id}", status_code=204)
+def delete_annotation(ann_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not crud.delete_annotation(db, current_user.tenant_id, ann_id):
+        raise HTTPException(status_code=404, detail="Annotation not found")
+
+@router.post("/auto-link", status_code=201)
+async def auto_link_parts(file: UploadFile = File(...), part_numbers: list[str] = Form(...), document_key: Optional[str] = None,
+                          color: str = "#FF0000", db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Match BOM part numbers against the drawing text and pin each occurrence at its centre.
+    document_key defaults to the sha256 of the uploaded file. Pages where a part is already
+    pinned are skipped, so running it again on the same drawing adds nothing."""
+    async with spool_upload(file) as upload:
+        hits = await run_render(tenant_key(current_user.tenant_id), find_part_locations, upload.path, part_numbers)
+        document_key = document_key or upload.sha256
+    rows = [
+        {"document_key": document_key, "page": page, "x": (x0 + x1) / 2, "y": (y0 + y1) / 2, "text": part, "color": color}
+        for page, part, x0, y0, x1, y1 in hits
+    ]
+    created = await run_in_threadpool(crud.bulk_create_annotations, db, current_user.tenant_id, rows, True)
+    matched = {r["text"] for r in rows}
+    return {"created": created, "skipped": len(rows) - created, "matched_parts": len(matched), "unmatched_parts": len(set(part_numbers) - matched)}
@@ -0,0 +1,28 @@
+# app/routes/documents.py
+# Per-document settings. Documents are identified by the sha256 of the PDF bytes.
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..auth import get_current_user
+from .. import crud, schemas
+
+router = APIRouter(prefix="/documents", tags=["documents"])
+
+DOCUMENT_KEY = Path(..., max_length=64)  # document_calibrations.document_key is String(64)
+
+def _calibration_out(cal, zoom: float):
+    return {"document_key": cal.document_key, "unit": cal.unit, "points_per_unit": cal.points_per_unit, "zoom": zoom, "px_per_unit": cal.points_per_unit * zoom}
+
+@router.put("/{document_key}/calibration", response_model=schemas.CalibrationOut)
+def set_calibration(payload: schemas.CalibrationIn, document_key: str = DOCUMENT_KEY, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if (payload.x1, payload.y1) == (payload.x2, payload.y2):
+        raise HTTPException(status_code=400, detail="Calibration points must differ")
+    cal = crud.set_calibration(db, current_user.tenant_id, document_key, payload)
+    return _calibration_out(cal, payload.zoom or 1.0)
+
+@router.get("/{document_key}/calibration", response_model=schemas.CalibrationOut)
+def get_calibration(document_key: str = DOCUMENT_KEY, zoom: float = Query(1.0, gt=0), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    cal = crud.get_calibration(db, current_user.tenant_id, document_key)
+    if cal is None:
+        raise HTTPException(status_code=404, detail="Document is not calibrated")
+    return _calibration_out(cal, zoom)
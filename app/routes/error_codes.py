@@ -0,0 +1,32 @@
+# app/routes/error_codes.py
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..auth import get_current_user
+from .. import crud, models, schemas, error_codes
+
+router = APIRouter(prefix="/error-codes", tags=["error-codes"])
+
+@router.post("", status_code=201)
+def import_error_codes(codes: list[schemas.ErrorCodeIn], digest: Optional[str] = Query(None, max_length=64, description="sha256 of the source file"),
+                       db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    n = crud.replace_error_codes(db, tenant_id=current_user.tenant_id, codes_in=codes, digest=digest)
+    error_codes.invalidate(current_user.tenant_id)
+    return {"imported": n}
+
+@router.get("/catalog", response_model=schemas.ErrorCodeCatalogOut)
+def error_code_catalog(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Digest of the upload the current catalog came from; clients compare it before re-importing."""
+    return db.get(models.ErrorCodeCatalog, current_user.tenant_id) or {"digest": None}
+
+@router.get("/search", response_model=list[schemas.ErrorCodeOut])
+def search_error_codes(q: str = Query(..., min_length=1), limit: int = Query(50, ge=1, le=500), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return error_codes.get_index(db, current_user.tenant_id).search(q, limit)
+
+@router.get("/{code}", response_model=schemas.ErrorCodeOut)
+def get_error_code(code: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    hit = error_codes.get_index(db, current_user.tenant_id).exact(code)
+    if hit is None:
+        raise HTTPException(status_code=404, detail="Unknown error code")
+    return hit
@@ -0,0 +1,45 @@
+# app/routes/health.py
+# Liveness says the process is serving; readiness says it can do useful work
+# (database reachable and migrated). Orchestrators should restart on the former
+# and only route traffic on the latter.
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from ..database import engine
+from ..migrate import SCHEMA_VERSION, missing_tables, schema_version
+
+router = APIRouter(tags=["health"])
+
+_schema_checked = False
+
+@router.get("/healthz")
+async def liveness():
+    return {"status": "ok"}
+
+def _check_ready():
+    global _schema_checked
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        if not _schema_checked:
+            missing = missing_tables(conn)
+            if missing:
+                return {"status": "unavailable", "reason": "schema not migrated", "missing_tables": missing}
+            # tables alone do not say the column steps ran; app.migrate records its version last.
+            # A newer version is fine: old workers keep serving during a rolling deploy.
+            version = schema_version(conn)
+            if version < SCHEMA_VERSION:
+                return {"status": "unavailable", "reason": "schema not migrated", "schema_version": version, "expected": SCHEMA_VERSION}
+            _schema_checked = True  # migrations are not undone at runtime; afterwards only ping
+    return None
+
+@router.get("/readyz")
+async def readiness():
+    try:
+        problem = await run_in_threadpool(_check_ready)
+    except SQLAlchemyError:
+        problem = {"status": "unavailable", "reason": "database unreachable"}
+    if problem:
+        return JSONResponse(status_code=503, content=problem)
+    return {"status": "ready"}
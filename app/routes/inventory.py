@@ -0,0 +1,22 @@
+# app/routes/inventory.py
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..database import get_db
+from ..auth import get_current_user
+from ..inventory import stock_overview
+from .. import crud, schemas
+
+router = APIRouter(prefix="/inventory", tags=["inventory"])
+
+@router.get("", response_model=list[schemas.InventoryItemOut])
+def list_inventory(location: Optional[str] = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return stock_overview(crud.list_inventory(db, tenant_id=current_user.tenant_id, location=location))
+
+@router.get("/low-stock", response_model=list[schemas.InventoryItemOut])
+def low_stock(location: Optional[str] = None, limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return stock_overview(crud.list_low_stock(db, tenant_id=current_user.tenant_id, location=location, limit=limit))
+
+@router.post("", status_code=200)
+def upsert_inventory(items: list[schemas.InventoryItemIn], db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return {"updated": crud.upsert_inventory(db, tenant_id=current_user.tenant_id, items=items)}
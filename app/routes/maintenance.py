@@ -0,0 +1,39 @@
+# app/routes/maintenance.py
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..database import get_db
+from ..auth import get_current_user
+from .. import crud, schemas
+
+router = APIRouter(prefix="/maintenance", tags=["maintenance"])
+
+@router.post("", response_model=schemas.MaintenanceOut, status_code=201)
+def create_maintenance(payload: schemas.MaintenanceIn, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return crud.create_maintenance(db, tenant_id=current_user.tenant_id, user_id=current_user.id, m_in=payload)
+
+@router.get("", response_model=list[schemas.MaintenanceOut])
+def list_maintenance(status: Optional[list[str]] = Query(None), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return crud.list_maintenance(db, tenant_id=current_user.tenant_id, statuses=status)
+
+@router.get("/due", response_model=list[schemas.MaintenanceOut])
+def maintenance_due(days: int = Query(7, ge=0, le=366), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return crud.maintenance_due(db, tenant_id=current_user.tenant_id, days=days)
+
+@router.get("/overdue", response_model=list[schemas.MaintenanceOut])
+def maintenance_overdue(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return crud.maintenance_overdue(db, tenant_id=current_user.tenant_id)
+
+@router.get("/stats")
+def maintenance_stats(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return crud.maintenance_stats(db, tenant_id=current_user.tenant_id)
+
+@router.patch("/{record_id}", status_code=204)
+def update_status(record_id: int, payload: schemas.MaintenanceStatusUpdate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not crud.update_maintenance_status(db, tenant_id=current_user.tenant_id, record_id=record_id, status=payload.status):
+        raise HTTPException(status_code=404, detail="Maintenance record not found")
+
+@router.delete("/{record_id}", status_code=204)
+def delete_maintenance(record_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if not crud.delete_maintenance(db, tenant_id=current_user.tenant_id, record_id=record_id):
+        raise HTTPException(status_code=404, detail="Maintenance record not found")
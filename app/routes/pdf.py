@@ -0,0 +1,102 @@
+# app/routes/pdf.py
+# Annotated PDF export. Pins are written as native PDF annotations into the
+# original drawing (no rasterization) and the result is streamed from disk.
+import os
+import re
+import tempfile
+import zipfile
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..database import get_db
+from ..auth import get_current_user
+from ..pdf_utils import burn_annotations
+from ..uploads import spool_upload, CHUNK_SIZE, UPLOAD_DIR
+from ..admission import run_render, tenant_key
+from .. import crud
+
+router = APIRouter(prefix="/pdf", tags=["pdf"])
+
+MAX_BATCH_FILES = int(os.getenv("MAX_EXPORT_BATCH_FILES", "20"))
+
+def _iter_file(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+def _stream_temp_file(path: str, media_type: str, headers: dict) -> StreamingResponse:
+    """Stream a temp file in chunks. It is removed by a background task, which Starlette
+    runs after the response whether the body was fully sent or the client went away."""
+    return StreamingResponse(_iter_file(path), media_type=media_type, headers=headers, background=BackgroundTask(os.unlink, path))
+
+def _temp_path(suffix: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_DIR)
+    os.close(fd)
+    return path
+
+def _export_one(db: Session, tenant_id: int, src_path: str, document_key: str, out_path: str) -> int:
+    return burn_annotations(src_path, out_path, crud.iter_annotations_by_page(db, tenant_id, document_key))
+
+def _download_name(filename: str, suffix: str) -> str:
+    stem = os.path.splitext(os.path.basename(filename or "drawing.pdf"))[0] or "drawing"
+    return f"{stem}{suffix}"
+
+def _content_disposition(filename: str) -> str:
+    """ASCII `filename=` for old clients plus RFC 5987 `filename*=` carrying the real name;
+    the header must stay latin-1 encodable and a quote in the name must not end the value."""
+    fallback = re.sub(r'[^\x20-\x7e]|["\\]', "_", filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+@router.post("/export")
+async def export_annotated_pdf(file: UploadFile = File(...), document_key: Optional[str] = None,
+                               db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Return the uploaded drawing with the tenant's pins for it burned in.
+    document_key defaults to the sha256 of the upload."""
+    out_path = _temp_path(".pdf")
+    try:
+        async with spool_upload(file) as upload:
+            n = await run_render(tenant_key(current_user.tenant_id), _export_one, db, current_user.tenant_id, upload.path, document_key or upload.sha256, out_path)
+    except BaseException:
+        os.unlink(out_path)
+        raise
+    headers = {
+        "Content-Disposition": _content_disposition(_download_name(upload.filename, "_annotated.pdf")),
+        "Content-Length": str(os.path.getsize(out_path)),
+        "X-Annotation-Count": str(n),
+    }
+    return _stream_temp_file(out_path, "application/pdf", headers)
+
+@router.post("/export/batch")
+async def export_annotated_batch(files: list[UploadFile] = File(...), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Export several drawings (each keyed by its sha256) into one zip. PDFs are already
+    compressed, so entries are stored rather than deflated again."""
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per batch")
+    zip_path = _temp_path(".zip")
+    try:
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
+            used = set()
+            for f in files:
+                out_path = _temp_path(".pdf")
+                try:
+                    async with spool_upload(f) as upload:
+                        await run_render(tenant_key(current_user.tenant_id), _export_one, db, current_user.tenant_id, upload.path, upload.sha256, out_path)
+                    name = _download_name(upload.filename, "_annotated.pdf")
+                    if name in used:
+                        name = _download_name(upload.filename, f"_{upload.sha256[:8]}_annotated.pdf")
+                    used.add(name)
+                    await run_in_threadpool(zf.write, out_path, name)
+                finally:
+                    os.unlink(out_path)
+    except BaseException:
+        os.unlink(zip_path)
+        raise
+    headers = {
+        "Content-Disposition": _content_disposition("annotated_drawings.zip"),
+        "Content-Length": str(os.path.getsize(zip_path)),
+    }
+    return _stream_temp_file(zip_path, "application/zip", headers)
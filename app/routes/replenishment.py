@@ -0,0 +1,35 @@
+# app/routes/replenishment.py
+from fastapi import APIRouter, Body, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..database import get_db
+from ..auth import get_current_user
+from .. import crud, schemas
+
+router = APIRouter(prefix="/replenishment", tags=["replenishment"])
+
+@router.post("/run")
+def run_replenishment(params: Optional[schemas.ReplenishmentParams] = Body(None), full: bool = False,
+                      db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Recompute plans now. Params given here are kept for later (nightly) runs."""
+    return crud.run_replenishment(db, current_user.tenant_id, params.dict() if params else None, full=full)
+
+@router.get("/params", response_model=schemas.ReplenishmentParams)
+def replenishment_params(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return crud.get_replenishment_params(db, current_user.tenant_id)
+
+@router.get("", response_model=list[schemas.ReplenishmentOut])
+def list_replenishment(only_suggested: bool = False, limit: int = Query(1000, ge=1, le=100000),
+                       db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return crud.list_replenishment(db, current_user.tenant_id, only_suggested=only_suggested, limit=limit)
+
+@router.post("/search", response_model=list[schemas.ReplenishmentOut])
+def search_replenishment(query: schemas.ReplenishmentQuery, limit: int = Query(100000, ge=1, le=100000),
+                         db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Plans for the given parts only; a POST body because a BOM's part list can outgrow a URL."""
+    return crud.list_replenishment(db, current_user.tenant_id, only_suggested=query.only_suggested, limit=limit, part_numbers=query.part_numbers)
+
+@router.get("/order", response_model=list[schemas.OrderLine])
+def replenishment_order(limit: int = Query(1000, ge=1, le=100000), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Suggested quantities as order lines, most urgent first."""
+    return [{"part_number": p, "quantity": q} for p, q in crud.replenishment_order_lines(db, current_user.tenant_id, limit=limit)]
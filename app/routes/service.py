@@ -7,7 +7,7 @@ from .. import crud, schemas
 
 router = APIRouter(prefix="/service", tags=["service"])
 
-@router.post("/request", response_model=schemas.ServiceRequestOut, status_code=201)
+@router.post("/request", response_model=schemas.ServiceRequestOut, response_model_by_alias=False, status_code=201)
 def request_service(payload: schemas.ServiceRequestIn, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     sr = crud.create_service_request(db, tenant_id=current_user.tenant_id, user_id=current_user.id, sr_in=payload)
     return sr
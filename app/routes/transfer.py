@@ -0,0 +1,62 @@
+# app/routes/transfer.py
+# Tenant backup/migration: stream a table out as NDJSON or CSV, or load one back in.
+# Imports are spooled to disk first and committed chunk by chunk, so a failure
+# part-way keeps every chunk before the bad record.
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from ..database import SessionLocal, get_db
+from ..auth import get_current_user
+from ..transfer import EXPORT_BATCH_SIZE, IMPORT_BATCH_SIZE, FORMATS, TABLES, ImportRecordError, decode, encode
+from ..uploads import spool_body
+from .. import crud
+
+router = APIRouter(prefix="/tenant", tags=["transfer"])
+
+FORMAT = Query("ndjson", regex="^(" + "|".join(FORMATS) + ")$")
+
+def _table_user(table: str, current_user = Depends(get_current_user)):
+    if table not in TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table {table}")
+    # users carry password hashes: tenant admins only
+    if table == "users" and "admin" not in crud.role_list(current_user.roles):
+        raise HTTPException(status_code=403, detail="Requires the admin role")
+    return current_user
+
+def _export_rows(tenant_id: int, table: str):
+    # own session: the generator runs while the response streams, after the request's
+    # dependencies may have been torn down
+    db = SessionLocal()
+    try:
+        yield from crud.iter_tenant_export(db, tenant_id, table, batch_size=EXPORT_BATCH_SIZE)
+    finally:
+        db.close()
+
+@router.get("/export/{table}")
+def export_table(table: str, format: str = FORMAT, current_user = Depends(_table_user)):
+    body = encode(_export_rows(current_user.tenant_id, table), format, list(TABLES[table]))
+    headers = {"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    return StreamingResponse(body, media_type=FORMATS[format], headers=headers)
+
+def _import_file(db: Session, tenant_id: int, table: str, path: str, fmt: str, batch_size: int) -> dict:
+    done = {"imported": 0, "skipped": 0, "batches": 0}
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for imported, skipped in crud.import_tenant_rows(db, tenant_id, table, decode(f, fmt, table), batch_size):
+                done["imported"] += imported
+                done["skipped"] += skipped
+                done["batches"] += 1
+    except ImportRecordError as e:
+        db.rollback()
+        # records before the failing chunk are committed; resume after imported + skipped
+        raise HTTPException(status_code=400, detail={"error": str(e), "record": e.record, **done})
+    return done
+
+@router.post("/import/{table}")
+async def import_table(table: str, request: Request, format: str = FORMAT, batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=50000),
+                       db: Session = Depends(get_db), current_user = Depends(_table_user)):
+    """Raw NDJSON or CSV body (not multipart), as produced by the matching export. Ids are
+    reassigned; returns counts of imported and skipped records and committed batches."""
+    async with spool_body(request) as body:
+        return await run_in_threadpool(_import_file, db, current_user.tenant_id, table, body.path, format, batch_size)
@@ -0,0 +1,23 @@
+# app/routes/usage.py
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date
+from ..database import get_db
+from ..auth import get_current_user
+from .. import crud, schemas
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+@router.post("", status_code=201)
+def record_usage(events: list[schemas.UsageEventIn], db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    return {"recorded": crud.record_usage(db, tenant_id=current_user.tenant_id, events_in=events)}
+
+@router.get("/series", response_model=list[schemas.UsagePoint])
+def usage_series(period: str = "week", part_number: Optional[str] = None, category: Optional[str] = None,
+                 start: Optional[date] = None, end: Optional[date] = None,
+                 db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if period not in crud.USAGE_PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(crud.USAGE_PERIODS)}")
+    rows = crud.usage_series(db, tenant_id=current_user.tenant_id, period=period, part_number=part_number, category=category, start=start, end=end)
+    return [{"bucket_start": r.bucket_start, "qty": r.qty, "events": r.events} for r in rows]
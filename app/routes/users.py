@@ -14,6 +14,7 @@ def register(u: schemas.UserCreate, db: Session = Depends(get_db)):
     existing = crud.get_user_by_username(db, u.username)
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
+    # the first user of a tenant administers it (tenant export/import of users)
     user = crud.create_user(db, username=u.username, password=u.password, tenant=tenant, email=u.email)
     return user
 
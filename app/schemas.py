@@ -1,6 +1,7 @@
 # app/schemas.py
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from pydantic import BaseModel, Field, validator
+from typing import Optional, List, Dict, Literal
+from datetime import datetime, date
 
 class Token(BaseModel):
     access_token: str
@@ -27,27 +28,152 @@ class UserOut(BaseModel):
 
 class AnnotationIn(BaseModel):
     page: int
-    x: int
-    y: int
+    x: float
+    y: float
     text: str
     color: Optional[str] = "#FF0000"
+    document_key: Optional[str] = Field(None, max_length=64)
+    zoom: Optional[float] = Field(None, gt=0, description="x/y are pixels at this zoom; omit for PDF points")
 
-class AnnotationOut(AnnotationIn):
-    id: int
-    created_at: Optional[str]
+class AnnotationUpdate(BaseModel):
+    x: Optional[float]
+    y: Optional[float]
+    text: Optional[str]
+    color: Optional[str]
+    zoom: Optional[float] = Field(None, gt=0)
 
-    class Config:
-        orm_mode = True
+    @validator("x", "y", "text", pre=True)
+    def _not_null(cls, v):
+        # may be omitted, but an explicit null would store NULL in a required column
+        if v is None:
+            raise ValueError("may not be null")
+        return v
+
+class AnnotationOut(BaseModel):
+    id: int
+    page: int
+    x: float
+    y: float
+    zoom: float = 1.0
+    text: str
+    color: Optional[str]
+    document_key: Optional[str]
+    created_at: Optional[datetime]
 
 class ServiceRequestIn(BaseModel):
     subject: str
     description: str
     metadata: Optional[Dict] = {}
 
-class ServiceRequestOut(ServiceRequestIn):
+class ServiceRequestOut(BaseModel):
     id: int
+    subject: str
+    description: Optional[str]
+    metadata: Optional[Dict] = Field(None, alias="metadata_")
     status: str
-    created_at: Optional[str]
+    created_at: Optional[datetime]
 
     class Config:
         orm_mode = True
+        allow_population_by_field_name = True
+
+class InventoryItemIn(BaseModel):
+    part_number: str
+    location: str = "main"
+    stock: int = Field(0, ge=0)
+    min_stock: int = Field(0, ge=0)
+
+class InventoryItemOut(InventoryItemIn):
+    status: str
+
+class UsageEventIn(BaseModel):
+    part_number: str
+    qty: int = Field(..., gt=0)
+    category: Optional[str] = None
+    ts: Optional[datetime] = None
+
+class UsagePoint(BaseModel):
+    bucket_start: date
+    qty: int
+    events: int
+
+class ReplenishmentParams(BaseModel):
+    lead_time_days: float = Field(14, gt=0)
+    service_level: float = Field(0.95, gt=0.5, lt=1, description="probability of not stocking out during the lead time")
+    cover_days: float = Field(30, ge=0, description="demand an order should cover beyond the reorder point")
+    window_days: int = Field(90, ge=7, le=730, description="usage history the demand estimate is based on")
+
+class ReplenishmentOut(BaseModel):
+    part_number: str
+    stock: int
+    min_stock: int
+    avg_daily_demand: float
+    demand_std: float
+    safety_stock: int
+    reorder_point: int
+    order_up_to: int
+    suggested_qty: int
+    computed_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class ReplenishmentQuery(BaseModel):
+    part_numbers: List[str] = Field(..., max_items=100000)
+    only_suggested: bool = True
+
+class OrderLine(BaseModel):
+    part_number: str
+    quantity: int
+
+MaintenanceStatus = Literal["Scheduled", "In Progress", "Completed", "Overdue"]
+
+class MaintenanceIn(BaseModel):
+    part: str
+    type: Literal["Preventive", "Corrective", "Emergency", "Inspection"] = "Preventive"
+    scheduled_date: date
+    description: Optional[str] = None
+    technician: Optional[str] = None
+
+class MaintenanceStatusUpdate(BaseModel):
+    status: MaintenanceStatus
+
+class MaintenanceOut(MaintenanceIn):
+    id: int
+    status: str
+    created_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+class ErrorCodeIn(BaseModel):
+    code: str
+    description: Optional[str] = None
+    details: Optional[Dict] = {}
+
+class ErrorCodeOut(ErrorCodeIn):
+    pass
+
+class ErrorCodeCatalogOut(BaseModel):
+    digest: Optional[str]
+    codes: int = 0
+    imported_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+class CalibrationIn(BaseModel):
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    real_distance: float = Field(..., gt=0)
+    unit: str = "mm"
+    zoom: Optional[float] = Field(None, gt=0, description="points were measured in pixels at this zoom")
+
+class CalibrationOut(BaseModel):
+    document_key: str
+    unit: str
+    points_per_unit: float
+    zoom: float
+    px_per_unit: float
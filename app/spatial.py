@@ -0,0 +1,181 @@
+# app/spatial.py
+# Uniform-grid spatial index over annotation pins, one per (tenant, document, page).
+# Coordinates are PDF points (see app/coords.py).
+# Pins are points, so a grid keeps inserts/deletes O(1) and rectangle and
+# nearest-neighbour queries proportional to the cells they touch.
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from . import models
+from .cache import NullCache, cache
+from .metrics import record_cache
+
+CELL_SIZE = int(os.getenv("ANNOTATION_GRID_CELL", "48"))  # points
+INDEX_TTL_SECONDS = int(os.getenv("ANNOTATION_INDEX_TTL", "300"))  # only without a shared cache
+INDEX_MAX_PAGES = int(os.getenv("ANNOTATION_INDEX_MAX_PAGES", "256"))  # per worker, least recently used dropped
+
+class GridIndex:
+    def __init__(self, points: Iterable[Tuple[int, float, float]] = (), cell: int = CELL_SIZE, version: Optional[str] = None):
+        self.cell = cell
+        self.version = version
+        self.cells: Dict[Tuple[int, int], Dict[int, Tuple[float, float]]] = defaultdict(dict)
+        self.points: Dict[int, Tuple[float, float]] = {}
+        # occupied-cell bounds; only ever grown, so a conservative stop for ring search
+        self.bounds: Optional[Tuple[int, int, int, int]] = None
+        self.loaded_at = time.monotonic()
+        # writes arrive from other threadpool workers while queries iterate the buckets
+        self._lock = threading.RLock()
+        for pid, x, y in points:
+            self.insert(pid, x, y)
+
+    def _key(self, x: float, y: float) -> Tuple[int, int]:
+        return int(x // self.cell), int(y // self.cell)
+
+    def insert(self, pid: int, x: float, y: float):
+        with self._lock:
+            if pid in self.points:
+                self.remove(pid)
+            self.points[pid] = (x, y)
+            cx, cy = key = self._key(x, y)
+            self.cells[key][pid] = (x, y)
+            b = self.bounds
+            self.bounds = (cx, cy, cx, cy) if b is None else (min(b[0], cx), min(b[1], cy), max(b[2], cx), max(b[3], cy))
+
+    def remove(self, pid: int):
+        with self._lock:
+            xy = self.points.pop(pid, None)
+            if xy is None:
+                return
+            key = self._key(*xy)
+            bucket = self.cells.get(key)
+            if bucket is not None:
+                bucket.pop(pid, None)
+                if not bucket:
+                    del self.cells[key]
+
+    def __len__(self):
+        return len(self.points)
+
+    def within(self, x0: float, y0: float, x1: float, y1: float, limit: Optional[int] = None) -> List[int]:
+        with self._lock:
+            return self._within(x0, y0, x1, y1, limit)
+
+    def _within(self, x0, y0, x1, y1, limit):
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        (cx0, cy0), (cx1, cy1) = self._key(x0, y0), self._key(x1, y1)
+        out = []
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            # rectangle spans more cells than are occupied: walk occupied cells instead
+            candidates = (b for (cx, cy), b in self.cells.items() if cx0 <= cx <= cx1 and cy0 <= cy <= cy1)
+        else:
+            candidates = (self.cells[k] for k in ((cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)) if k in self.cells)
+        for bucket in candidates:
+            for pid, (x, y) in bucket.items():
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    out.append(pid)
+                    if limit is not None and len(out) >= limit:
+                        return out
+        return out
+
+    def nearest(self, x: float, y: float, max_distance: Optional[float] = None) -> Optional[Tuple[int, float]]:
+        """Expanding ring search; stops once the ring is farther than the best hit."""
+        with self._lock:
+            return self._nearest(x, y, max_distance)
+
+    def _nearest(self, x, y, max_distance):
+        if not self.points:
+            return None
+        cx, cy = self._key(x, y)
+        best, best_d = None, math.inf
+        max_ring = math.inf if max_distance is None else int(max_distance // self.cell) + 1
+        ring = 0
+        while ring <= max_ring:
+            for key in self._ring(cx, cy, ring):
+                for pid, (px, py) in self.cells.get(key, {}).items():
+                    d = math.hypot(px - x, py - y)
+                    if d < best_d:
+                        best, best_d = pid, d
+            # every unvisited cell is at least `ring * cell` away from (x, y)
+            if best is not None and best_d <= ring * self.cell:
+                break
+            if ring > self._extent(cx, cy):
+                break
+            ring += 1
+        if best is None or (max_distance is not None and best_d > max_distance):
+            return None
+        return best, best_d
+
+    def _ring(self, cx: int, cy: int, r: int):
+        if r == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-r, r + 1):
+            yield (cx + dx, cy - r)
+            yield (cx + dx, cy + r)
+        for dy in range(-r + 1, r):
+            yield (cx - r, cy + dy)
+            yield (cx + r, cy + dy)
+
+    def _extent(self, cx: int, cy: int) -> int:
+        # rings needed to cover every occupied cell from the query cell
+        x0, y0, x1, y1 = self.bounds
+        return max(abs(x0 - cx), abs(x1 - cx), abs(y0 - cy), abs(y1 - cy))
+
+_indexes: "OrderedDict[Tuple[int, Optional[str], int], GridIndex]" = OrderedDict()
+_lock = threading.Lock()
+
+def _version(tenant_id: int) -> Optional[str]:
+    """The tenant's annotation generation, which every annotation write bumps (see
+    crud._annotations_changed). None when the shared cache is disabled."""
+    if isinstance(cache.backend, NullCache):
+        return None
+    return cache.generation(f"annotations:{tenant_id}")
+
+def _fresh(idx: Optional[GridIndex], version: Optional[str]) -> bool:
+    if idx is None:
+        return False
+    if version is None:
+        return time.monotonic() - idx.loaded_at < INDEX_TTL_SECONDS
+    return idx.version == version
+
+def get_index(db: Session, tenant_id: int, document_key: Optional[str], page: int) -> GridIndex:
+    """Loaded per worker on first use and reloaded once the tenant's annotation generation
+    moves, so writes through any worker show up on the next query. At most INDEX_MAX_PAGES
+    pages are kept per worker."""
+    key = (tenant_id, document_key, page)
+    version = _version(tenant_id)
+    with _lock:
+        idx = _indexes.get(key)
+        if _fresh(idx, version):
+            _indexes.move_to_end(key)
+            record_cache("annotation_spatial_index", True)
+            return idx
+        record_cache("annotation_spatial_index", False)
+        a = models.Annotation
+        rows = db.query(a.id, a.x, a.y).filter(a.tenant_id == tenant_id, a.document_key == document_key, a.page == page)
+        idx = _indexes[key] = GridIndex(rows, version=version)
+        _indexes.move_to_end(key)
+        while len(_indexes) > INDEX_MAX_PAGES:
+            _indexes.popitem(last=False)
+    return idx
+
+def on_upsert(tenant_id: int, document_key: Optional[str], page: int, pid: int, x: float, y: float):
+    idx = _indexes.get((tenant_id, document_key, page))
+    if idx is not None:
+        idx.insert(pid, x, y)
+
+def on_delete(tenant_id: int, document_key: Optional[str], page: int, pid: int):
+    idx = _indexes.get((tenant_id, document_key, page))
+    if idx is not None:
+        idx.remove(pid)
+
+def invalidate(tenant_id: int, document_key: Optional[str] = None, page: Optional[int] = None):
+    """Drop cached indexes for a tenant, optionally narrowed to one document page."""
+    with _lock:
+        for key in [k for k in _indexes if k[0] == tenant_id and (page is None or k[1:] == (document_key, page))]:
+            _indexes.pop(key, None)
@@ -0,0 +1,129 @@
+# app/transfer.py
+# Tenant export/import formats. Exports are produced row by row from a server-side
+# cursor and encoded into ~64 KB chunks; imports are decoded from a spooled body one
+# record at a time, so neither side holds a whole table in memory.
+import csv
+import io
+import itertools
+import json
+import os
+import re
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator
+from . import models
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+CHUNK_BYTES = 64 * 1024
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+class ImportRecordError(ValueError):
+    def __init__(self, record: int, message: str):
+        super().__init__(f"record {record}: {message}")
+        self.record = record
+
+def _text(v):
+    return None if v is None or v == "" else str(v)
+
+def _int(v):
+    return None if v is None or v == "" else int(v)
+
+def _float(v):
+    return None if v is None or v == "" else float(v)
+
+def _datetime(v):
+    if v is None or v == "" or isinstance(v, datetime):
+        return v or None
+    return datetime.fromisoformat(str(v).replace("Z", "+00:00")).replace(tzinfo=None)
+
+_BCRYPT = re.compile(r"^\$2[aby]\$\d\d\$[./A-Za-z0-9]{53}$")
+
+def _password_hash(v):
+    # only bcrypt hashes as this app writes them; anything else could never verify
+    if v is None or v == "":
+        return None
+    if not _BCRYPT.match(str(v)):
+        raise ValueError("hashed_password is not a bcrypt hash")
+    return str(v)
+
+def _json(v):
+    if v is None or v == "":
+        return None
+    return json.loads(v) if isinstance(v, str) else v
+
+# Exported columns per table (in order) with the converter applied on import.
+# Ids are exported for reference only; imports always assign new ones.
+TABLES: Dict[str, Dict[str, Callable]] = {
+    "annotations": {"id": _int, "document_key": _text, "page": _int, "x": _float, "y": _float, "text": _text, "color": _text, "created_at": _datetime},
+    "service_requests": {"id": _int, "subject": _text, "description": _text, "metadata": _json, "status": _text, "created_at": _datetime, "created_by": _text},
+    "users": {"id": _int, "username": _text, "email": _text, "roles": _text, "hashed_password": _password_hash, "created_at": _datetime},
+}
+REQUIRED = {"annotations": ("x", "y"), "service_requests": ("subject",), "users": ("username",)}
+_MODELS = {"annotations": models.Annotation, "service_requests": models.ServiceRequest, "users": models.User}
+# String(n) limits, checked here so an over-long value fails its record instead of the batch
+MAX_LENGTHS = {
+    table: {c.name: c.type.length for c in _MODELS[table].__table__.columns if c.name in spec and getattr(c.type, "length", None)}
+    for table, spec in TABLES.items()
+}
+# Filled in for empty fields so every record in a batch has the same keys.
+DEFAULTS = {"annotations": {"page": 0, "color": "#FF0000"}, "service_requests": {"status": "open", "metadata": {}}, "users": {"roles": "user"}}
+
+def _json_default(v):
+    return v.isoformat() if isinstance(v, datetime) else str(v)
+
+def _buffered(pieces: Iterable[str]) -> Iterator[bytes]:
+    buf, size = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield "".join(buf).encode()
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode()
+
+def encode(rows: Iterable[dict], fmt: str, columns) -> Iterator[bytes]:
+    if fmt == "ndjson":
+        return _buffered(json.dumps(r, default=_json_default, separators=(",", ":")) + "\n" for r in rows)
+    return _buffered(_csv_lines(rows, columns))
+
+def _csv_lines(rows: Iterable[dict], columns) -> Iterator[str]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    for r in rows:
+        writer.writerow([
+            json.dumps(v) if isinstance(v, (dict, list)) else v.isoformat() if isinstance(v, datetime) else v
+            for v in (r[c] for c in columns)
+        ])
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    yield out.getvalue()
+
+def decode(f, fmt: str, table: str) -> Iterator[dict]:
+    """Records from a text file object, converted per TABLES; unknown keys are ignored.
+    Raises ImportRecordError with the 1-based record number on the first bad record."""
+    spec, required, defaults, max_lengths = TABLES[table], REQUIRED[table], DEFAULTS[table], MAX_LENGTHS[table]
+    records = iter((json.loads(line) for line in f if line.strip()) if fmt == "ndjson" else csv.DictReader(f))
+    end = object()
+    for n in itertools.count(1):
+        try:
+            raw = next(records, end)
+            if raw is end:
+                return
+            if not isinstance(raw, dict):
+                raise ValueError("expected an object")
+            rec = {k: conv(raw.get(k)) for k, conv in spec.items() if k != "id"}
+            missing = [k for k in required if rec.get(k) is None]
+            if missing:
+                raise ValueError(f"missing {', '.join(missing)}")
+            for k, limit in max_lengths.items():
+                if rec[k] is not None and len(rec[k]) > limit:
+                    raise ValueError(f"{k} longer than {limit} characters")
+            for k, v in defaults.items():
+                if rec[k] is None:
+                    rec[k] = v
+        except (ValueError, TypeError, csv.Error) as e:
+            raise ImportRecordError(n, str(e)) from e
+        yield rec
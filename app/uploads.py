@@ -0,0 +1,92 @@
+# app/uploads.py
+# Upload handling: bodies are streamed in chunks to a temp file on disk while
+# hashing, so a request never holds a whole drawing in memory, and oversized
+# uploads are rejected as early as the request allows.
+import hashlib
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from fastapi import HTTPException, Request, UploadFile
+from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.responses import JSONResponse
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "150")) * 1024 * 1024
+MAX_IMPORT_BYTES = int(os.getenv("MAX_IMPORT_MB", "2048")) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+UPLOAD_DIR = os.getenv("UPLOAD_TMP_DIR") or None  # None -> system temp dir
+
+@dataclass
+class SpooledUpload:
+    path: str
+    sha256: str
+    size: int
+    filename: str
+
+@asynccontextmanager
+async def _spool(chunks, max_bytes: int, filename: str = ""):
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=".upload", dir=UPLOAD_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                out.write(chunk)
+        yield SpooledUpload(path=path, sha256=digest.hexdigest(), size=size, filename=filename)
+    finally:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+async def _file_chunks(file: UploadFile):
+    while chunk := await file.read(CHUNK_SIZE):
+        yield chunk
+    await file.close()
+
+def spool_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES):
+    """Copy an UploadFile to a named temp file chunk by chunk; the file is removed on exit."""
+    return _spool(_file_chunks(file), max_bytes, file.filename or "")
+
+def spool_body(request: Request, max_bytes: int = MAX_IMPORT_BYTES):
+    """Same for a raw (non-multipart) request body, e.g. an NDJSON import."""
+    return _spool(request.stream(), max_bytes)
+
+class UploadLimitMiddleware:
+    """Reject multipart bodies over the limit before they are parsed: by Content-Length
+    when it is sent, otherwise by counting streamed bytes."""
+
+    def __init__(self, app: ASGIApp, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/"):
+            return await self.app(scope, receive, send)
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            return await self._reject(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Upload too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse({"detail": f"Upload exceeds {self.max_bytes // (1024 * 1024)} MB"}, status_code=413)
+        await response(scope, receive, send)
@@ -0,0 +1,131 @@
+# benchmarks/load.py
+# Load-test scenario against the FastAPI app, in-process (TestClient) or over HTTP (--url).
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from .synthetic import make_pdf, make_annotations
+from .stats import summarize
+
+DOCUMENT_KEY = "bench-drawing"
+PASSWORD = "bench-password"
+# (operation, weight)
+SCENARIO = (
+    ("annotations_list", 40),
+    ("annotations_create", 20),
+    ("service_request", 15),
+    ("render", 15),
+    ("login", 10),
+)
+
+class _Remote:
+    """requests.Session with a base URL, so it can stand in for TestClient."""
+
+    def __init__(self, base_url: str, pool_size: int):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, path: str, **kwargs):
+        return self.session.request(method, self.base_url + path, timeout=(5, 120), **kwargs)
+
+    def get(self, path: str, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+def _in_process():
+    from fastapi.testclient import TestClient
+    from app.migrate import migrate
+    from app.main import app
+    migrate()
+    return TestClient(app)
+
+def _post_admitted(client, path: str, **kwargs):
+    """POST during setup, waiting out 429s from servers that enforce rate limits."""
+    while True:
+        r = client.post(path, **kwargs)
+        if r.status_code != 429:
+            return r
+        time.sleep(float(r.headers.get("Retry-After", "1")))
+
+def _login(client, username: str) -> dict:
+    r = _post_admitted(client, "/users/login", data={"username": username, "password": PASSWORD})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+def _setup(client, scale: dict) -> list:
+    """Register users across tenants and seed each tenant's drawing with annotations.
+    Safe to re-run against a persistent database."""
+    users = []
+    for i in range(scale["users"]):
+        tenant = i % scale["tenants"]
+        username = f"bench-{tenant}-{i}"
+        _post_admitted(client, "/users/register", json={"username": username, "password": PASSWORD, "tenant_name": f"bench-tenant-{tenant}"})
+        users.append((username, _login(client, username), tenant))
+    seeded = set()
+    for username, headers, tenant in users:
+        if tenant in seeded:
+            continue
+        seeded.add(tenant)
+        if client.get("/annotations", params={"page": 0, "document_key": DOCUMENT_KEY}, headers=headers).json():
+            continue
+        for ann in make_annotations(scale["annotations"], pages=scale["load_pdf_pages"], document_key=DOCUMENT_KEY, seed=tenant):
+            _post_admitted(client, "/annotations", json=ann, headers=headers).raise_for_status()
+    return users
+
+def run(scale: dict, url: str = None, seed: int = 0) -> dict:
+    client = _Remote(url, scale["concurrency"]) if url else _in_process()
+    if not url:
+        client.__enter__()  # run startup hooks
+    try:
+        users = _setup(client, scale)
+        pdf = make_pdf(scale["load_pdf_pages"], parts_per_page=50)
+        rng = random.Random(seed)
+        names, weights = zip(*SCENARIO)
+        ops = [(op, rng.choice(users), rng.randrange(scale["load_pdf_pages"]), i)
+               for i, op in enumerate(rng.choices(names, weights=weights, k=scale["load_requests"]))]
+
+        def execute(op, user, page, i):
+            username, headers, _ = user
+            if op == "annotations_list":
+                return client.get("/annotations", params={"page": page, "document_key": DOCUMENT_KEY}, headers=headers)
+            if op == "annotations_create":
+                ann = make_annotations(1, pages=scale["load_pdf_pages"], document_key=DOCUMENT_KEY, seed=i)[0]
+                return client.post("/annotations", json=ann, headers=headers)
+            if op == "service_request":
+                return client.post("/service/request", json={"subject": f"bench {i}", "description": "load test", "metadata": {"page": page}}, headers=headers)
+            if op == "render":
+                return client.post("/pdf/render", params={"page": page, "zoom": 1.5}, files={"file": ("bench.pdf", pdf, "application/pdf")}, headers=headers)
+            return client.post("/users/login", data={"username": username, "password": PASSWORD})
+
+        samples, errors = defaultdict(list), defaultdict(int)
+        lock = threading.Lock()
+
+        def worker(item):
+            start = time.perf_counter()
+            r = execute(*item)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[item[0]].append(elapsed)
+                if r.status_code >= 400:
+                    errors[item[0]] += 1
+
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=scale["concurrency"]) as pool:
+            list(pool.map(worker, ops))
+        wall = time.perf_counter() - wall_start
+    finally:
+        if not url:
+            client.__exit__(None, None, None)
+
+    results = {}
+    for op in names:
+        results[f"load.{op}"] = dict(summarize(samples[op], wall), errors=errors[op])
+    results["load.total"] = dict(summarize([s for v in samples.values() for s in v], wall), errors=sum(errors.values()))
+    return results
@@ -0,0 +1,41 @@
+# benchmarks/micro.py
+# Microbenchmarks for the CPU-bound hot paths: page rendering, BOM parsing and row search.
+import io
+import itertools
+import time
+from .synthetic import make_pdf, make_bom, part_numbers
+from .stats import summarize
+
+SEARCH_TERMS = ("valve", "a1", "r07-s03", "siemens", "no-such-part")
+
+def _time(fn, repeat: int, warmup: int = 1) -> list:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def run(scale: dict) -> dict:
+    from app.pdf_utils import render_pdf_page_to_png, find_part_locations
+    from utils.bom_parser import parse_bom
+    from utils.search import search_index, filter_rows
+
+    pdf = make_pdf(scale["pdf_pages"], scale["parts_per_page"])
+    bom = make_bom(scale["bom_rows"])
+    results = {}
+    for zoom in (1.0, 2.0):
+        pages = itertools.cycle(range(scale["pdf_pages"]))
+        results[f"render_page_zoom{zoom:g}"] = summarize(_time(lambda: render_pdf_page_to_png(pdf, next(pages), zoom), scale["render_repeat"]))
+    pns = part_numbers(scale["pdf_pages"] * scale["parts_per_page"])[::10]
+    results["find_part_locations"] = summarize(_time(lambda: find_part_locations(pdf, pns), scale["parse_repeat"]))
+    results["parse_bom"] = summarize(_time(lambda: parse_bom(io.BytesIO(bom)), scale["parse_repeat"]))
+
+    df = parse_bom(io.BytesIO(bom))
+    results["search_index_build"] = summarize(_time(lambda: search_index(df), scale["parse_repeat"]))
+    index = search_index(df)
+    terms = itertools.cycle(SEARCH_TERMS)
+    results["filter_rows"] = summarize(_time(lambda: filter_rows(df, index, next(terms)), scale["search_repeat"]))
+    return results
@@ -0,0 +1,95 @@
+# benchmarks/run.py
+# Entry point: python -m benchmarks.run {micro,startup,load,all} [--scale small|full] [--url http://host:8000]
+import argparse
+import json
+import os
+import sys
+import tempfile
+from .stats import compare, load_baseline, print_table, save_baseline
+
+SCALES = {
+    "small": dict(pdf_pages=4, parts_per_page=150, bom_rows=5000, render_repeat=12, parse_repeat=3, search_repeat=50,
+                  tenants=2, users=4, annotations=300, load_pdf_pages=2, load_requests=400, concurrency=4, startup_repeat=5),
+    "full": dict(pdf_pages=40, parts_per_page=300, bom_rows=50000, render_repeat=40, parse_repeat=5, search_repeat=200,
+                 tenants=4, users=16, annotations=5000, load_pdf_pages=4, load_requests=5000, concurrency=16, startup_repeat=15),
+}
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "2000"))
+
+def _backend(url):
+    if url:
+        return "remote"
+    return os.environ["DATABASE_URL"].split(":", 1)[0].split("+", 1)[0]
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Benchmarks and load test for the warehouse API and renderers.")
+    p.add_argument("suite", choices=("micro", "startup", "load", "all"))
+    p.add_argument("--scale", choices=tuple(SCALES), default="small")
+    p.add_argument("--url", help="drive a running server instead of the app in-process")
+    p.add_argument("--requests", type=int, help="override the number of load-test requests")
+    p.add_argument("--concurrency", type=int, help="override the number of load-test workers")
+    p.add_argument("--baseline-dir", default=BASELINE_DIR)
+    p.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    p.add_argument("--tolerance", type=float, default=0.5, help="allowed fractional slowdown before failing (default 0.5)")
+    p.add_argument("--startup-budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                   help="fail when median time to first ready probe exceeds this (default %(default)s)")
+    p.add_argument("--output", help="also write results as JSON to this path")
+    args = p.parse_args(argv)
+
+    scale = dict(SCALES[args.scale])
+    if args.requests:
+        scale["load_requests"] = args.requests
+    if args.concurrency:
+        scale["concurrency"] = args.concurrency
+    if "DATABASE_URL" not in os.environ:
+        # must be set before app.database is imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='wsparts-bench-')}/bench.db"
+    # the in-process app measures service latency, not the admission policy; the
+    # middleware still runs, it just never rejects
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    # start cold: the default shared cache outlives the process and would carry renders over
+    os.environ.setdefault("CACHE_BACKEND", f"file:{tempfile.mkdtemp(prefix='wsparts-bench-cache-')}")
+
+    suites = ("micro", "startup", "load") if args.suite == "all" else (args.suite,)
+    all_results, failed = {}, False
+    for suite in suites:
+        if suite == "micro":
+            from . import micro
+            results, name = micro.run(scale), f"micro-{args.scale}"
+        elif suite == "startup":
+            from . import startup
+            results, name = startup.run(scale), f"startup-{args.scale}-{_backend(None)}"
+        else:
+            from . import load
+            results, name = load.run(scale, url=args.url), f"load-{args.scale}-{_backend(args.url)}"
+            failed |= results["load.total"]["errors"] > 0
+        print(f"\n== {name}")
+        print_table(results)
+        if suite == "startup":
+            ready_ms = results["startup.first_ready"]["p50_ms"]
+            over = ready_ms > args.startup_budget_ms
+            failed |= over
+            print(f"startup budget: {ready_ms:.0f} ms of {args.startup_budget_ms:.0f} ms to first ready probe ({'OVER' if over else 'ok'})")
+            eager = results["startup.import_app"]["eager_modules"]
+            if eager:
+                print(f"heavy modules imported eagerly by app.main: {', '.join(eager)}")
+        all_results[name] = results
+        path = os.path.join(args.baseline_dir, f"{name}.json")
+        if args.save_baseline:
+            save_baseline(path, results)
+            print(f"baseline saved to {path}")
+            continue
+        baseline = load_baseline(path)
+        if baseline is None:
+            print(f"no baseline at {path}; run with --save-baseline to record one")
+            continue
+        for bench, metric, base, cur in compare(results, baseline, args.tolerance):
+            failed = True
+            print(f"REGRESSION {bench} {metric}: {base} -> {cur}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(all_results, f, indent=2, sort_keys=True)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
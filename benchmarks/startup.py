@@ -0,0 +1,39 @@
+# benchmarks/startup.py
+# Cold-start cost of an API worker, each sample a fresh interpreter: time to import
+# app.main, and time until the app passes its readiness probe.
+import json
+import os
+import subprocess
+import sys
+from .stats import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("fitz", "pymupdf", "PIL", "numpy", "pandas")
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+eager = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    status = client.get("/readyz").status_code
+    ready = time.perf_counter()
+print(json.dumps({{"import": imported - start, "ready": ready - start, "status": status, "eager": eager}}))
+"""
+
+def _python(code_or_module: list) -> str:
+    return subprocess.run([sys.executable, *code_or_module], cwd=ROOT, env=os.environ.copy(),
+                          check=True, capture_output=True, text=True).stdout
+
+def run(scale: dict) -> dict:
+    _python(["-m", "app.migrate"])
+    samples = [json.loads(_python(["-c", PROBE]).strip().splitlines()[-1]) for _ in range(scale["startup_repeat"])]
+    not_ready = [s["status"] for s in samples if s["status"] != 200]
+    if not_ready:
+        raise RuntimeError(f"/readyz returned {not_ready[0]} after migrating")
+    return {
+        "startup.import_app": dict(summarize([s["import"] for s in samples]), eager_modules=samples[0]["eager"]),
+        "startup.first_ready": summarize([s["ready"] for s in samples]),
+    }
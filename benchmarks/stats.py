@@ -0,0 +1,58 @@
+# benchmarks/stats.py
+# Latency summaries and baseline comparison.
+import json
+import os
+import platform
+import numpy as np
+
+# fewer samples than this and the percentile is too noisy to gate on
+MIN_SAMPLES = {"p50_ms": 1, "p95_ms": 100, "p99_ms": 300}
+
+def summarize(samples: list, wall: float = None) -> dict:
+    """p50/p95/p99/mean in milliseconds; throughput in ops/s over `wall` seconds (sum of samples if omitted)."""
+    a = np.asarray(samples, dtype=float) * 1000
+    if a.size == 0:
+        return {"n": 0}
+    wall = wall if wall is not None else a.sum() / 1000
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return {"n": int(a.size), "p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3),
+            "mean_ms": round(a.mean(), 3), "throughput_per_s": round(a.size / wall, 2) if wall > 0 else None}
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system(), "cpus": os.cpu_count()}
+
+def load_baseline(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(path: str, results: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions as (name, metric, baseline, current). Latencies may grow and throughput may
+    shrink by `tolerance` (a fraction) before counting; entries missing from the baseline, and
+    tail percentiles over too few samples, are skipped."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for metric, min_n in MIN_SAMPLES.items():
+            if cur.get("n", 0) < min_n:
+                continue
+            if base.get(metric) and cur.get(metric, 0) > base[metric] * (1 + tolerance):
+                regressions.append((name, metric, base[metric], cur[metric]))
+        if base.get("throughput_per_s") and cur.get("throughput_per_s") and cur["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance):
+            regressions.append((name, "throughput_per_s", base["throughput_per_s"], cur["throughput_per_s"]))
+    return regressions
+
+def print_table(results: dict):
+    print(f"{'benchmark':<32}{'n':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'ops/s':>11}")
+    for name, r in results.items():
+        if not r.get("n"):
+            continue
+        print(f"{name:<32}{r['n']:>7}{r['p50_ms']:>11.2f}{r['p95_ms']:>11.2f}{r['p99_ms']:>11.2f}{r['throughput_per_s'] or 0:>11.1f}")
@@ -0,0 +1,58 @@
+# benchmarks/synthetic.py
+# Deterministic synthetic inputs: multi-page drawings, large BOMs and annotation sets.
+import io
+import random
+import fitz  # PyMuPDF
+import pandas as pd
+
+PAGE_W, PAGE_H = 1684, 1190  # A2 landscape, points
+COLORS = ("#FF0000", "#00AA00", "#0000FF", "#FF8800")
+
+def part_numbers(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [f"{rng.choice('ABCDEFGH')}{rng.randint(100, 999)}-{i:05d}" for i in range(n)]
+
+def make_pdf(pages: int = 10, parts_per_page: int = 200, lines_per_page: int = 500, seed: int = 0) -> bytes:
+    """Drawing-like PDF: random vector linework plus scattered part-number labels in the text layer."""
+    rng = random.Random(seed)
+    pns = part_numbers(pages * parts_per_page, seed)
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page(width=PAGE_W, height=PAGE_H)
+        shape = page.new_shape()
+        for _ in range(lines_per_page):
+            x, y = rng.uniform(0, PAGE_W), rng.uniform(0, PAGE_H)
+            shape.draw_line((x, y), (x + rng.uniform(-120, 120), y + rng.uniform(-120, 120)))
+        shape.finish(width=0.5, color=(0, 0, 0))
+        shape.commit()
+        for pn in pns[p * parts_per_page:(p + 1) * parts_per_page]:
+            page.insert_text((rng.uniform(20, PAGE_W - 120), rng.uniform(20, PAGE_H - 20)), pn, fontsize=7)
+    data = doc.tobytes(deflate=True)
+    doc.close()
+    return data
+
+def make_bom_frame(rows: int = 20000, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    words = ["valve", "bearing", "gasket", "motor", "sensor", "bracket", "seal", "pump", "relay", "filter"]
+    return pd.DataFrame({
+        "Part Number": part_numbers(rows, seed),
+        "Description": [f"{rng.choice(words)} {rng.choice(words)} {rng.randint(1, 500)}mm" for _ in range(rows)],
+        "Qty": [rng.randint(1, 50) for _ in range(rows)],
+        "Manufacturer": [rng.choice(["Acme", "Bosch", "SKF", "Festo", "Siemens"]) for _ in range(rows)],
+        "Location": [f"R{rng.randint(1, 40):02d}-S{rng.randint(1, 12):02d}" for _ in range(rows)],
+    })
+
+def make_bom(rows: int = 20000, seed: int = 0) -> bytes:
+    """BOM spreadsheet as xlsx bytes, in the shape parse_bom expects."""
+    out = io.BytesIO()
+    make_bom_frame(rows, seed).to_excel(out, index=False)
+    return out.getvalue()
+
+def make_annotations(n: int = 1000, pages: int = 1, document_key: str = "bench", seed: int = 0) -> list:
+    """Annotation payloads in PDF points, ready to POST to /annotations."""
+    rng = random.Random(seed)
+    return [
+        {"page": rng.randrange(pages), "x": rng.uniform(0, PAGE_W), "y": rng.uniform(0, PAGE_H),
+         "text": f"note {i}", "color": rng.choice(COLORS), "document_key": document_key}
+        for i in range(n)
+    ]
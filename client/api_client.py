@@ -0,0 +1,113 @@
+# client/api_client.py
+# Pooled, retrying HTTP client for the Streamlit front-end.
+import hashlib
+import streamlit as st
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional
+
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+RENDER_TIMEOUT = (5, 120)
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+CACHE_KEY = "_api_get_cache"
+
+@st.cache_resource(show_spinner=False)  # a spinner would draw before st.set_page_config
+def get_http_session(pool_size: int = 20, retries: int = 3, backoff: float = 0.3) -> requests.Session:
+    """One keep-alive session per Streamlit server process, shared across reruns and users.
+    Auth headers are injected per call, never stored on the shared session."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=IDEMPOTENT_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+class ApiClient:
+    def __init__(self, base_url: str, session: Optional[requests.Session] = None, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.session = session or get_http_session()
+        self.timeout = timeout
+
+    # --- auth ---
+    @property
+    def token(self) -> Optional[str]:
+        return st.session_state.get("token")
+
+    def _headers(self, extra: Optional[dict] = None) -> dict:
+        h = {}
+        if self.token:
+            h["Authorization"] = f"Bearer {self.token}"
+        if extra:
+            h.update(extra)
+        return h
+
+    # --- GET payload cache (per browser session, since results are tenant-scoped) ---
+    def _cache(self) -> dict:
+        if CACHE_KEY not in st.session_state:
+            st.session_state[CACHE_KEY] = {}
+        return st.session_state[CACHE_KEY]
+
+    def invalidate(self, path: str = ""):
+        """Drop cached GETs whose path starts with `path` (everything when empty)."""
+        cache = self._cache()
+        for key in [k for k in cache if k[0].startswith(path)]:
+            del cache[key]
+
+    # --- verbs ---
+    def request(self, method: str, path: str, timeout=None, **kwargs) -> requests.Response:
+        headers = self._headers(kwargs.pop("headers", None))
+        return self.session.request(method, f"{self.base_url}{path}", headers=headers, timeout=timeout or self.timeout, **kwargs)
+
+    def get(self, path: str, params: Optional[dict] = None) -> requests.Response:
+        return self.request("GET", path, params=params)
+
+    def get_json(self, path: str, params: Optional[dict] = None, use_cache: bool = True):
+        """Decoded JSON body, or None when the request failed. Only the payload of
+        successful responses is kept in session state, never the Response itself."""
+        key = (path, tuple(sorted((params or {}).items())), self.token)
+        cache = self._cache()
+        if use_cache and key in cache:
+            return cache[key]
+        r = self.get(path, params=params)
+        if not r.ok:
+            return None
+        payload = r.json()
+        if use_cache:
+            cache[key] = payload
+        return payload
+
+    def post(self, path: str, invalidates: Optional[str] = None, **kwargs) -> requests.Response:
+        """POST is not retried. Successful writes invalidate cached GETs under `invalidates`
+        (defaults to the first path segment, e.g. "/annotations")."""
+        r = self.request("POST", path, **kwargs)
+        if r.ok:
+            self.invalidate(invalidates if invalidates is not None else "/" + path.strip("/").split("/")[0])
+        return r
+
+    def put(self, path: str, invalidates: Optional[str] = None, **kwargs) -> requests.Response:
+        """PUT is idempotent, so it goes through the adapter's retries."""
+        r = self.request("PUT", path, **kwargs)
+        if r.ok:
+            self.invalidate(invalidates if invalidates is not None else path)
+        return r
+
+    def login(self, username: str, password: str) -> requests.Response:
+        return self.request("POST", "/users/login", data={"username": username, "password": password})
+
+    def render_pdf(self, pdf_bytes: bytes, page: int = 0, zoom: float = 1.5) -> bytes:
+        return _render_pdf_cached(self.base_url, hashlib.sha256(pdf_bytes).hexdigest(), pdf_bytes, page, zoom)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _render_pdf_cached(base_url: str, digest: str, _pdf_bytes: bytes, page: int, zoom: float) -> bytes:
+    # keyed on the content digest; the leading underscore keeps the raw bytes out of the hash
+    files = {"file": ("layout.pdf", _pdf_bytes, "application/pdf")}
+    r = get_http_session().post(f"{base_url}/pdf/render", files=files, params={"page": page, "zoom": zoom}, timeout=RENDER_TIMEOUT)
+    r.raise_for_status()
+    return r.content
@@ -1,14 +1,15 @@
 # client/streamlit_app.py
 import streamlit as st
-import requests
-import base64
+import hashlib
 from PIL import Image
 import io
 import pandas as pd
-import os
+from api_client import ApiClient
+
+st.set_page_config(page_title="WSParts Client", layout="wide")  # must precede any element, including cache spinners
 
 API_BASE = st.secrets.get("api_base_url", "http://backend:8000")  # when running in docker use service name
-st.set_page_config(page_title="WSParts Client", layout="wide")
+api = ApiClient(API_BASE)
 st.title("Warehouse Spare Parts — Client")
 
 # --- Auth ---
@@ -22,10 +23,11 @@ def login_ui():
     pwd = st.sidebar.text_input("Password", type="password")
     if st.sidebar.button("Sign in"):
         try:
-            r = requests.post(f"{API_BASE}/users/login", data={"username": uname, "password": pwd})
+            r = api.login(uname, pwd)
             r.raise_for_status()
             st.session_state.token = r.json()["access_token"]
             st.session_state.username = uname
+            api.invalidate()
             st.success("Signed in")
         except Exception as e:
             st.error(f"Login failed: {e}")
@@ -35,8 +37,6 @@ if not st.session_state.token:
     login_ui()
     st.stop()
 
-headers = {"Authorization": f"Bearer {st.session_state.token}"}
-
 # --- File uploads ---
 st.sidebar.header("Upload files")
 pdf_file = st.sidebar.file_uploader("Layout PDF", type=["pdf"])
@@ -70,13 +70,13 @@ with tab2:
     if not pdf_file:
         st.info("Upload a PDF in the sidebar.")
     else:
-        # send to backend to render png
-        files = {"file": ("layout.pdf", pdf_file.getvalue(), "application/pdf")}
-        params = {"page": 0, "zoom": 1.5}
+        # send to backend to render png (cached per file digest/page/zoom)
+        zoom = 1.5
         try:
-            r = requests.post(f"{API_BASE}/pdf/render", files=files, params=params, timeout=30)
-            r.raise_for_status()
-            img = Image.open(io.BytesIO(r.content))
+            pdf_bytes = pdf_file.getvalue()
+            doc_key = hashlib.sha256(pdf_bytes).hexdigest()
+            png = api.render_pdf(pdf_bytes, page=0, zoom=zoom)
+            img = Image.open(io.BytesIO(png))
             w, h = img.size
             st.image(img, use_column_width=True)
             st.write(f"Image size: {w}px x {h}px")
@@ -88,23 +88,32 @@ with tab2:
             ann_text = st.text_input("Text")
             ann_color = st.color_picker("Color", "#FF0000")
             if st.button("Add Annotation"):
-                payload = {"page": 0, "x": int(ann_x), "y": int(ann_y), "text": ann_text, "color": ann_color}
-                resp = requests.post(f"{API_BASE}/annotations", json=payload, headers=headers)
+                # pixels at `zoom`; the backend stores PDF points
+                payload = {"page": 0, "x": ann_x, "y": ann_y, "zoom": zoom, "document_key": doc_key, "text": ann_text, "color": ann_color}
+                resp = api.post("/annotations", json=payload)
                 if resp.status_code == 201:
                     st.success("Annotation saved")
                 else:
                     st.error(f"Failed: {resp.text}")
             if st.button("Refresh annotations"):
-                resp = requests.get(f"{API_BASE}/annotations?page=0", headers=headers)
-                if resp.ok:
-                    anns = resp.json()
+                api.invalidate("/annotations")
+                anns = api.get_json("/annotations", params={"page": 0, "document_key": doc_key, "zoom": zoom})
+                if anns is not None:
                     st.table(pd.DataFrame(anns))
                 else:
                     st.error("Failed to fetch annotations")
 
-            # Calibration example
-            if 'px_per_unit' not in st.session_state:
-                st.session_state.px_per_unit = None
+            if st.button("Prepare annotated PDF"):
+                resp = api.post("/pdf/export", files={"file": (pdf_file.name, pdf_bytes, "application/pdf")}, params={"document_key": doc_key}, timeout=(5, 300))
+                if resp.ok:
+                    st.download_button("📥 Download annotated PDF", data=resp.content, file_name=pdf_file.name.rsplit(".", 1)[0] + "_annotated.pdf", mime="application/pdf")
+                else:
+                    st.error(f"Export failed: {resp.text}")
+
+            # Calibration is persisted per document in PDF points; px_per_unit is for this zoom
+            cal = api.get_json(f"/documents/{doc_key}/calibration", params={"zoom": zoom})
+            if cal is not None:
+                st.caption(f"Calibrated: {cal['px_per_unit']:.4f} px per {cal['unit']}")
             with st.expander("Calibration (optional)"):
                 p1 = st.number_input("Point1 x", value=0)
                 p2 = st.number_input("Point1 y", value=0)
@@ -114,9 +123,12 @@ with tab2:
                 unit = st.text_input("Unit (e.g. mm)", value="mm")
                 if st.button("Compute scale"):
                     if real_dist > 0:
-                        px_dist = ((p1 - p3)**2 + (p2 - p4)**2)**0.5
-                        st.session_state.px_per_unit = px_dist / real_dist
-                        st.success(f"{st.session_state.px_per_unit:.4f} px per {unit}")
+                        payload = {"x1": p1, "y1": p2, "x2": p3, "y2": p4, "real_distance": real_dist, "unit": unit, "zoom": zoom}
+                        resp = api.put(f"/documents/{doc_key}/calibration", json=payload, invalidates=f"/documents/{doc_key}")
+                        if resp.ok:
+                            st.success(f"{resp.json()['px_per_unit']:.4f} px per {unit}")
+                        else:
+                            st.error(f"Failed: {resp.text}")
                     else:
                         st.error("Enter a real distance > 0")
 
@@ -129,7 +141,7 @@ with tab3:
     desc = st.text_area("Description")
     if st.button("Request Service"):
         payload = {"subject": subject, "description": desc, "metadata": {"user": st.session_state.username}}
-        r = requests.post(f"{API_BASE}/service/request", json=payload, headers=headers)
+        r = api.post("/service/request", json=payload)
         if r.status_code == 201:
             st.success("Service request submitted")
         else:
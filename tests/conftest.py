@@ -0,0 +1,8 @@
+# Settings the app reads at import time; tests need no database server, Redis or shared cache dir.
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,190 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+from app import admission, auth
+from app.admission import AdmissionMiddleware, FairScheduler, MemoryBucketStore
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def take(store, *args):
+    return asyncio.run(store.take(*args))
+
+# --- token buckets ---
+
+def test_bucket_admits_burst_then_reports_wait(clock):
+    store = MemoryBucketStore()
+    assert [take(store, "t", 1.0, 3.0) for _ in range(3)] == [0, 0, 0]
+    assert take(store, "t", 1.0, 3.0) == pytest.approx(1.0)
+    assert take(store, "other", 1.0, 3.0) == 0
+
+def test_bucket_refills_at_rate_up_to_burst(clock):
+    store = MemoryBucketStore()
+    for _ in range(2):
+        take(store, "t", 2.0, 2.0)
+    clock[0] += 0.5
+    assert take(store, "t", 2.0, 2.0) == 0
+    assert take(store, "t", 2.0, 2.0) == pytest.approx(0.5)
+    clock[0] += 3600
+    assert [take(store, "t", 2.0, 2.0) for _ in range(3)][:2] == [0, 0]
+
+def test_bucket_cost(clock):
+    store = MemoryBucketStore()
+    assert take(store, "t", 1.0, 5.0, 4.0) == 0
+    assert take(store, "t", 1.0, 5.0, 4.0) == pytest.approx(3.0)
+
+def test_bucket_prunes_full_buckets(clock):
+    store = MemoryBucketStore(max_keys=2)
+    take(store, "a", 1.0, 1.0)
+    take(store, "b", 1.0, 1.0)
+    clock[0] += 2
+    take(store, "c", 1.0, 1.0)
+    assert set(store._buckets) == {"c"}
+
+def test_parse_limits():
+    assert admission._parse_limits("render=2:20, write=5,") == {"render": (2.0, 20.0), "write": (5.0, 5.0)}
+
+# --- fair scheduler ---
+
+async def _job(sched, key, log, gate):
+    async with sched.slot(key):
+        log.append(key)
+        await gate.wait()
+
+def test_scheduler_hands_slots_over_in_fair_order():
+    async def main():
+        sched, log, gate = FairScheduler(1), [], asyncio.Event()
+        tasks = [asyncio.create_task(_job(sched, k, log, gate)) for k in ["a", "a", "a", "b"]]
+        await asyncio.sleep(0)
+        assert log == ["a"] and sched.busy == 1
+        gate.set()
+        await asyncio.gather(*tasks)
+        return sched, log
+    sched, log = asyncio.run(main())
+    # b's job ties with a's first queued one (FIFO) and goes ahead of a's last
+    assert log == ["a", "a", "b", "a"]
+    assert sched.busy == 0 and not sched._heap and not sched._queued
+    assert not sched._last_finish
+
+def test_scheduler_sweeps_tags_of_idle_tenants():
+    async def main():
+        sched, gate = FairScheduler(1, max_keys=4), asyncio.Event()
+        async with sched.slot("a"):
+            waiters = [asyncio.create_task(_job(sched, f"t{i}", [], gate)) for i in range(8)]
+            await asyncio.sleep(0)
+            for w in waiters:
+                w.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+        gate.set()
+        for i in range(8):
+            await _job(sched, f"u{i}", [], gate)
+        return sched
+    assert len(asyncio.run(main())._last_finish) <= 5
+
+def test_scheduler_weights():
+    async def main():
+        sched, log, gate = FairScheduler(1, weights={"heavy": 4.0}), [], asyncio.Event()
+        async with sched.slot("warmup"):
+            tasks = [asyncio.create_task(_job(sched, k, log, gate)) for k in ["light"] * 2 + ["heavy"] * 4]
+            await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+        return log
+    # heavy's jobs cost a quarter of the virtual time of light's; ties go to the earlier job
+    assert asyncio.run(main()) == ["heavy", "heavy", "heavy", "light", "heavy", "light"]
+
+def test_scheduler_cancelled_waiter_leaves_no_trace():
+    async def main():
+        sched, log, gate = FairScheduler(1), [], asyncio.Event()
+        async with sched.slot("a"):
+            waiter = asyncio.create_task(_job(sched, "b", log, gate))
+            await asyncio.sleep(0)
+            assert sched._queued["b"] == 1
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert not sched._queued
+        return sched, log
+    sched, log = asyncio.run(main())
+    assert log == [] and sched.busy == 0 and not sched._heap
+
+def test_scheduler_cancel_after_handoff_passes_slot_on():
+    async def main():
+        sched, log, gate = FairScheduler(1), [], asyncio.Event()
+        gate.set()
+        async with sched.slot("a"):
+            first = asyncio.create_task(_job(sched, "b", log, gate))
+            second = asyncio.create_task(_job(sched, "c", log, gate))
+            await asyncio.sleep(0)
+        # the slot was handed to b when a released it; b is cancelled before it runs
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await second
+        return sched, log
+    sched, log = asyncio.run(main())
+    assert log == ["c"] and sched.busy == 0 and not sched._queued
+
+def test_scheduler_rejects_when_tenant_queue_is_full():
+    async def main():
+        sched, gate = FairScheduler(1, max_queued=1), asyncio.Event()
+        async with sched.slot("a"):
+            queued = asyncio.create_task(_job(sched, "a", [], gate))
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as e:
+                async with sched.slot("a"):
+                    pass
+            gate.set()
+        await queued
+        return e.value.status_code
+    assert asyncio.run(main()) == 429
+
+# --- middleware ---
+
+def _app(limits=None, enabled=False):
+    app = FastAPI()
+
+    @app.get("/whoami")
+    def whoami(user=Depends(auth.get_current_user)):
+        return {"username": user.username}
+
+    app.add_middleware(AdmissionMiddleware, store=MemoryBucketStore(), limits=limits or {}, enabled=enabled)
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    return app
+
+def test_token_decoded_once_per_request(monkeypatch):
+    calls = []
+    decode = auth.decode_token
+
+    def counting_decode(token):
+        calls.append(token)
+        return decode(token)
+    monkeypatch.setattr(auth, "decode_token", counting_decode)
+    monkeypatch.setattr(admission, "decode_token", counting_decode)
+    monkeypatch.setattr(auth, "cached_user", lambda db, username: SimpleNamespace(username=username, tenant_id=7))
+    app = _app()
+    app.dependency_overrides[auth.get_db] = lambda: None
+    token = auth.create_access_token({"sub": "alice", "tenant_id": 7})
+    r = TestClient(app).get("/whoami", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 200 and r.json() == {"username": "alice"}
+    assert calls == [token]
+    assert TestClient(app).get("/whoami", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+def test_rate_limited_response_carries_cors_headers():
+    client = TestClient(_app(limits={"read": (0.001, 1.0)}, enabled=True))
+    headers = {"Origin": "https://ui.example"}
+    client.get("/whoami", headers=headers)
+    r = client.get("/whoami", headers=headers)
+    assert r.status_code == 429
+    assert r.headers["access-control-allow-origin"] == "*"
+    assert "retry-after" in r.headers
+
+def test_cors_is_outermost_in_app():
+    from app.main import app
+    assert app.user_middleware[0].cls is CORSMiddleware
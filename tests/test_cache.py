@@ -0,0 +1,101 @@
+import asyncio
+import errno
+import threading
+import time
+import pytest
+from app.cache import FileCache, MemoryCache, SharedCache
+
+@pytest.fixture
+def shared():
+    return SharedCache(MemoryCache(), namespace="test:")
+
+def test_get_or_set_computes_once_across_threads(shared):
+    calls, start = [], threading.Barrier(8)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return b"value"
+
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(shared.get_or_set("t", "k", compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [b"value"] * 8
+    assert len(calls) == 1
+    assert shared.get_or_set("t", "k", compute) == b"value" and len(calls) == 1
+
+def test_get_or_set_error_reaches_waiters_and_is_not_cached(shared):
+    def fail():
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        shared.get_or_set("t", "k", fail)
+    assert shared.get("k") is None
+    assert shared.get_or_set("t", "k", lambda: b"ok") == b"ok"
+
+def test_aget_or_set_computes_once(shared):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b"value"
+
+    async def main():
+        return await asyncio.gather(*(shared.aget_or_set("t", "k", compute) for _ in range(10)))
+
+    assert asyncio.run(main()) == [b"value"] * 10
+    assert len(calls) == 1
+
+def test_cancelled_leader_still_fills_for_followers(shared):
+    async def compute():
+        await asyncio.sleep(0.05)
+        return b"value"
+
+    async def main():
+        leader = asyncio.create_task(shared.aget_or_set("t", "k", compute))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(shared.aget_or_set("t", "k", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == b"value"
+    assert shared.get("k") == b"value"
+
+def test_generation_bump(shared):
+    token = shared.generation("scope")
+    assert shared.generation("scope") == token
+    shared.bump("scope")
+    assert shared.generation("scope") != token
+
+class FullCache(MemoryCache):
+    def set(self, key, value, ttl=None):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    def add(self, key, value, ttl=None):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+def test_failing_backend_still_serves_computed_values():
+    shared = SharedCache(FullCache(), namespace="test:")
+    assert shared.get_or_set("t", "k", lambda: b"value") == b"value"
+    assert asyncio.run(shared.aget_or_set("t", "k", _value)) == b"value"
+    before = shared.generation("scope")
+    shared.bump("scope")
+    assert shared.generation("scope") != before
+
+async def _value():
+    return b"value"
+
+def test_file_cache_capped_by_filesystem(tmp_path):
+    backend = FileCache(str(tmp_path), max_bytes=1 << 60)
+    assert backend.max_bytes < 1 << 60
@@ -0,0 +1,45 @@
+import math
+import statistics
+import pytest
+from app.inventory import replenishment_plan
+
+PARAMS = dict(window_days=10, lead_time_days=5, service_level=0.95, cover_days=10)
+
+def plan_for(daily, stock=0, min_stock=0, **params):
+    daily = list(daily) + [0] * (params.get("window_days", PARAMS["window_days"]) - len(daily))
+    p = replenishment_plan([sum(daily)], [sum(q * q for q in daily)], [stock], [min_stock], **{**PARAMS, **params})
+    return {k: v[0].item() for k, v in p.items()}
+
+def test_constant_demand_has_no_safety_stock():
+    p = plan_for([2] * 10, stock=5)
+    assert p["avg_daily_demand"] == pytest.approx(2.0)
+    assert p["demand_std"] == pytest.approx(0.0)
+    assert (p["safety_stock"], p["reorder_point"], p["order_up_to"], p["suggested_qty"]) == (0, 10, 30, 25)
+
+def test_no_order_above_reorder_point():
+    assert plan_for([2] * 10, stock=11)["suggested_qty"] == 0
+    assert plan_for([2] * 10, stock=10)["suggested_qty"] == 20
+
+def test_variable_demand_uses_sample_std_over_whole_window():
+    daily = [0, 4, 1, 0, 7, 0, 0, 3]  # padded with zero days to the window
+    p = plan_for(daily)
+    full = daily + [0, 0]
+    std = statistics.stdev(full)
+    z = statistics.NormalDist().inv_cdf(0.95)
+    assert p["demand_std"] == pytest.approx(std)
+    assert p["safety_stock"] == math.ceil(z * std * math.sqrt(5))
+    assert p["reorder_point"] == math.ceil(statistics.mean(full) * 5 + p["safety_stock"])
+
+def test_min_stock_floors_reorder_point():
+    p = plan_for([1] * 10, stock=3, min_stock=20)
+    assert p["reorder_point"] == 20
+    assert p["order_up_to"] == 30
+    assert p["suggested_qty"] == 27
+
+def test_no_demand():
+    p = plan_for([], stock=0, min_stock=0)
+    assert (p["reorder_point"], p["order_up_to"], p["suggested_qty"]) == (0, 0, 0)
+
+def test_vectorised_over_catalog():
+    p = replenishment_plan([20, 0], [40, 0], [5, 0], [0, 4], **PARAMS)
+    assert p["suggested_qty"].tolist() == [25, 4]
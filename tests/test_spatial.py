@@ -0,0 +1,52 @@
+import math
+import random
+import pytest
+from app.spatial import GridIndex
+
+@pytest.fixture
+def points():
+    rng = random.Random(7)
+    return [(i, rng.uniform(-50, 900), rng.uniform(0, 1200)) for i in range(500)]
+
+def brute_within(points, x0, y0, x1, y1):
+    return {p for p, x, y in points if min(x0, x1) <= x <= max(x0, x1) and min(y0, y1) <= y <= max(y0, y1)}
+
+def brute_nearest(points, x, y):
+    return min((math.hypot(px - x, py - y), p) for p, px, py in points)
+
+def test_within_matches_brute_force(points):
+    idx = GridIndex(points, cell=48)
+    for rect in [(0, 0, 100, 100), (300, 900, 120, 40), (-100, -100, 2000, 2000), (10, 10, 10, 10)]:
+        assert set(idx.within(*rect)) == brute_within(points, *rect)
+
+def test_within_limit(points):
+    idx = GridIndex(points)
+    hits = idx.within(-100, -100, 2000, 2000, limit=5)
+    assert len(hits) == 5 and set(hits) <= {p for p, _, _ in points}
+
+def test_nearest_matches_brute_force(points):
+    idx = GridIndex(points, cell=48)
+    rng = random.Random(3)
+    for _ in range(50):
+        x, y = rng.uniform(-200, 1100), rng.uniform(-200, 1400)
+        d, pid = brute_nearest(points, x, y)
+        # same hypot as the index, and random points have no ties: exact id and distance
+        assert idx.nearest(x, y) == (pid, d)
+
+def test_nearest_max_distance_and_empty():
+    idx = GridIndex([(1, 10.0, 10.0)])
+    assert idx.nearest(13, 14, max_distance=5) == (1, 5.0)
+    assert idx.nearest(100, 100, max_distance=5) is None
+    assert GridIndex().nearest(0, 0) is None
+
+def test_insert_moves_and_remove(points):
+    idx = GridIndex(points[:10])
+    idx.insert(0, 5000, 5000)
+    assert len(idx) == 10
+    assert idx.within(4990, 4990, 5010, 5010) == [0]
+    assert idx.nearest(5001, 5001)[0] == 0
+    idx.remove(0)
+    idx.remove(0)
+    assert len(idx) == 9
+    assert idx.within(4990, 4990, 5010, 5010) == []
+    assert not any(0 in bucket for bucket in idx.cells.values())
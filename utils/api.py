@@ -0,0 +1,62 @@
+# utils/api.py
+# Minimal backend access for the dashboard: the front-end's pooled session and a service
+# login. With API_USERNAME/API_PASSWORD the dashboard logs in itself and logs in again
+# when the token expires; a static API_TOKEN is still accepted but lapses after
+# ACCESS_TOKEN_EXPIRE_MINUTES.
+import os
+import threading
+from client.api_client import get_http_session
+
+API_BASE_URL = os.getenv("API_BASE_URL")
+API_TOKEN = os.getenv("API_TOKEN")
+API_USERNAME = os.getenv("API_USERNAME")
+API_PASSWORD = os.getenv("API_PASSWORD")
+TIMEOUT = (5, 30)
+
+_token = API_TOKEN
+_token_lock = threading.Lock()
+
+def api_configured() -> bool:
+    return bool(API_BASE_URL and (API_TOKEN or (API_USERNAME and API_PASSWORD)))
+
+def _login(stale: str = None) -> str:
+    """Token for the dashboard's service user, shared by every Streamlit session in the
+    process. Logs in when there is none yet or when `stale` (the token a request was just
+    refused with) is still the current one, so concurrent 401s log in once."""
+    global _token
+    with _token_lock:
+        if _token and _token != stale:
+            return _token
+        if not (API_USERNAME and API_PASSWORD):
+            return _token
+        r = get_http_session().post(
+            f"{API_BASE_URL.rstrip('/')}/users/login",
+            data={"username": API_USERNAME, "password": API_PASSWORD},
+            timeout=TIMEOUT,
+        )
+        r.raise_for_status()
+        _token = r.json()["access_token"]
+        return _token
+
+def api_request(method: str, path: str, **kwargs):
+    """Raises for HTTP errors; returns the decoded JSON body (None for 204). Only
+    idempotent methods are retried (client.api_client.IDEMPOTENT_METHODS). A 401 logs in
+    again and repeats the request once."""
+    timeout = kwargs.pop("timeout", TIMEOUT)
+    token = _login()
+    for attempt in range(2):
+        r = get_http_session().request(
+            method,
+            f"{API_BASE_URL.rstrip('/')}{path}",
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=timeout,
+            **kwargs,
+        )
+        if r.status_code != 401 or attempt or not (API_USERNAME and API_PASSWORD):
+            break
+        token = _login(stale=token)
+    r.raise_for_status()
+    return r.json() if r.status_code != 204 and r.content else None
+
+def api_get(path: str, params: dict = None):
+    return api_request("GET", path, params={k: v for k, v in (params or {}).items() if v is not None and v != ""})
@@ -0,0 +1,121 @@
+# utils/cache_utils.py
+# Content-hash keyed caches for the heavy steps of the Streamlit dashboard.
+# Streamlit reruns the whole script on every widget interaction, so anything
+# derived from an uploaded file is cached on the file's digest instead.
+import hashlib
+import io
+import os
+import tempfile
+from itertools import groupby
+from types import SimpleNamespace
+import streamlit as st
+import pandas as pd
+from utils.bom_parser import parse_bom
+from utils.search import search_index, filter_rows
+from app.pdf_utils import find_part_locations, burn_annotations
+
+CACHE_TTL = 60 * 60  # seconds
+MAX_DOCS = 8
+MAX_PAGES = 64
+MAX_BOMS = 8
+
+# st.fragment (>=1.37) / st.experimental_fragment (>=1.33) rerun only the decorated
+# block; on older releases this is a no-op and callers rely on st.form instead.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
+def file_digest(uploaded_file) -> str:
+    """sha256 of an uploaded file's contents, memoised per upload id. Files without one
+    are hashed every call: names repeat across uploads with different contents."""
+    upload_id = getattr(uploaded_file, "file_id", None) or getattr(uploaded_file, "id", None)
+    if upload_id is None:
+        return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    key = f"_digest_{upload_id}"
+    if key not in st.session_state:
+        st.session_state[key] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return st.session_state[key]
+
+def load_pdf(data: bytes):
+    """A fresh document per call. fitz.Document is not thread-safe and Streamlit runs
+    sessions on separate threads, so handles are never shared through a cache; what
+    is worth caching (renders, pdf_info) is cached as plain data instead."""
+    import fitz  # PyMuPDF
+    return fitz.open(stream=data, filetype="pdf")
+
+@st.cache_data(max_entries=MAX_DOCS, ttl=CACHE_TTL, show_spinner=False)
+def pdf_info(digest: str, _data: bytes) -> dict:
+    """Page count, per-page (width, height) in points and metadata, once per file."""
+    with load_pdf(_data) as doc:
+        return {
+            "page_count": doc.page_count,
+            "page_sizes": [(page.rect.width, page.rect.height) for page in doc],
+            "metadata": dict(doc.metadata or {}),
+        }
+
+@st.cache_data(max_entries=MAX_PAGES, ttl=CACHE_TTL, show_spinner=False)
+def render_page(digest: str, _data: bytes, page_number: int, zoom: float) -> bytes:
+    import fitz  # PyMuPDF
+    with load_pdf(_data) as doc:
+        pix = doc.load_page(page_number).get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        return pix.tobytes("png")
+
+@st.cache_data(max_entries=MAX_PAGES, ttl=CACHE_TTL, show_spinner=False)
+def render_page_with_annotations(digest: str, _data: bytes, page_number: int, zoom: float, annotations: tuple) -> bytes:
+    """Base render plus annotation markers. `annotations` is a tuple of (x, y, text, color)
+    with x/y in PDF points, so that the overlay is only redrawn when the pins themselves change."""
+    base = render_page(digest, _data, page_number, zoom)
+    if not annotations:
+        return base
+    from PIL import Image, ImageDraw, ImageFont
+    img = Image.open(io.BytesIO(base))
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.load_default()
+    except Exception:
+        font = None
+    radius = 8
+    for x, y, text, color in annotations:
+        x, y = int(x * zoom), int(y * zoom)
+        draw.ellipse([x-radius, y-radius, x+radius, y+radius], fill=color, outline="white", width=2)
+        label = text[:20] + "..." if len(text) > 20 else text
+        draw.text((x+15, y-10), label, fill=color, font=font)
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+@st.cache_data(max_entries=MAX_DOCS, ttl=CACHE_TTL, show_spinner=False)
+def part_locations(pdf_digest: str, _pdf_data: bytes, bom_digest: str, _part_numbers: tuple) -> list:
+    """(page, part_number, x0, y0, x1, y1) hits in PDF points, once per drawing/BOM pair."""
+    return find_part_locations(_pdf_data, _part_numbers)
+
+def export_annotated_pdf(pdf_bytes: bytes, annotations: list) -> bytes:
+    """Session annotations (PDF points) burned into the drawing as vector PDF annotations."""
+    pins = sorted((SimpleNamespace(**a) for a in annotations), key=lambda a: a.page)
+    fd, out_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        burn_annotations(pdf_bytes, out_path, ((p, list(g)) for p, g in groupby(pins, key=lambda a: a.page)))
+        with open(out_path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(out_path)
+
+@st.cache_data(max_entries=MAX_BOMS, ttl=CACHE_TTL, show_spinner=False)
+def load_bom(digest: str, _data: bytes) -> pd.DataFrame:
+    return parse_bom(io.BytesIO(_data))
+
+@st.cache_data(max_entries=MAX_BOMS, ttl=CACHE_TTL, show_spinner=False)
+def bom_search_index(digest: str, _data: bytes) -> pd.Series:
+    """One lower-cased haystack string per BOM row, built column-wise once per file."""
+    df = load_bom(digest, _data)
+    return search_index(df)
+
+@st.cache_data(max_entries=MAX_BOMS, ttl=CACHE_TTL, show_spinner=False)
+def load_table(digest: str, _data: bytes, filename: str) -> pd.DataFrame:
+    """CSV/XLSX upload parsed once per file content."""
+    if filename.endswith("xlsx"):
+        return pd.read_excel(io.BytesIO(_data))
+    return pd.read_csv(io.BytesIO(_data))
+
+@st.cache_data(max_entries=MAX_BOMS, ttl=CACHE_TTL, show_spinner=False)
+def table_search_index(digest: str, _data: bytes, filename: str) -> pd.Series:
+    return search_index(load_table(digest, _data, filename))
@@ -0,0 +1,42 @@
+# utils/error_codes.py
+# Pushes an uploaded error-code catalog to the backend when it changes and queries its index.
+import pandas as pd
+import streamlit as st
+from utils.api import api_request, api_get
+
+CODE_COLUMNS = ("error code", "code", "error", "fault code")
+DESCRIPTION_COLUMNS = ("description", "message", "text", "meaning")
+
+def _pick(columns, candidates, default):
+    lowered = {str(c).strip().lower(): c for c in columns}
+    return next((lowered[c] for c in candidates if c in lowered), default)
+
+def catalog_records(df: pd.DataFrame) -> list:
+    code_col = _pick(df.columns, CODE_COLUMNS, df.columns[0])
+    desc_col = _pick(df.columns, DESCRIPTION_COLUMNS, df.columns[1] if len(df.columns) > 1 else None)
+    other = [c for c in df.columns if c not in (code_col, desc_col)]
+    codes = df[code_col].astype(str)
+    descs = df[desc_col].fillna("").astype(str) if desc_col is not None else pd.Series("", index=df.index)
+    details = df[other].astype(str).to_dict("records") if other else [{}] * len(df)
+    return [
+        {"code": c, "description": d, "details": x}
+        for c, d, x in zip(codes.tolist(), descs.tolist(), details)
+        if c and c != "nan"
+    ]
+
+def ensure_imported(digest: str, df: pd.DataFrame) -> int:
+    """Import the catalog only when the backend's copy came from a different file, checked
+    once per file (by digest) per session, so every session showing the same upload does
+    not replace the tenant's catalog again."""
+    if st.session_state.get("_error_catalog_digest") == digest:
+        return 0
+    n = 0
+    if api_get("/error-codes/catalog").get("digest") != digest:
+        n = api_request("POST", "/error-codes", params={"digest": digest}, json=catalog_records(df), timeout=(5, 120))["imported"]
+    st.session_state["_error_catalog_digest"] = digest
+    return n
+
+def search_codes(q: str, limit: int = 50) -> pd.DataFrame:
+    rows = api_get("/error-codes/search", {"q": q, "limit": limit})
+    out = pd.DataFrame([{"Code": r["code"], "Description": r["description"], **(r.get("details") or {})} for r in rows])
+    return out if not out.empty else pd.DataFrame(columns=["Code", "Description"])
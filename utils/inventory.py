@@ -0,0 +1,60 @@
+# utils/inventory.py
+# Stock levels for the dashboard, loaded from the backend inventory table.
+import numpy as np
+import pandas as pd
+import streamlit as st
+from app.inventory import classify_stock, LOW_STOCK, UNKNOWN
+from utils.api import api_configured, api_get, api_request
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_stock_levels(location: str = None) -> pd.DataFrame:
+    """Per-part stock summed over locations (or for one location). Empty when no backend is configured."""
+    cols = ["Part Number", "Stock", "Min_Stock"]
+    if not api_configured():
+        return pd.DataFrame(columns=cols)
+    df = pd.DataFrame(api_get("/inventory", {"location": location}), columns=["part_number", "stock", "min_stock"])
+    df = df.groupby("part_number", as_index=False)[["stock", "min_stock"]].sum()
+    return df.rename(columns={"part_number": "Part Number", "stock": "Stock", "min_stock": "Min_Stock"})[cols]
+
+def with_stock_levels(bom_df: pd.DataFrame, location: str = None) -> pd.DataFrame:
+    """Attach Stock/Min_Stock (BOM columns win over backend data) and a vectorized Status.
+    Parts the backend has no inventory record for (every part when no backend is
+    configured) get empty levels and the Unknown status, so they never count as low."""
+    df = bom_df.copy()
+    missing = [c for c in ("Stock", "Min_Stock") if c not in df.columns]
+    known = np.ones(len(df), dtype=bool)
+    if missing:
+        levels = fetch_stock_levels(location)
+        levels["Part Number"] = levels["Part Number"].astype(str)
+        keys = df["Part Number"].astype(str)
+        known = keys.isin(levels["Part Number"]).to_numpy()
+        for col in missing:
+            df[col] = keys.map(levels.set_index("Part Number")[col]).astype("Int64").values
+    status = classify_stock(df["Stock"].fillna(0).to_numpy(dtype=np.int64), df["Min_Stock"].fillna(0).to_numpy(dtype=np.int64))
+    df["Status"] = np.where(known, status, UNKNOWN)
+    return df
+
+def low_stock(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df["Status"].to_numpy() == LOW_STOCK]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_usage_series(period: str = "week", part_number: str = None, category: str = None, start=None, end=None) -> pd.DataFrame:
+    """Pre-aggregated usage buckets from the backend (Date, Parts_Used). Empty when no backend is configured."""
+    cols = ["Date", "Parts_Used"]
+    if not api_configured():
+        return pd.DataFrame(columns=cols)
+    params = {"period": period, "part_number": part_number, "category": category, "start": start, "end": end}
+    df = pd.DataFrame(api_get("/usage/series", params), columns=["bucket_start", "qty"])
+    return pd.DataFrame({"Date": pd.to_datetime(df["bucket_start"]), "Parts_Used": df["qty"]})
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_replenishment(part_numbers: tuple) -> pd.DataFrame:
+    """Parts among `part_numbers` the backend's replenishment run suggests ordering, most
+    urgent first. Filtered server-side, so no BOM part is cut off by a tenant-wide limit."""
+    cols = ["Part Number", "Stock", "Reorder Point", "Safety Stock", "Avg Daily Use", "Suggested Qty"]
+    if not api_configured() or not part_numbers:
+        return pd.DataFrame(columns=cols)
+    rows = api_request("POST", "/replenishment/search", json={"part_numbers": list(part_numbers), "only_suggested": True})
+    df = pd.DataFrame(rows, columns=["part_number", "stock", "reorder_point", "safety_stock", "avg_daily_demand", "suggested_qty"])
+    df.columns = cols
+    return df
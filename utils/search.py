@@ -0,0 +1,14 @@
+# utils/search.py
+# Substring filter over tabular uploads. Kept free of Streamlit so it can be benchmarked headless.
+import pandas as pd
+
+def search_index(df: pd.DataFrame) -> pd.Series:
+    haystack = pd.Series("", index=df.index)
+    for col in df.columns:
+        haystack = haystack + " " + df[col].astype(str)
+    return haystack.str.lower()
+
+def filter_rows(df: pd.DataFrame, index: pd.Series, term: str) -> pd.DataFrame:
+    if not term:
+        return df
+    return df[index.str.contains(term.lower(), regex=False).values]